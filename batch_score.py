@@ -0,0 +1,369 @@
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import sys
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering import INPUT_FIELDS, is_series
+from model_registry import ModelRegistry, load_model_handle
+from physics import estimate_generation_breakdown, physics_based_estimate
+warnings.filterwarnings('ignore')
+
+DEFAULT_CHUNK_ROWS = 100_000
+PROGRESS_INTERVAL = 2.0  # seconds between progress lines
+
+# Column names tried for each input, in order; the notebook's dataset uses temp and clock
+COLUMN_ALIASES = {
+    'temperature': ('temperature', 'temp'),
+    'weather': ('weather',),
+    'wind': ('wind', 'wind_speed'),
+    'humidity': ('humidity',),
+    'barometer': ('barometer', 'pressure'),
+    'solar_irradiance': ('solar_irradiance', 'solar_rad'),
+    'timestamp': ('timestamp', 'clock', 'time'),
+}
+CSV_OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+NUMERIC_FIELDS = [field for field in INPUT_FIELDS if field != 'weather']
+
+_worker_handle = None  # model handle of a process-pool worker
+
+def file_format(path, explicit=None):
+    if explicit:
+        return explicit
+    name = path.lower()
+    if name.endswith(('.parquet', '.pq')):
+        return 'parquet'
+    if name.endswith(('.csv', '.csv.gz', '.csv.bz2', '.csv.xz')):
+        return 'csv'
+    raise ValueError(f"Cannot tell the format of {path}; pass --input-format/--output-format")
+
+def _pyarrow_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ Parquet needs pyarrow: pip install pyarrow")
+    return pq
+
+def resolve_columns(available, overrides=None):
+    '''Input field -> source column; timestamp maps to None when the file has none'''
+    overrides = overrides or {}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        if field in overrides:
+            if overrides[field] not in available:
+                raise ValueError(f"Column '{overrides[field]}' (for {field}) is not in the input")
+            mapping[field] = overrides[field]
+            continue
+        mapping[field] = next((name for name in aliases if name in available), None)
+        if mapping[field] is None and field != 'timestamp':
+            raise ValueError(f"No column for '{field}' (tried {', '.join(aliases)}); use --column {field}=NAME")
+    return mapping
+
+def input_columns(path, fmt):
+    if fmt == 'parquet':
+        return _pyarrow_parquet().ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def read_chunks(path, fmt, usecols, chunk_rows):
+    '''DataFrames of at most chunk_rows rows; only the needed columns are read'''
+    if fmt == 'parquet':
+        for batch in _pyarrow_parquet().ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=usecols):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=usecols, chunksize=chunk_rows)
+
+def chunk_timestamps(values, n_rows):
+    '''datetime64[s] column; missing or unparseable times are scored at the current time, as in the API'''
+    now = np.datetime64(pd.Timestamp.now().floor('s'))
+    if values is None:
+        return np.full(n_rows, now)
+    parsed = pd.to_datetime(values, errors='coerce')
+    if getattr(parsed.dt, 'tz', None) is not None:
+        parsed = parsed.dt.tz_localize(None)  # keep the local wall-clock hour
+    timestamps = parsed.to_numpy(dtype='datetime64[s]')
+    return np.where(np.isnat(timestamps), now, timestamps)
+
+def series_context(handle):
+    '''Rows of history a chunk needs so the rolling windows reach across the chunk boundary'''
+    pipeline = handle.feature_pipeline
+    if not pipeline.uses_rolling:
+        return 0
+    return max(pipeline.state.rolling_windows.values()) - 1
+
+def with_context(chunks, rows):
+    '''(frame, context) per chunk: the chunk prefixed with the last rows read before it
+
+    Only the raw inputs are carried over, so chunks can still be scored
+    in any order, on any worker.
+    '''
+    tail = None
+    for frame in chunks:
+        context = 0 if tail is None else len(tail)
+        if context:
+            frame = pd.concat([tail, frame], ignore_index=True)
+        yield frame, context
+        tail = frame.iloc[-rows:] if rows else None
+
+def score_chunk(handle, frame, mapping, keep=(), series=False, context=0):
+    '''Predictions and the solar/wind/backup breakdown for one chunk
+
+    With series=True the rows are one site's consecutive observations and
+    the rolling features run over them in order. The first context rows
+    are history from the previous chunk: they feed the rolling windows
+    but are not part of the output.
+
+    Rows with a blank or non-numeric input cell (or no weather label) are
+    left out of the model's pass and get the physics-based estimate, as do
+    rows the model gives no finite prediction for; prediction_method says
+    which rows those are. A series is scored over its valid rows only.
+    '''
+    inputs = {field: pd.to_numeric(frame[mapping[field]], errors='coerce').to_numpy(dtype=np.float64,
+                                                                                     na_value=np.nan)
+              for field in NUMERIC_FIELDS}
+    weather = frame[mapping['weather']]
+    inputs['weather'] = weather.astype(str).to_numpy()
+    valid = np.logical_and.reduce([weather.notna().to_numpy()] +
+                                  [np.isfinite(inputs[field]) for field in NUMERIC_FIELDS])
+    source = mapping['timestamp']
+    timestamps = chunk_timestamps(frame[source] if source else None, len(frame))
+    if series and len(frame) > 1 and not is_series(timestamps):
+        raise ValueError("--series needs strictly increasing timestamps on every row")
+
+    predictions = np.full(len(frame), np.nan)
+    if valid.any():
+        try:
+            X_input = handle.feature_pipeline.transform(
+                inputs['temperature'][valid],
+                inputs['weather'][valid],
+                inputs['wind'][valid],
+                inputs['humidity'][valid],
+                inputs['barometer'][valid],
+                inputs['solar_irradiance'][valid],
+                timestamps[valid],
+                series=series
+            )
+            predictions[valid] = np.maximum(0, handle.predictor.predict(X_input))
+        except Exception as e:
+            print(f"⚠️  Model failed on a chunk, using the physics-based estimate: {e}", file=sys.stderr)
+
+    fallback = ~np.isfinite(predictions)
+    predictions[fallback] = physics_based_estimate(inputs['wind'][fallback], inputs['solar_irradiance'][fallback])
+
+    if context:
+        frame = frame.iloc[context:]
+        inputs = {field: values[context:] for field, values in inputs.items()}
+        timestamps, predictions, fallback = timestamps[context:], predictions[context:], fallback[context:]
+
+    solar_estimate, wind_estimate, backup_estimate = estimate_generation_breakdown(
+        predictions, inputs['wind'], inputs['solar_irradiance']
+    )
+    result = {column: frame[column].to_numpy() for column in keep}
+    result.update({
+        'timestamp': timestamps,
+        'predicted_generation': predictions,
+        'solar_estimate': solar_estimate,
+        'wind_estimate': wind_estimate,
+        'backup_estimate': backup_estimate,
+        'prediction_method': np.where(fallback, 'physics_based', 'enhanced'),
+    })
+    return pd.DataFrame(result)
+
+def load_handle(model, model_dir):
+    '''A package file, or a registry name/version looked up in model_dir'''
+    if model and os.path.isfile(model):
+        return load_model_handle(model)
+    registry = ModelRegistry(model_dir)
+    if not registry.load_all():
+        raise SystemExit(f"❌ No model packages in {registry.directory}")
+    try:
+        return registry.get(model)
+    except KeyError:
+        names = ', '.join(h.name for h in registry.handles())
+        raise SystemExit(f"❌ Unknown model '{model}' (available: {names})")
+
+def render_chunk(frame, fmt):
+    '''(columns, rows) ready for ChunkWriter; CSV text is formatted here, in the scoring process'''
+    if fmt == 'csv':
+        return list(frame.columns), frame.to_csv(header=False, index=False, float_format='%.4f')
+    return list(frame.columns), frame
+
+def process_chunk(handle, frame, mapping, keep, fmt, series=False, context=0):
+    '''(rows, physics fallback rows, rendered chunk)'''
+    scored = score_chunk(handle, frame, mapping, keep, series, context)
+    fallback = int((scored['prediction_method'] != 'enhanced').sum())
+    return len(scored), fallback, render_chunk(scored, fmt)
+
+def _init_worker(model_path):
+    global _worker_handle
+    warnings.filterwarnings('ignore')
+    _worker_handle = load_model_handle(model_path)
+
+def _process_in_worker(frame, mapping, keep, fmt, series, context):
+    return process_chunk(_worker_handle, frame, mapping, keep, fmt, series, context)
+
+class ChunkWriter:
+    """Appends rendered chunks to a CSV or Parquet file without holding them in memory"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._file = None
+        self._writer = None
+
+    def write(self, rendered):
+        columns, rows = rendered
+        if self.fmt == 'parquet':
+            import pyarrow as pa
+            table = pa.Table.from_pandas(rows, preserve_index=False)
+            if self._writer is None:
+                self._writer = _pyarrow_parquet().ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self._file is None:
+                opener = CSV_OPENERS.get(os.path.splitext(self.path)[1].lower(), open)
+                self._file = opener(self.path, 'wt', newline='')
+                self._file.write(','.join(columns) + '\n')
+            self._file.write(rows)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+class Progress:
+    """Rows scored and throughput, printed at most every PROGRESS_INTERVAL seconds"""
+
+    def __init__(self, quiet=False, stream=sys.stderr):
+        self.quiet = quiet
+        self.stream = stream
+        self.start = self.last = perf_counter()
+        self.rows = 0
+        self.chunks = 0
+        self.fallback_rows = 0
+
+    def update(self, rows, fallback_rows=0):
+        self.rows += rows
+        self.fallback_rows += fallback_rows
+        self.chunks += 1
+        now = perf_counter()
+        if not self.quiet and now - self.last >= PROGRESS_INTERVAL:
+            self.last = now
+            print(f"   {self.rows:>12,} rows  {self.chunks:>6} chunks  "
+                  f"{self.rows / (now - self.start):>10,.0f} rows/s", file=self.stream)
+
+    def summary(self):
+        elapsed = perf_counter() - self.start
+        return {'rows': self.rows, 'chunks': self.chunks, 'seconds': elapsed,
+                'rows_per_s': self.rows / elapsed if elapsed else 0.0, 'fallback_rows': self.fallback_rows}
+
+def score_file(input_path, output_path, handle, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1,
+               column_overrides=None, keep=(), input_format=None, output_format=None, quiet=False,
+               series=False):
+    '''Stream input_path through the model chunk by chunk; returns throughput stats
+
+    With several workers each process loads the package once and also
+    formats its chunks, leaving only file writes to the parent. At most two
+    chunks per worker are in flight, so memory stays bounded by the chunk
+    size however large the input is. Output rows keep the input order.
+
+    Rows are scored independently unless series=True, which treats the
+    file as one site's consecutive observations: each chunk then carries
+    the rows its rolling windows need from the chunk before.
+    '''
+    in_fmt = file_format(input_path, input_format)
+    out_fmt = file_format(output_path, output_format)
+    if 'parquet' in (in_fmt, out_fmt):
+        _pyarrow_parquet()  # fail before any work is done
+    available = input_columns(input_path, in_fmt)
+    mapping = resolve_columns(available, column_overrides)
+    missing = [column for column in keep if column not in available]
+    if missing:
+        raise ValueError(f"--keep columns not in the input: {', '.join(missing)}")
+    if series and mapping['timestamp'] is None:
+        raise ValueError("--series needs a timestamp column")
+    usecols = sorted({c for c in mapping.values() if c} | set(keep))
+
+    chunks = with_context(read_chunks(input_path, in_fmt, usecols, chunk_rows),
+                          series_context(handle) if series else 0)
+    writer = ChunkWriter(output_path, out_fmt)
+    progress = Progress(quiet)
+    try:
+        if workers <= 1:
+            for frame, context in chunks:
+                n_rows, fallback, rendered = process_chunk(handle, frame, mapping, keep, out_fmt, series, context)
+                writer.write(rendered)
+                progress.update(n_rows, fallback)
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(handle.path,)) as pool:
+                pending = deque()
+                for frame, context in chunks:
+                    pending.append(pool.submit(_process_in_worker, frame, mapping, keep, out_fmt, series, context))
+                    while len(pending) >= 2 * workers or (pending and pending[0].done()):
+                        n_rows, fallback, rendered = pending.popleft().result()
+                        writer.write(rendered)
+                        progress.update(n_rows, fallback)
+                while pending:
+                    n_rows, fallback, rendered = pending.popleft().result()
+                    writer.write(rendered)
+                    progress.update(n_rows, fallback)
+    finally:
+        writer.close()
+    return progress.summary()
+
+def parse_column(value):
+    field, sep, column = value.partition('=')
+    if not sep or field not in COLUMN_ALIASES:
+        raise argparse.ArgumentTypeError(f"expected FIELD=COLUMN with FIELD in {', '.join(COLUMN_ALIASES)}")
+    return field, column
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score historical weather data offline, chunk by chunk")
+    parser.add_argument('input', help="CSV or Parquet file of hourly weather observations")
+    parser.add_argument('output', help="CSV or Parquet file for predictions and breakdowns")
+    parser.add_argument('--model', help="package file, or a model name/version in --model-dir "
+                                        "(default: the registry's default model)")
+    parser.add_argument('--model-dir', default=os.environ.get('POWER_MODEL_DIR', '.'))
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="rows per chunk")
+    parser.add_argument('--workers', type=int, default=1, help="scoring processes (1 = in-process)")
+    parser.add_argument('--column', type=parse_column, action='append', default=[],
+                        metavar='FIELD=COLUMN', help="input column for a field, e.g. temperature=temp_c")
+    parser.add_argument('--keep', action='append', default=[], metavar='COLUMN',
+                        help="copy an input column (e.g. a site id) into the output")
+    parser.add_argument('--input-format', choices=('csv', 'parquet'))
+    parser.add_argument('--output-format', choices=('csv', 'parquet'))
+    parser.add_argument('--series', action='store_true',
+                        help="the rows are one site's consecutive observations: rolling features "
+                             "run over them in order (default: every row stands alone)")
+    parser.add_argument('--quiet', action='store_true', help="no progress lines")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    handle = load_handle(args.model, args.model_dir)
+    print(f"⚡ Scoring {args.input} with '{handle.name}' (version {handle.version}, "
+          f"{handle.predictor.kind} inference)", file=sys.stderr)
+    try:
+        stats = score_file(args.input, args.output, handle, args.chunk_rows, args.workers,
+                           dict(args.column), args.keep, args.input_format, args.output_format, args.quiet,
+                           args.series)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    print(f"✅ {stats['rows']:,} rows in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_s']:,.0f} rows/s) -> {args.output}", file=sys.stderr)
+    if stats['fallback_rows']:
+        print(f"⚠️  {stats['fallback_rows']:,} rows had invalid inputs or no model prediction and got the "
+              f"physics-based estimate (prediction_method = physics_based)", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,701 @@
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import timeit
+import urllib.error
+import urllib.request
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+
+DEFAULT_BATCH_SIZES = (1, 10, 100, 1000, 10000)
+DEFAULT_TOLERANCE = 0.10  # relative change that counts as a regression
+
+# Metrics where a larger value is better; everything else is a latency
+HIGHER_IS_BETTER = ('rows_per_s', 'requests_per_s')
+# p99 over a few hundred requests is too noisy to gate on
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'median_us', 'import_ms', 'ready_ms')
+
+def synthetic_observations(n_samples=2000, seed=42, start=datetime(2024, 1, 1)):
+    '''Hourly weather inputs generated like the notebook's create_power_generation_data'''
+    rng = np.random.RandomState(seed)
+
+    hours = np.arange(n_samples)
+    timestamps = np.datetime64(start, 'h') + hours
+
+    seasonal_temp = 20 + 15 * np.sin(2 * np.pi * hours / (24 * 365))
+    daily_temp = 5 * np.sin(2 * np.pi * hours / 24)
+    temp = seasonal_temp + daily_temp + rng.normal(0, 3, n_samples)
+
+    wind = np.maximum(0, 8 + 3 * np.sin(2 * np.pi * hours / (24 * 7)) +
+                      rng.normal(0, 4, n_samples))
+
+    humidity = np.clip(60 - 0.3 * (temp - 20) + rng.normal(0, 15, n_samples), 10, 95)
+    barometer = rng.normal(1013, 15, n_samples)
+    weather = rng.choice(['Clear', 'Sunny', 'Cloudy', 'Overcast', 'Rainy'],
+                         n_samples, p=[0.35, 0.25, 0.25, 0.1, 0.05])
+
+    hour_of_day = (hours + start.hour) % 24
+    day_of_year = (timestamps.astype('datetime64[D]') - timestamps.astype('datetime64[Y]')).astype(int) + 1
+
+    solar_elevation = np.maximum(0, np.sin(np.pi * (hour_of_day - 6) / 12))
+    seasonal_factor = 1 + 0.4 * np.sin(2 * np.pi * (day_of_year - 80) / 365)
+    weather_factor = np.select([
+        weather == 'Clear', weather == 'Sunny', weather == 'Cloudy',
+        weather == 'Overcast', weather == 'Rainy'
+    ], [1.0, 0.95, 0.4, 0.2, 0.05], default=0.5)
+    temp_factor = 1 - 0.004 * np.maximum(0, temp - 25)
+
+    solar_irradiance = 1000 * solar_elevation * seasonal_factor * weather_factor * temp_factor
+    solar_irradiance = np.maximum(0, solar_irradiance + rng.normal(0, 50, n_samples))
+
+    return {
+        'temperature': np.round(temp, 2).tolist(),
+        'weather': weather.tolist(),
+        'wind': np.round(wind, 2).tolist(),
+        'humidity': np.round(humidity, 2).tolist(),
+        'barometer': np.round(barometer, 2).tolist(),
+        'solar_irradiance': np.round(solar_irradiance, 2).tolist(),
+        'timestamp': np.datetime_as_string(timestamps.astype('datetime64[s]'), unit='s').tolist(),
+    }
+
+def observation_rows(columns, start=0, count=None):
+    end = len(columns['temperature']) if count is None else start + count
+    return [{field: values[i] for field, values in columns.items()} for i in range(start, end)]
+
+def latency_summary(seconds):
+    '''p50/p95/p99 and friends in milliseconds'''
+    ms = np.asarray(seconds) * 1000
+    return {
+        'count': int(ms.size),
+        'mean_ms': float(ms.mean()),
+        'min_ms': float(ms.min()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+# ---- clients ------------------------------------------------------------
+
+class InProcessClient:
+    """Calls the Flask app through its test client, without a socket"""
+
+    mode = 'inprocess'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path, payload):
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_json()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_json(silent=True)
+
+    def close(self):
+        pass
+
+class HttpClient:
+    """Plain urllib client for a running server"""
+
+    mode = 'server'
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def _send(self, req):
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    def post(self, path, payload):
+        req = urllib.request.Request(self.base_url + path, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+        return self._send(req)
+
+    def get(self, path):
+        return self._send(urllib.request.Request(self.base_url + path))
+
+    def close(self):
+        pass
+
+class LocalServerClient(HttpClient):
+    """Serves the app from a background thread on a free localhost port"""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        super().__init__(f'http://127.0.0.1:{self.server.server_port}')
+
+    def close(self):
+        self.server.shutdown()
+
+# ---- scenarios ----------------------------------------------------------
+
+def bench_single_requests(client, columns, n_requests, warmup=20):
+    '''Latency of /api/predict with a different synthetic observation per request'''
+    rows = observation_rows(columns)
+    for row in rows[:warmup]:
+        client.post('/api/predict', row)
+
+    latencies = []
+    failures = 0
+    for i in range(n_requests):
+        row = rows[i % len(rows)]
+        start = perf_counter()
+        status, _ = client.post('/api/predict', row)
+        latencies.append(perf_counter() - start)
+        failures += status != 200
+
+    result = latency_summary(latencies)
+    result['requests_per_s'] = n_requests / float(np.sum(latencies))
+    result['failures'] = failures
+    return result
+
+def bench_batches(client, columns, batch_sizes, repeat):
+    '''Throughput of /api/predict/batch for several batch sizes'''
+    results = {}
+    n_available = len(columns['temperature'])
+    for size in batch_sizes:
+        size = min(size, n_available)
+        payload = {'columns': {field: values[:size] for field, values in columns.items()}}
+        client.post('/api/predict/batch', payload)  # warm-up
+
+        latencies = []
+        failures = 0
+        for _ in range(repeat):
+            start = perf_counter()
+            status, _ = client.post('/api/predict/batch', payload)
+            latencies.append(perf_counter() - start)
+            failures += status != 200
+
+        result = latency_summary(latencies)
+        result['rows_per_s'] = size * repeat / float(np.sum(latencies))
+        result['failures'] = failures
+        results[str(size)] = result
+    return results
+
+def time_call(func, repeat=7, min_time=0.2):
+    '''Median per-call time in microseconds, timeit-style'''
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    runs = timer.repeat(repeat=repeat, number=number)
+    per_call = np.asarray(runs) / number * 1e6
+    return {
+        'median_us': float(np.median(per_call)),
+        'min_us': float(per_call.min()),
+        'loops': number,
+        'repeat': repeat,
+    }
+
+def bench_micro(app_module, columns):
+    '''Feature builders, scaler+predict and response serialization in isolation'''
+    handle = app_module.registry.get()
+    row = observation_rows(columns, 0, 1)[0]
+    args = tuple(row[field] for field in ('temperature', 'weather', 'wind',
+                                          'humidity', 'barometer', 'solar_irradiance'))
+    moment = datetime.fromisoformat(row['timestamp'])
+
+    X_one = handle.feature_pipeline.transform(*args, timestamps=[moment])
+    X_batch = handle.feature_pipeline.transform(
+        *(columns[field][:1000] for field in ('temperature', 'weather', 'wind',
+                                              'humidity', 'barometer', 'solar_irradiance')),
+        timestamps=np.array(columns['timestamp'][:1000], dtype='datetime64[s]'))
+
+    from inference import SklearnPredictor
+    # Exported .pmf models carry no sklearn object to compare against
+    reference = SklearnPredictor(handle.model, handle.scaler) if handle.model is not None else None
+
+    single_body = {
+        "predicted_generation": 52.31, "solar_estimate": 20.12, "wind_estimate": 15.3,
+        "backup_estimate": 16.89, "confidence": 85, "prediction_method": "enhanced",
+        "timestamp": "2024-01-01 12:00:00", "model_type": handle.model_type,
+        "feature_count": len(handle.feature_names), "success": True,
+    }
+    predictions = handle.predictor.predict(X_batch)
+    batch_body = {
+        "count": len(predictions),
+        "timestamps": columns['timestamp'][:1000],
+        "predicted_generation": np.round(predictions, 2).tolist(),
+    }
+
+    def jsonify_single():
+        with app_module.app.app_context():
+            app_module.jsonify(single_body)
+
+    # The same 1000 rows as a JSON body and as an .npz bundle with dictionary-encoded weather
+    from columnar_io import decode_npz, encode_npz
+    json_payload = json.dumps({'columns': {field: values[:1000] for field, values in columns.items()}})
+    categories, weather = np.unique(columns['weather'][:1000], return_inverse=True)
+    npz_payload = encode_npz(dict(
+        {field: np.asarray(values[:1000]) for field, values in columns.items()},
+        weather=weather.astype(np.int8), weather_categories=categories,
+        timestamp=np.array(columns['timestamp'][:1000], dtype='datetime64[s]')))
+    npz_columns = {field: np.asarray(values) for field, values in batch_body.items() if field != 'count'}
+
+    results = {
+        'create_basic_features_for_prediction': time_call(
+            lambda: app_module.create_basic_features_for_prediction(*args, moment)),
+        'feature_pipeline_transform_1': time_call(
+            lambda: handle.feature_pipeline.transform(*args, timestamps=[moment])),
+        'predictor_predict_1': time_call(lambda: handle.predictor.predict(X_one)),
+        'predictor_predict_1000': time_call(lambda: handle.predictor.predict(X_batch)),
+        'jsonify_single_response': time_call(jsonify_single),
+        'json_dumps_batch_1000': time_call(lambda: json.dumps(batch_body)),
+        'parse_json_batch_1000': time_call(
+            lambda: app_module.parse_batch_payload(json.loads(json_payload))),
+        'decode_npz_batch_1000': time_call(lambda: decode_npz(npz_payload)),
+        'encode_npz_batch_1000': time_call(lambda: encode_npz(npz_columns)),
+    }
+    if reference is not None:
+        results['sklearn_scale_predict_1'] = time_call(lambda: reference.predict(X_one))
+        results['sklearn_scale_predict_1000'] = time_call(lambda: reference.predict(X_batch))
+    return results
+
+def _scalar_physics(wind_speed, solar_irradiance):
+    '''Row-at-a-time if/else version of physics.physics_based_estimate, for reference'''
+    import physics
+    solar = physics.SOLAR_CAPACITY * max(0.0, solar_irradiance) / 1000
+    if wind_speed < physics.CUT_IN_SPEED or wind_speed >= physics.CUT_OUT_SPEED:
+        wind = 0.0
+    elif wind_speed < physics.RATED_SPEED:
+        wind = physics.RATED_WIND_POWER * ((wind_speed - physics.CUT_IN_SPEED) /
+                                           (physics.RATED_SPEED - physics.CUT_IN_SPEED)) ** 3
+    else:
+        wind = physics.RATED_WIND_POWER
+    return solar + wind + physics.BACKUP_SHARE * max(0.0, physics.BACKUP_TARGET - solar - wind)
+
+def bench_physics(columns, sizes=(1, 1000, 10000)):
+    '''Physics fallback and generation breakdown, vectorized vs a per-row loop'''
+    import physics
+    results = {}
+    for size in sizes:
+        wind = np.asarray(columns['wind'][:size], dtype=np.float64)
+        solar = np.asarray(columns['solar_irradiance'][:size], dtype=np.float64)
+        if size == 1:
+            wind, solar = float(wind[0]), float(solar[0])  # as /api/predict passes them
+        predictions = physics.physics_based_estimate(wind, solar)
+        results[f'physics_estimate_{size}'] = time_call(
+            lambda: physics.physics_based_estimate(wind, solar))
+        results[f'breakdown_{size}'] = time_call(
+            lambda: physics.estimate_generation_breakdown(predictions, wind, solar))
+        if size <= 1000:
+            rows = list(zip(np.atleast_1d(wind).tolist(), np.atleast_1d(solar).tolist()))
+            results[f'scalar_loop_{size}'] = time_call(lambda: [_scalar_physics(w, r) for w, r in rows])
+    return results
+
+def bench_forest(handle, columns, n_estimators=100, sizes=(1, 100, 1000, 5000)):
+    '''Flattened forest engine vs sklearn, on a forest fitted like the notebook's (no depth limit)
+
+    The target is the physics estimate plus noise, which is enough to grow
+    trees of realistic size from the synthetic observations. The interval
+    cases time predictions with per-tree bounds at INTERVAL_LEVEL, as the
+    service computes them.
+    '''
+    import physics
+    from sklearn.ensemble import RandomForestRegressor
+    from inference import INTERVAL_LEVEL, ForestPredictor, SklearnPredictor, compile_predictor
+
+    n = min(len(columns['temperature']), 5000)
+    X = handle.feature_pipeline.transform(
+        *(columns[field][:n] for field in ('temperature', 'weather', 'wind',
+                                           'humidity', 'barometer', 'solar_irradiance')),
+        timestamps=np.array(columns['timestamp'][:n], dtype='datetime64[s]'))
+    y = physics.physics_based_estimate(np.asarray(columns['wind'][:n], dtype=np.float64),
+                                       np.asarray(columns['solar_irradiance'][:n], dtype=np.float64))
+    y = y + np.random.RandomState(0).normal(0, 5, n)
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=1).fit(X, y)
+
+    reference = SklearnPredictor(model)
+    flat = ForestPredictor.from_sklearn(model, threads=1)
+    served = compile_predictor(model, None, X.shape[1])  # hands large batches back to sklearn
+    results = {}
+    for size in sizes:
+        rows = X[:size]
+        if not np.array_equal(flat.predict(rows), reference.predict(rows)):
+            raise RuntimeError(f"Flattened forest differs from sklearn on {size} rows")
+        results[f'sklearn_forest_predict_{size}'] = time_call(lambda: reference.predict(rows), repeat=5)
+        results[f'flat_forest_predict_{size}'] = time_call(lambda: flat.predict(rows), repeat=5)
+        results[f'served_forest_predict_{size}'] = time_call(lambda: served.predict(rows), repeat=5)
+        level = INTERVAL_LEVEL or 0.9
+        results[f'flat_forest_interval_{size}'] = time_call(lambda: flat.predict_interval(rows, level), repeat=5)
+        results[f'served_forest_interval_{size}'] = time_call(lambda: served.predict_interval(rows, level),
+                                                              repeat=5)
+    return results
+
+def bench_microbatch(handle, columns, concurrency=(1, 8, 32), per_thread=200):
+    '''Single-row scoring from concurrent threads, one call each vs the default micro-batch window
+
+    Each thread scores its own observations back to back, as a worker's
+    request threads would; the batched run sends them through a
+    MicroBatcher with the default POWER_MICROBATCH_* settings.
+    '''
+    from micro_batching import MicroBatcher, score_rows
+
+    rows = observation_rows(columns, 0, per_thread * max(concurrency))
+    moments = [datetime.fromisoformat(row['timestamp']) for row in rows]
+    batch_sizes = []
+
+    def counted(handle, batch, timestamps):
+        batch_sizes.append(len(batch))
+        return score_rows(handle, batch, timestamps)
+    batcher = MicroBatcher(score=counted)
+
+    def unbatched(i):
+        score_rows(handle, [rows[i]], [moments[i]])
+
+    def batched(i):
+        batcher.predict(handle, rows[i], moments[i])
+
+    def run(score, threads):
+        def work(offset):
+            for i in range(offset, offset + per_thread):
+                score(i)
+        workers = [threading.Thread(target=work, args=(t * per_thread,)) for t in range(threads)]
+        start = perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return threads * per_thread / (perf_counter() - start)
+
+    results = {}
+    for threads in concurrency:
+        run(batched, 1)  # warm-up, and starts the batcher thread
+        batch_sizes.clear()
+        results[f'{threads}_threads'] = {
+            'unbatched': {'requests_per_s': run(unbatched, threads)},
+            'batched': {'requests_per_s': run(batched, threads),
+                        'mean_batch_rows': float(np.mean(batch_sizes))},
+        }
+    return results
+
+# ---- startup ------------------------------------------------------------
+
+# Run in a fresh interpreter: times the app import and how long until a model can serve
+STARTUP_PROBE = """
+import sys, time
+start = time.perf_counter()
+import enhanced_flask_app as app
+imported = time.perf_counter() - start
+if app.MODEL_LOADING == 'off':
+    app.load_models()
+while app.registry.warming:
+    time.sleep(0.002)
+ready = time.perf_counter() - start
+print(imported * 1000, ready * 1000, len(app.registry), 'pandas' in sys.modules, 'sklearn' in sys.modules)
+"""
+
+def bench_startup(runs=3, modes=('eager', 'background', 'off')):
+    '''Cold-start cost of each POWER_MODEL_LOADING mode, median of `runs` fresh processes
+
+    import_ms is how long `import enhanced_flask_app` blocks; ready_ms is
+    when the first model can serve (after an explicit load_models() for
+    "off"); process_ms adds interpreter start-up, as seen by the parent.
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for mode in modes:
+        env = dict(os.environ, POWER_MODEL_LOADING=mode, POWER_LOG_LEVEL='WARNING',
+                   POWER_MODEL_WATCH_INTERVAL='0')
+        imported, ready, process = [], [], []
+        for _ in range(runs):
+            start = perf_counter()
+            out = subprocess.run([sys.executable, '-c', STARTUP_PROBE], cwd=here, env=env,
+                                 capture_output=True, text=True, check=True).stdout.split()
+            process.append((perf_counter() - start) * 1000)
+            imported.append(float(out[0]))
+            ready.append(float(out[1]))
+            models, pandas_loaded, sklearn_loaded = int(out[2]), out[3] == 'True', out[4] == 'True'
+        results[mode] = {
+            'import_ms': float(np.median(imported)),
+            'ready_ms': float(np.median(ready)),
+            'process_ms': float(np.median(process)),
+            'models': models,
+            'imports_pandas': pandas_loaded,
+            'imports_sklearn': sklearn_loaded,
+            'runs': runs,
+        }
+    return results
+
+# ---- worker scaling -----------------------------------------------------
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_until_ready(base_url, process, timeout=120):
+    deadline = perf_counter() + timeout
+    while perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + '/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        threading.Event().wait(0.25)
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+def _load_client(args):
+    '''One load-generating process: keep-alive POSTs until the deadline'''
+    port, rows, duration = args
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    bodies = [json.dumps(row) for row in rows]
+    headers = {'Content-Type': 'application/json'}
+    latencies = []
+    failures = 0
+    end = perf_counter() + duration
+    i = 0
+    while perf_counter() < end:
+        start = perf_counter()
+        conn.request('POST', '/api/predict', bodies[i % len(bodies)], headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(perf_counter() - start)
+        failures += response.status != 200
+        i += 1
+    conn.close()
+    return latencies, failures
+
+def bench_worker_scaling(columns, worker_counts, threads, duration, concurrency=None):
+    '''Requests/sec of /api/predict under gunicorn as the worker count grows'''
+    import multiprocessing
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    rows = observation_rows(columns, 0, 500)
+    results = {}
+    for workers in worker_counts:
+        port = _free_port()
+        env = dict(os.environ, POWER_WORKERS=str(workers), POWER_THREADS=str(threads),
+                   POWER_BIND=f'127.0.0.1:{port}', POWER_LOG_SAMPLE_RATE='0')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                  cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_until_ready(f'http://127.0.0.1:{port}', server)
+            clients = concurrency or 2 * workers * threads
+            print(f"   {workers} worker(s) x {threads} thread(s), {clients} clients, {duration:g}s...")
+            with multiprocessing.get_context('spawn').Pool(clients) as pool:
+                runs = pool.map(_load_client, [(port, rows, duration)] * clients)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        latencies = [t for run_latencies, _ in runs for t in run_latencies]
+        result = latency_summary(latencies)
+        result['requests_per_s'] = len(latencies) / duration
+        result['failures'] = sum(failures for _, failures in runs)
+        result['clients'] = clients
+        result['threads'] = threads
+        results[str(workers)] = result
+    return results
+
+# ---- results ------------------------------------------------------------
+
+def run_metadata(args, handle):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    import sklearn
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'model': handle.name if handle else None,
+        'model_version': handle.version if handle else None,
+        'inference_path': handle.predictor.kind if handle else None,
+        'seed': args.seed,
+        'requests': args.requests,
+        'batch_repeat': args.repeat,
+        'workers': args.workers,
+        'threads': args.threads,
+    }
+
+def flatten(results, prefix=''):
+    '''{"a": {"b": 1}} -> {"a.b": 1} for numeric leaves'''
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def is_compared_metric(name):
+    leaf = name.rsplit('.', 1)[-1]
+    return leaf in COMPARED_METRICS or leaf in HIGHER_IS_BETTER
+
+def compare_results(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    '''Metrics that got worse than the baseline by more than `tolerance` (relative)'''
+    now = flatten(current['results'])
+    before = flatten(baseline['results'])
+    regressions = []
+    for name, value in sorted(now.items()):
+        if name not in before or not is_compared_metric(name) or before[name] == 0:
+            continue
+        change = (value - before[name]) / before[name]
+        if name.rsplit('.', 1)[-1] in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append({'metric': name, 'baseline': before[name], 'current': value,
+                                'change_pct': round(change * 100, 1)})
+    return regressions
+
+def print_summary(results):
+    for mode in ('inprocess', 'server'):
+        if mode not in results:
+            continue
+        single = results[mode]['single']
+        print(f"🔹 {mode}: /api/predict p50 {single['p50_ms']:.2f} ms | "
+              f"p95 {single['p95_ms']:.2f} ms | p99 {single['p99_ms']:.2f} ms")
+        for size, batch in results[mode]['batch'].items():
+            print(f"   batch {size:>6}: p50 {batch['p50_ms']:.2f} ms | {batch['rows_per_s']:,.0f} rows/s")
+    if 'scaling' in results:
+        print("🔹 worker scaling (gunicorn, /api/predict):")
+        for workers, run in results['scaling'].items():
+            print(f"   {workers:>3} worker(s): {run['requests_per_s']:,.0f} req/s | "
+                  f"p50 {run['p50_ms']:.2f} ms | p99 {run['p99_ms']:.2f} ms")
+    if 'startup' in results:
+        print("🔹 startup (median of fresh processes):")
+        for mode, run in results['startup'].items():
+            print(f"   {mode:<10}: import {run['import_ms']:7.0f} ms | ready {run['ready_ms']:7.0f} ms | "
+                  f"process {run['process_ms']:7.0f} ms")
+    if 'microbatch' in results:
+        print("🔹 micro-batching (single-row scoring from concurrent threads):")
+        for threads, run in results['microbatch'].items():
+            print(f"   {threads:<12}: unbatched {run['unbatched']['requests_per_s']:8,.0f} req/s | "
+                  f"batched {run['batched']['requests_per_s']:8,.0f} req/s "
+                  f"(mean batch {run['batched']['mean_batch_rows']:.1f} rows)")
+    for section in ('micro', 'physics', 'forest'):
+        if section in results:
+            print(f"🔹 {section} benchmarks (median per call):")
+            for name, timing in results[section].items():
+                print(f"   {name:<42} {timing['median_us']:10.2f} µs")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the power generation prediction service")
+    parser.add_argument('--mode', choices=('inprocess', 'server', 'both'), default='inprocess',
+                        help="in-process test client, an HTTP server, or both")
+    parser.add_argument('--url', help="existing server to benchmark; by default a local server "
+                                      "is started in a background thread")
+    parser.add_argument('--requests', type=int, default=1000, help="single-prediction requests")
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')],
+                        default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument('--repeat', type=int, default=20, help="requests per batch size")
+    parser.add_argument('--samples', type=int, default=10000, help="synthetic observations to generate")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-micro', action='store_true', help="skip the micro-benchmarks")
+    parser.add_argument('--startup-runs', type=int, default=3,
+                        help="fresh processes per model-loading mode for the startup benchmark (0 = skip)")
+    parser.add_argument('--forest-trees', type=int, default=100,
+                        help="trees in the forest fitted for the tree-engine benchmark (0 = skip)")
+    parser.add_argument('--workers', type=lambda s: [int(x) for x in s.split(',')],
+                        help="also measure req/s under gunicorn for these worker counts, e.g. 1,2,4")
+    parser.add_argument('--threads', type=int, default=2, help="threads per gunicorn worker")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument('--concurrency', type=int,
+                        help="client processes (default: 2 x workers x threads)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slowdown flagged as a regression (default 0.10)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    columns = synthetic_observations(max(args.samples, max(args.batch_sizes)), seed=args.seed)
+
+    import enhanced_flask_app as app_module
+    handle = app_module.registry.get() if len(app_module.registry) else None
+    if handle is None and args.url is None:
+        print("❌ No model loaded - nothing to benchmark")
+        return 2
+
+    results = {}
+    modes = ('inprocess', 'server') if args.mode == 'both' else (args.mode,)
+    for mode in modes:
+        if mode == 'inprocess':
+            client = InProcessClient(app_module.app)
+        elif args.url:
+            client = HttpClient(args.url)
+        else:
+            client = LocalServerClient(app_module.app)
+        print(f"⏱️  Benchmarking {mode} ({getattr(client, 'base_url', 'test client')})...")
+        try:
+            results[mode] = {
+                'single': bench_single_requests(client, columns, args.requests),
+                'batch': bench_batches(client, columns, args.batch_sizes, args.repeat),
+            }
+        finally:
+            client.close()
+
+    if args.workers:
+        print("⏱️  Benchmarking worker scaling...")
+        results['scaling'] = bench_worker_scaling(columns, args.workers, args.threads,
+                                                  args.duration, args.concurrency)
+
+    if args.startup_runs > 0:
+        print("⏱️  Measuring startup...")
+        results['startup'] = bench_startup(args.startup_runs)
+
+    if not args.no_micro and handle is not None:
+        print("⏱️  Running micro-benchmarks...")
+        results['micro'] = bench_micro(app_module, columns)
+        results['physics'] = bench_physics(columns)
+        if args.forest_trees > 0:
+            print(f"⏱️  Fitting a {args.forest_trees}-tree forest for the tree-engine benchmark...")
+            results['forest'] = bench_forest(handle, columns, args.forest_trees)
+        print("⏱️  Comparing micro-batched and unbatched single-row scoring...")
+        results['microbatch'] = bench_microbatch(handle, columns)
+
+    report = {'meta': run_metadata(args, handle), 'results': results}
+    print_summary(results)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.tolerance)
+        report['comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance,
+                                'regressions': regressions}
+        if regressions:
+            print(f"⚠️  {len(regressions)} regression(s) vs {args.baseline}:")
+            for r in regressions:
+                print(f"   {r['metric']}: {r['baseline']:.4g} -> {r['current']:.4g} ({r['change_pct']:+.1f}%)")
+            status = 1
+        else:
+            print(f"✅ No regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
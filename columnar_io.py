@@ -0,0 +1,257 @@
+import io
+import math
+import struct
+import zipfile
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+from feature_engineering import INPUT_FIELDS, WEATHER_TYPES
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # Arrow support is optional; .npz bundles only need numpy
+    pa = None
+
+JSON_MEDIA_TYPE = 'application/json'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+NPZ_MEDIA_TYPE = 'application/x-npz'
+NUMERIC_FIELDS = tuple(field for field in INPUT_FIELDS if field != 'weather')
+MAX_NPZ_MEMBERS = 32
+MAX_VALUE_BYTES = 128  # widest value a column may hold: an ISO timestamp or label as UTF-32
+
+def columnar_media_types():
+    '''Binary media types this process can read and write'''
+    return (ARROW_MEDIA_TYPE, NPZ_MEDIA_TYPE) if pa is not None else (NPZ_MEDIA_TYPE,)
+
+def weather_codes(indices, categories):
+    '''Dictionary-encoded weather (indices into categories) as indices into WEATHER_TYPES
+
+    Only the handful of category labels are looked at in Python; the rows
+    themselves are remapped with one vectorized take.
+    '''
+    lookup = np.array([WEATHER_TYPES.index(str(label)) if str(label) in WEATHER_TYPES else -1
+                       for label in categories], dtype=np.int64)
+    indices = np.asarray(indices)
+    if indices.dtype.kind not in 'iu':
+        raise ValueError("Weather indices must be integers")
+    if len(indices) and (indices.min() < 0 or indices.max() >= len(lookup)):
+        raise ValueError("Weather indices out of range of the weather categories")
+    return lookup[indices]
+
+def _numeric(name, values):
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iuf':
+        raise ValueError(f"Column '{name}' must be numeric, got {values.dtype}")
+    return values.astype(np.float64, copy=False)  # no copy when already float64
+
+def _check_lengths(inputs, timestamps):
+    n_rows = len(inputs['temperature'])
+    for field in INPUT_FIELDS:
+        if len(inputs[field]) != n_rows:
+            raise ValueError(f"Column '{field}' has {len(inputs[field])} values, expected {n_rows}")
+    if timestamps is not None and len(timestamps) != n_rows:
+        raise ValueError(f"Column 'timestamp' has {len(timestamps)} values, expected {n_rows}")
+    return n_rows
+
+# ---- .npz bundles ----------------------------------------------------------
+
+def _npy_header(stream):
+    version = npy_format.read_magic(stream)
+    if version == (1, 0):
+        return npy_format.read_array_header_1_0(stream)
+    return npy_format.read_array_header_2_0(stream)
+
+def _check_column(name, shape, dtype, max_rows):
+    '''Refuse a column before its data is read: objects, more than one dimension, too many rows or bytes'''
+    if dtype.hasobject:
+        raise ValueError(f"Column '{name}' holds Python objects")
+    if len(shape) != 1:
+        raise ValueError(f"Column '{name}' must be one-dimensional, got shape {tuple(shape)}")
+    if dtype.itemsize > MAX_VALUE_BYTES:
+        raise ValueError(f"Column '{name}' values are {dtype.itemsize} bytes wide (limit {MAX_VALUE_BYTES})")
+    if max_rows is not None and shape[0] > max_rows:
+        raise ValueError(f"Batch too large: column '{name}' has {shape[0]} rows (limit {max_rows})")
+
+def _unreadable(name):
+    return ValueError(f"Invalid .npz payload: column '{name}' is not a readable .npy array "
+                      f"of numbers, labels or times")
+
+def _npz_member(body, archive, info, name, max_rows):
+    '''One column of the bundle, checked against the limits from its .npy header alone
+
+    Stored (uncompressed) members are viewed in place in the request body;
+    compressed ones are inflated only up to the size their header allows.
+    '''
+    stored = info.compress_type == zipfile.ZIP_STORED
+    try:
+        if stored:
+            name_length, extra_length = struct.unpack_from('<HH', body, info.header_offset + 26)
+            start = info.header_offset + 30 + name_length + extra_length
+            stream = io.BytesIO(body[start:start + min(info.file_size, 65536)])
+        else:
+            stream = archive.open(info)
+        shape, fortran_order, dtype = _npy_header(stream)
+    except (zipfile.BadZipFile, struct.error, ValueError, EOFError, OSError):
+        raise _unreadable(name)
+    _check_column(name, shape, dtype, max_rows)
+
+    count = math.prod(shape)
+    try:
+        if stored:
+            array = np.frombuffer(body, dtype=dtype, count=count, offset=start + stream.tell())
+        else:
+            with stream:
+                array = np.frombuffer(stream.read(count * dtype.itemsize), dtype=dtype, count=count)
+    except (zipfile.BadZipFile, ValueError, EOFError, OSError):
+        raise _unreadable(name)
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+def read_npz(body, max_rows=None):
+    '''Named arrays of an .npz bundle
+
+    np.load() copies every member out of the archive; stored (uncompressed)
+    members are viewed in place instead, so a bulk request costs one parse
+    of the zip directory and a few .npy headers, however many rows it has.
+    Every member's header is checked against max_rows and MAX_VALUE_BYTES
+    before its data is touched, so a small compressed body cannot inflate
+    into an arbitrarily large array.
+    '''
+    if not body.startswith(b'PK'):  # .npz is a zip archive
+        raise ValueError("Payload must be an .npz bundle of named arrays")
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(body))
+    except (zipfile.BadZipFile, struct.error, ValueError, EOFError):
+        raise ValueError("Invalid .npz payload: not a readable zip archive")
+    with archive:
+        members = archive.infolist()
+        if len(members) > MAX_NPZ_MEMBERS:
+            raise ValueError(f"Invalid .npz payload: {len(members)} arrays (limit {MAX_NPZ_MEMBERS})")
+        arrays = {}
+        for info in members:
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            arrays[name] = _npz_member(body, archive, info, name, max_rows)
+    return arrays
+
+def decode_npz(body, max_rows=None):
+    '''Columns from an uncompressed or compressed .npz bundle of .npy arrays
+
+    `weather` is either an array of labels, or integer codes together with
+    a `weather_categories` array of labels. `timestamp` is optional and may
+    be datetime64 or ISO strings. Pickled object arrays are refused.
+    '''
+    bundle = read_npz(body, max_rows)
+    for field in INPUT_FIELDS:
+        if field not in bundle:
+            raise ValueError(f"Missing required column: {field}")
+    inputs = {field: _numeric(field, bundle[field]) for field in NUMERIC_FIELDS}
+
+    weather = bundle['weather']
+    if 'weather_categories' in bundle:
+        inputs['weather'] = weather_codes(weather, bundle['weather_categories'])
+    elif weather.dtype.kind in 'US':
+        inputs['weather'] = weather
+    else:
+        raise ValueError("Integer 'weather' codes need a 'weather_categories' array")
+
+    timestamps = None
+    if 'timestamp' in bundle:
+        try:
+            timestamps = bundle['timestamp'].astype('datetime64[s]', copy=False)
+        except (ValueError, TypeError):
+            raise ValueError("Column 'timestamp' must be datetime64 or ISO-8601 strings")
+
+    return inputs, timestamps, _check_lengths(inputs, timestamps)
+
+def encode_npz(columns):
+    buffer = io.BytesIO()
+    np.savez(buffer, **columns)
+    return buffer.getvalue()
+
+# ---- Arrow IPC streams -----------------------------------------------------
+
+def _arrow_array(table, name):
+    column = table.column(name)
+    if column.null_count:
+        raise ValueError(f"Column '{name}' has missing values")
+    return column.combine_chunks()  # zero-copy for the usual single-chunk stream
+
+def read_arrow(body, max_rows=None):
+    '''Table of an Arrow IPC stream, read batch by batch so an oversized stream stops early'''
+    try:
+        reader = pa.ipc.open_stream(body)
+        batches, n_rows = [], 0
+        for batch in reader:
+            n_rows += batch.num_rows
+            if max_rows is not None and n_rows > max_rows:
+                raise ValueError(f"Batch too large: more than {max_rows} rows")
+            if max_rows is not None and batch.nbytes > max_rows * MAX_VALUE_BYTES * max(1, batch.num_columns):
+                raise ValueError(f"Batch too large: {batch.nbytes} bytes of column data")
+            batches.append(batch)
+        return pa.Table.from_batches(batches, schema=reader.schema)
+    except (pa.ArrowInvalid, OSError):
+        raise ValueError("Invalid Arrow IPC stream: the body is not a readable Arrow stream")
+
+def decode_arrow(body, max_rows=None):
+    '''Columns from an Arrow IPC stream; numeric buffers are viewed, not copied
+
+    `weather` may be a dictionary-encoded or a plain string column.
+    `timestamp` is optional: any timestamp unit, or ISO-8601 strings.
+    '''
+    table = read_arrow(body, max_rows)
+
+    for field in INPUT_FIELDS:
+        if field not in table.column_names:
+            raise ValueError(f"Missing required column: {field}")
+
+    inputs = {}
+    for field in NUMERIC_FIELDS:
+        array = _arrow_array(table, field)
+        if not (pa.types.is_integer(array.type) or pa.types.is_floating(array.type)):
+            raise ValueError(f"Column '{field}' must be numeric, got {array.type}")
+        inputs[field] = _numeric(field, array.to_numpy(zero_copy_only=False))
+
+    weather = _arrow_array(table, 'weather')
+    if not pa.types.is_dictionary(weather.type):
+        weather = weather.dictionary_encode()
+    inputs['weather'] = weather_codes(weather.indices.to_numpy(zero_copy_only=False),
+                                      weather.dictionary.to_pylist())
+
+    timestamps = None
+    if 'timestamp' in table.column_names:
+        array = table.column('timestamp').combine_chunks()
+        if pa.types.is_timestamp(array.type):
+            timestamps = pc.cast(array, pa.timestamp('s'), safe=False).to_numpy(zero_copy_only=False)
+        else:
+            try:
+                timestamps = np.array(array.to_pylist(), dtype='datetime64[s]')
+            except (ValueError, TypeError):
+                raise ValueError("Column 'timestamp' must be a timestamp or ISO-8601 strings")
+
+    return inputs, timestamps, _check_lengths(inputs, timestamps)
+
+def encode_arrow(columns, metadata=None):
+    table = pa.table(columns, metadata=metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+# ---- dispatch --------------------------------------------------------------
+
+def decode_columns(media_type, body, max_rows=None):
+    '''(inputs, timestamps or None, n_rows) from a binary columnar payload of at most max_rows rows'''
+    if media_type == NPZ_MEDIA_TYPE:
+        return decode_npz(body, max_rows)
+    if media_type == ARROW_MEDIA_TYPE and pa is not None:
+        return decode_arrow(body, max_rows)
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+def encode_columns(media_type, columns, metadata=None):
+    '''Serialize equal-length numpy columns; metadata (str -> str) goes into the Arrow schema'''
+    if media_type == NPZ_MEDIA_TYPE:
+        return encode_npz(columns)
+    if media_type == ARROW_MEDIA_TYPE and pa is not None:
+        return encode_arrow(columns, metadata)
+    raise ValueError(f"Unsupported media type: {media_type}")
@@ -1,82 +1,148 @@
-from flask import Flask, request, jsonify, render_template_string
-import joblib
-import pandas as pd
+from flask import Flask, Response, g, request, jsonify, render_template_string
 import numpy as np
 from datetime import datetime
 import os
-import traceback
 import warnings
+from columnar_io import (ARROW_MEDIA_TYPE, JSON_MEDIA_TYPE, NPZ_MEDIA_TYPE, columnar_media_types,
+                         decode_columns, encode_columns)
+from feature_engineering import INPUT_FIELDS, ORIGINAL_FEATURES, FeaturePipeline, is_series
+from inference import INTERVAL_LEVEL, predict_with_interval
+from metrics import NULL_TIMER, metrics
+from micro_batching import MicroBatcher
+from physics import estimate_generation_breakdown, physics_based_estimate
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry
+from rolling_store import RollingStore
+from service_logging import configure_logging, get_logger, request_sampler
 warnings.filterwarnings('ignore')
 
 app = Flask(__name__)
+logger = configure_logging()
+predict_logger = get_logger('predict')
 
-# Global variables for model components
-best_model = None
-backup_models = {}
-model_info = None
-model_type = None
-scaler = None
-feature_names = None
+# Larger request bodies get a 413 before they are read; a full JSON batch is about 10 MB
+DEFAULT_MAX_BODY_MB = 32
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('POWER_MAX_BODY_MB', DEFAULT_MAX_BODY_MB)) * 1024 * 1024)
+
+# All model packages in POWER_MODEL_DIR, preloaded into immutable handles
+registry = ModelRegistry(os.environ.get('POWER_MODEL_DIR', '.'))
+
+# Optional: gather concurrent single-row predictions into vectorized batches
+micro_batcher = MicroBatcher.from_env()
+
+# Predictions for repeated inputs, dropped whenever a model is (re)loaded
+prediction_cache = PredictionCache.from_env()
+if prediction_cache is not None:
+    registry.on_change(lambda name: prediction_cache.clear() if name is None
+                       else prediction_cache.invalidate_model(name))
+
+# Recent readings per site_id, so streaming sites get true rolling features
+rolling_store = RollingStore.from_env()
 
 def load_models():
     """Load all available models with error handling"""
-    global best_model, backup_models, model_info, model_type, scaler, feature_names
-    
-    models_loaded = []
-    
     try:
-        # Try to load the best model from comparison study
-        if os.path.exists('best_power_generation_model.pkl'):
-            model_package = joblib.load('best_power_generation_model.pkl')
-            best_model = model_package['model']
-            scaler = model_package.get('scaler', None)
-            feature_names = model_package['feature_names']
-            model_info = model_package.get('performance_metrics', {})
-            model_type = model_package.get('algorithm', model_package.get('model_type', 'Unknown'))
-            
-            print(f"✅ Best model loaded: {model_type}")
-            models_loaded.append(f"Best Model ({model_type})")
-            
-            # Store comparison results if available
-            if 'comparison_results' in model_package:
-                model_info.update(model_package['comparison_results'])
-            
-        # Try to load enhanced model as backup
-        elif os.path.exists('improved_power_generation_model.pkl'):
-            model_package = joblib.load('improved_power_generation_model.pkl')
-            best_model = model_package['model']
-            scaler = model_package['scaler']
-            feature_names = model_package['feature_names']
-            model_info = model_package.get('performance_metrics', {})
-            model_type = model_package.get('model_type', 'Enhanced Linear Regression')
-            
-            print(f"✅ Enhanced model loaded: {model_type}")
-            models_loaded.append(f"Enhanced Model ({model_type})")
-            
-        # Try to load original model as backup
-        elif os.path.exists('power_generation_model.pkl'):
-            model_package = joblib.load('power_generation_model.pkl')
-            best_model = model_package['model']
-            scaler = model_package['scaler']
-            feature_names = model_package['feature_columns']
-            model_info = model_package.get('performance', {})
-            model_type = 'Original Linear Regression'
-            
-            print(f"✅ Original model loaded: {model_type}")
-            models_loaded.append(f"Original Model ({model_type})")
-            
-        else:
-            print("❌ No model files found!")
+        if not registry.load_all():
+            logger.error("❌ No model files found!")
             return False
-            
-        return len(models_loaded) > 0
+        
+        default = registry.get()
+        logger.info(f"✅ Default model: {default.name} ({default.model_type})")
+        registry.start_watcher()
+        return True
             
     except Exception as e:
-        print(f"❌ Error loading models: {e}")
+        logger.exception(f"❌ Error loading models: {e}")
         return False
 
-# Load models on startup
-models_loaded = load_models()
+def select_model(data=None):
+    '''Model handle for this request: ?model= or a "model" field (name or version), else the default'''
+    key = request.args.get('model')
+    if key is None and isinstance(data, dict):
+        key = data.get('model')
+    return registry.get(key)
+
+def json_body(kinds=(dict,)):
+    '''The parsed JSON body if it is one of kinds, else None (malformed JSON included)'''
+    data = request.get_json(silent=True)
+    return data if isinstance(data, kinds) else None
+
+def invalid_body(expected="a JSON object"):
+    return jsonify({"error": f"Request body must be {expected}", "success": False}), 400
+
+@app.errorhandler(413)
+def body_too_large(error):
+    limit = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    return jsonify({"error": f"Request body too large (limit {limit:g} MB)", "success": False}), 413
+
+def invalid_input(error):
+    '''400 for input that failed validation, the same for single, batch and horizon requests
+
+    The parsers' ValueErrors name the field (and row). Anything else is a
+    payload of an unexpected shape: Python's own wording is logged, not
+    returned.
+    '''
+    if isinstance(error, ValueError):
+        return jsonify({"error": str(error), "success": False}), 400
+    predict_logger.warning("Unreadable payload: %s", error)
+    return jsonify({"error": "Payload fields must be numbers, weather labels and ISO-8601 timestamps, "
+                             "in the documented layout", "success": False}), 400
+
+def start_timer(endpoint):
+    '''Per-stage timer for this request, finished by record_request_metrics'''
+    g.timer = metrics.timer(endpoint)
+    return g.timer
+
+def request_timer():
+    return g.get('timer', NULL_TIMER)
+
+@app.after_request
+def record_request_metrics(response):
+    timer = g.pop('timer', None)
+    if timer is not None:
+        timer.finish(response.status_code)
+    return response
+
+def model_not_found(key):
+    return jsonify({
+        "error": f"Unknown model: {key}",
+        "success": False,
+        "available_models": [h.name for h in registry.handles()]
+    }), 404
+
+def is_columnar_request():
+    return request.mimetype in (ARROW_MEDIA_TYPE, NPZ_MEDIA_TYPE)
+
+def response_media_type(default=JSON_MEDIA_TYPE):
+    '''Media type for a series response: the Accept header's pick, else the request's own format'''
+    offered = [default] + [t for t in (JSON_MEDIA_TYPE,) + columnar_media_types() if t != default]
+    return request.accept_mimetypes.best_match(offered, default=default)
+
+# POWER_MODEL_LOADING: "eager" loads every model before the app is usable,
+# "background" serves at once and reports "warming" until the models are in,
+# "off" leaves loading to whoever imports the app (load_models()).
+MODEL_LOADING = os.environ.get('POWER_MODEL_LOADING', 'eager').lower()
+if MODEL_LOADING == 'background':
+    registry.load_all_async(then=registry.start_watcher)
+    models_loaded = False
+elif MODEL_LOADING == 'off':
+    models_loaded = False
+else:
+    models_loaded = load_models()
+
+def no_model_response():
+    '''503 while models are still loading in the background, 500 when there are none'''
+    if registry.warming:
+        return jsonify({
+            "error": "Models are still loading",
+            "success": False,
+            "status": "warming"
+        }), 503, {"Retry-After": "1"}
+    return jsonify({
+        "error": "No model loaded",
+        "success": False,
+        "message": "Model comparison study incomplete"
+    }), 500
 
 # Enhanced HTML Template with Dynamic Model Information
 HTML_TEMPLATE = '''<!DOCTYPE html>
@@ -899,14 +965,28 @@ def home():
 @app.route('/api/status')
 def status():
     '''Enhanced API endpoint to check model status with comparison data'''
+    try:
+        handle = select_model()
+    except KeyError as e:
+        if len(registry) and request.args.get('model'):
+            return model_not_found(e.args[0])
+        handle = None
+    model_info = handle.model_info if handle else None
     
     status_info = {
-        "model_loaded": best_model is not None,
-        "model_type": model_type,
-        "algorithm": model_type,
-        "feature_count": len(feature_names) if feature_names else 0,
+        "model_loaded": handle is not None,
+        "model_name": handle.name if handle else None,
+        "model_version": handle.version if handle else None,
+        "model_type": handle.model_type if handle else None,
+        "algorithm": handle.model_type if handle else None,
+        "feature_count": len(handle.feature_names) if handle else 0,
+        "inference_path": handle.predictor.kind if handle else None,
+        "feature_plan": handle.feature_pipeline.describe() if handle else None,
+        "models": registry.describe(),
+        "prediction_cache": prediction_cache.stats() if prediction_cache else None,
+        "rolling_store": rolling_store.stats() if rolling_store else None,
         "model_info": model_info or {},
-        "status": "running",
+        "status": "warming" if registry.warming else "running",
         "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
@@ -923,372 +1003,563 @@ def status():
     
     return jsonify(status_info)
 
-def create_enhanced_features_for_prediction(temp, weather, wind, humidity, barometer, solar_irradiance):
-    '''Create enhanced features for a single prediction matching training pipeline'''
-    
-    # Get current time for time-based features
-    now = datetime.now()
-    
-    # Basic features
-    features = {
-        'temp': temp,
-        'wind': wind,
-        'humidity': humidity,
-        'barometer': barometer,
-        'solar_irradiance': solar_irradiance,
-    }
-    
-    # Time features
-    features.update({
-        'hour': now.hour,
-        'day_of_week': now.weekday(),
-        'month': now.month,
-        'day_of_year': now.timetuple().tm_yday,
-        'week_of_year': now.isocalendar()[1],
-        'is_weekend': int(now.weekday() >= 5),
-        'is_weekday': int(now.weekday() < 5),
-        'is_monday': int(now.weekday() == 0),
-        'is_friday': int(now.weekday() == 4),
-    })
-    
-    # Polynomial features
-    features.update({
-        'temp_squared': temp ** 2,
-        'temp_cubed': temp ** 3,
-        'wind_squared': wind ** 2,
-        'wind_cubed': wind ** 3,
-        'wind_fourth': wind ** 4,
-        'humidity_squared': humidity ** 2,
-        'solar_squared': solar_irradiance ** 2,
-        'solar_sqrt': np.sqrt(solar_irradiance + 1e-6),
-        'solar_cubed': solar_irradiance ** 3,
-    })
-    
-    # Interaction features
-    features.update({
-        'temp_solar': temp * solar_irradiance,
-        'temp_wind': temp * wind,
-        'temp_humidity': temp * humidity,
-        'wind_solar': wind * solar_irradiance,
-        'wind_humidity': wind * humidity,
-        'solar_humidity': solar_irradiance * humidity,
-        'barometer_wind': barometer * wind,
-        'barometer_temp': barometer * temp,
-        'temp_wind_solar': temp * wind * solar_irradiance / 1000,
-        'temp_humidity_solar': temp * humidity * solar_irradiance / 10000,
-    })
-    
-    # Ratio features
-    features.update({
-        'solar_per_temp': solar_irradiance / (temp + 1e-6),
-        'wind_per_temp': wind / (temp + 1e-6),
-        'solar_per_humidity': solar_irradiance / (humidity + 1e-6),
-        'wind_per_humidity': wind / (humidity + 1e-6),
-        'temp_per_humidity': temp / (humidity + 1e-6),
-        'efficiency_ratio': solar_irradiance / (humidity + temp + 1e-6),
-        'power_density': (wind * solar_irradiance) / (temp + 1e-6),
-    })
-    
-    # Trigonometric features
-    features.update({
-        'hour_sin': np.sin(2 * np.pi * now.hour / 24),
-        'hour_cos': np.cos(2 * np.pi * now.hour / 24),
-        'day_sin': np.sin(2 * np.pi * now.timetuple().tm_yday / 365),
-        'day_cos': np.cos(2 * np.pi * now.timetuple().tm_yday / 365),
-        'month_sin': np.sin(2 * np.pi * now.month / 12),
-        'month_cos': np.cos(2 * np.pi * now.month / 12),
-        'week_sin': np.sin(2 * np.pi * now.weekday() / 7),
-        'week_cos': np.cos(2 * np.pi * now.weekday() / 7),
-    })
-    
-    # Weather dummy variables
-    weather_types = ['Clear', 'Sunny', 'Cloudy', 'Overcast', 'Rainy']
-    for weather_type in weather_types:
-        features[f'weather_{weather_type}'] = int(weather == weather_type)
-        
-        # Weather interactions
-        if weather == weather_type:
-            features[f'weather_{weather_type}_solar'] = solar_irradiance
-            features[f'weather_{weather_type}_temp'] = temp
-            features[f'weather_{weather_type}_wind'] = wind
-            features[f'weather_{weather_type}_humidity'] = humidity
+def create_basic_features_for_prediction(temp, weather, wind, humidity, barometer, solar_irradiance,
+                                         timestamp=None, state=None):
+    """The notebook's original features by name, built with the model's feature state
+
+    Weather codes and the GAS_mxm fill value come from state, so the
+    fallback encodes inputs exactly as the model saw them in training.
+    """
+    pipeline = FeaturePipeline(ORIGINAL_FEATURES, state=state)
+    row = pipeline.transform(temp, weather, wind, humidity, barometer, solar_irradiance,
+                             None if timestamp is None else [timestamp])[0]
+    return dict(zip(pipeline.feature_names, row.tolist()))
+
+MAX_BATCH_ROWS = 50000
+MAX_HORIZON_HOURS = 24 * 31
+MAX_REPORTED_ROWS = 10  # invalid rows named in a 400 response
+NUMERIC_FIELDS = [field for field in INPUT_FIELDS if field != 'weather']
+
+def parse_batch_payload(data):
+    '''Turn a row-oriented or column-oriented batch payload into input columns'''
+    if isinstance(data, list):
+        data = {'observations': data}
+    if not isinstance(data, dict):
+        raise ValueError("Batch payload must be a JSON object or array")
+
+    if 'columns' in data:
+        columns = data['columns']
+        if not isinstance(columns, dict):
+            raise ValueError("'columns' must be an object of arrays")
+        for field in INPUT_FIELDS:
+            if field not in columns:
+                raise ValueError(f"Missing required column: {field}")
+        for field in INPUT_FIELDS + ['timestamp']:
+            if field in columns and not isinstance(columns[field], list):
+                raise ValueError(f"Column '{field}' must be an array")
+        n_rows = len(columns['temperature'])
+        for field in INPUT_FIELDS:
+            if len(columns[field]) != n_rows:
+                raise ValueError(f"Column '{field}' has {len(columns[field])} values, expected {n_rows}")
+        inputs = {field: columns[field] for field in INPUT_FIELDS}
+        timestamps = columns.get('timestamp')
+    elif 'observations' in data:
+        rows = data['observations']
+        if not isinstance(rows, list):
+            raise ValueError("'observations' must be an array of objects")
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                raise ValueError(f"Observation {i} must be an object")
+            for field in INPUT_FIELDS:
+                if field not in row:
+                    raise ValueError(f"Missing required field '{field}' in observation {i}")
+        n_rows = len(rows)
+        inputs = {field: [row[field] for row in rows] for field in INPUT_FIELDS}
+        timestamps = [row.get('timestamp') for row in rows]
+    else:
+        raise ValueError("Batch payload needs an 'observations' array or a 'columns' object")
+
+    return finish_batch(inputs, timestamps, n_rows)
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+def invalid_rows(invalid, expected):
+    '''ValueError naming the rows (and their fields) of {row: [fields]} that failed validation'''
+    rows = sorted(invalid)
+    details = '; '.join(f"row {row}: {', '.join(invalid[row])}" for row in rows[:MAX_REPORTED_ROWS])
+    more = f" (and {len(rows) - MAX_REPORTED_ROWS} more)" if len(rows) > MAX_REPORTED_ROWS else ""
+    return ValueError(f"Invalid values in {len(rows)} row{'s' if len(rows) > 1 else ''}, "
+                      f"expected {expected}: {details}{more}")
+
+def check_inputs(inputs):
+    '''(columns with the numeric fields as float64 arrays, {row: [invalid fields]})'''
+    coerced = dict(inputs)
+    invalid = {}
+    for field in NUMERIC_FIELDS:
+        try:
+            column = np.asarray(inputs[field], dtype=np.float64)
+        except (ValueError, TypeError):
+            column = np.array([_as_number(value) for value in inputs[field]], dtype=np.float64)
+        if column.ndim > 1:
+            column = np.array([_as_number(value) for value in inputs[field]], dtype=np.float64)
+        for row in np.flatnonzero(~np.isfinite(column)).tolist():
+            invalid.setdefault(row, []).append(field)
+        coerced[field] = column
+
+    weather = inputs['weather']
+    if not isinstance(weather, str) and not (isinstance(weather, np.ndarray) and weather.dtype.kind in 'iuU'):
+        for row, label in enumerate(weather):
+            if not isinstance(label, str):
+                invalid.setdefault(row, []).append('weather')
+    return coerced, invalid
+
+def coerce_inputs(inputs):
+    '''Input columns with the numeric fields as float64 arrays
+
+    Raises ValueError naming the rows whose values are not finite numbers
+    (or whose weather is not a label), so one bad row is reported to the
+    client instead of silently sending the whole batch to the fallback.
+    '''
+    coerced, invalid = check_inputs(inputs)
+    if invalid:
+        raise invalid_rows(invalid, "finite numbers and weather labels")
+    return coerced
+
+def coerce_observation(data):
+    '''One observation's input fields as floats and a weather label
+
+    The same check coerce_inputs runs on every batch row; raises
+    ValueError naming the fields that fail it.
+    '''
+    coerced, invalid = check_inputs({field: [data[field]] for field in INPUT_FIELDS})
+    if invalid:
+        raise ValueError(f"Invalid values for {', '.join(invalid[0])}, "
+                         f"expected finite numbers and a weather label")
+    return {field: data[field] if field == 'weather' else float(coerced[field][0]) for field in INPUT_FIELDS}
+
+def finish_batch(inputs, timestamps, n_rows):
+    '''Check the batch size and values, and fill in missing timestamps'''
+    if n_rows == 0:
+        raise ValueError("Batch payload contains no observations")
+    if n_rows > MAX_BATCH_ROWS:
+        raise ValueError(f"Batch too large: {n_rows} rows (limit {MAX_BATCH_ROWS})")
+    inputs = coerce_inputs(inputs)
+
+    # Rows without an explicit timestamp are scored at the current time
+    now = np.datetime64(datetime.now().replace(microsecond=0))
+    if timestamps is None:
+        timestamps = np.full(n_rows, now)
+    elif isinstance(timestamps, np.ndarray) and timestamps.dtype.kind == 'M':
+        timestamps = np.where(np.isnat(timestamps), now, timestamps)
+    else:
+        if len(timestamps) != n_rows:
+            raise ValueError(f"Column 'timestamp' has {len(timestamps)} values, expected {n_rows}")
+        timestamps = parse_timestamps(timestamps, now)
+
+    return inputs, timestamps, n_rows
+
+def parse_timestamps(values, now):
+    '''datetime64[s] column of ISO-8601 times, None meaning now; raises ValueError naming bad rows'''
+    values = [now if value is None else value for value in values]
+    try:
+        return np.array(values, dtype='datetime64[s]')
+    except (ValueError, TypeError, OverflowError):
+        pass
+    invalid = {}
+    for row, value in enumerate(values):
+        try:
+            parse_timestamp(value)
+        except ValueError:
+            invalid[row] = ['timestamp']
+    raise invalid_rows(invalid or {0: ['timestamp']}, "ISO-8601 timestamps")
+
+def batch_series(flag, timestamps):
+    '''Whether a batch opted in to series mode ('series': true); rows are independent by default
+
+    A series is one site's consecutive observations, so rolling features
+    run over its rows in order. That only makes sense when the client
+    says so and the timestamps are strictly increasing.
+    '''
+    if isinstance(flag, str):
+        flag = {'true': True, '1': True, 'false': False, '0': False}.get(flag.lower(), flag)
+    if flag is None:
+        return False
+    if not isinstance(flag, bool):
+        raise ValueError("'series' must be true or false")
+    if flag and not is_series(timestamps):
+        raise ValueError("A series batch needs strictly increasing timestamps on every row")
+    return flag
+
+def parse_timestamp(value, field='timestamp'):
+    '''Parse an ISO-8601 forecast time into a naive datetime (seconds resolution)'''
+    try:
+        parsed = np.datetime64(value, 's')
+    except (ValueError, TypeError, OverflowError):
+        parsed = np.datetime64('NaT')
+    if np.isnat(parsed):
+        raise ValueError(f"Invalid {field}: {value!r}, expected an ISO-8601 time")
+    return parsed.astype(datetime)
+
+def expand_horizon(data):
+    '''Expand start + horizon_hours into an hourly grid with one input value per step
+
+    Each weather field may be a single value (held constant over the horizon)
+    or a list with exactly one value per hour.
+    '''
+    try:
+        horizon = int(data['horizon_hours'])
+    except (ValueError, TypeError):
+        raise ValueError("horizon_hours must be an integer")
+    if not 1 <= horizon <= MAX_HORIZON_HOURS:
+        raise ValueError(f"horizon_hours must be between 1 and {MAX_HORIZON_HOURS}")
+
+    if data.get('start') is not None:
+        start = np.datetime64(parse_timestamp(data['start'], 'start'), 'h')
+    else:
+        start = np.datetime64(datetime.now(), 'h') + 1  # next full hour
+
+    inputs = {}
+    for field in INPUT_FIELDS:
+        if field not in data:
+            raise ValueError(f"Missing required field: {field}")
+        value = data[field]
+        if isinstance(value, list):
+            if len(value) != horizon:
+                raise ValueError(f"Field '{field}' has {len(value)} values, expected {horizon}")
         else:
-            features[f'weather_{weather_type}_solar'] = 0
-            features[f'weather_{weather_type}_temp'] = 0
-            features[f'weather_{weather_type}_wind'] = 0
-            features[f'weather_{weather_type}_humidity'] = 0
-    
-    # Time interactions
-    features.update({
-        'hour_temp': now.hour * temp,
-        'hour_solar': now.hour * solar_irradiance,
-        'hour_wind': now.hour * wind,
-        'weekend_solar': features['is_weekend'] * solar_irradiance,
-        'weekday_wind': features['is_weekday'] * wind,
-    })
-    
-    # Logarithmic transformations
-    features.update({
-        'log_solar': np.log1p(solar_irradiance),
-        'log_wind': np.log1p(wind),
-        'log_temp': np.log1p(temp + 50),
-        'log_humidity': np.log1p(humidity),
-    })
-    
-    # Binned features (approximate)
-    features.update({
-        'temp_bins': min(5, max(0, int((temp - 10) / 5))),
-        'wind_bins': min(5, max(0, int(wind / 5))),
-        'solar_bins': min(5, max(0, int(solar_irradiance / 200))),
-        'humidity_bins': min(4, max(0, int((humidity - 20) / 20))),
-        'barometer_bins': min(3, max(0, int((barometer - 980) / 20))),
-    })
-    
-    # Rolling features (simplified for single prediction)
-    features.update({
-        'temp_rolling_3': temp,
-        'wind_rolling_3': wind,
-        'solar_rolling_3': solar_irradiance,
-        'humidity_rolling_3': humidity,
-        'temp_rolling_std': 0,
-        'wind_rolling_std': 0,
-        'solar_rolling_std': 0,
-    })
-    
-    # Domain-specific features
-    features.update({
-        'solar_efficiency': solar_irradiance * (1 - 0.004 * max(0, temp - 25)),
-        'wind_power_factor': 0 if wind < 3 else (min(1, ((wind - 3) / 9) ** 3) if wind < 12 else (1 if wind < 25 else 0)),
-        'solar_elevation': max(0, np.sin(np.pi * (now.hour - 6) / 12)),
-        'solar_azimuth': np.cos(2 * np.pi * now.timetuple().tm_yday / 365),
-        'effective_solar': solar_irradiance * max(0, np.sin(np.pi * (now.hour - 6) / 12)) * np.cos(2 * np.pi * now.timetuple().tm_yday / 365),
-        'peak_solar_hours': int(10 <= now.hour <= 15),
-        'morning_ramp': int(6 <= now.hour <= 10),
-        'evening_ramp': int(15 <= now.hour <= 19),
-        'night_time': int(now.hour <= 5 or now.hour >= 20),
-        'is_daylight': int(6 <= now.hour <= 18),
-    })
-    
-    # Seasonal factors
-    features.update({
-        'summer': int(6 <= now.month <= 8),
-        'winter': int(now.month == 12 or now.month <= 2),
-        'spring': int(3 <= now.month <= 5),
-        'autumn': int(9 <= now.month <= 11),
-    })
-    
-    # Season-weather interactions
-    features.update({
-        'summer_clear': features['summer'] * features.get('weather_Clear', 0),
-        'winter_solar': features['winter'] * solar_irradiance,
-        'spring_wind': features['spring'] * wind,
-        'autumn_temp': features['autumn'] * temp,
-    })
-    
-    # Optimal conditions indicators
-    features.update({
-        'optimal_solar': int(solar_irradiance > 600 and temp < 30 and features.get('weather_Clear', 0) == 1),
-        'optimal_wind': int(8 < wind < 15),
-        'optimal_combined': features['optimal_solar'] * features['optimal_wind'],
-    })
-    
-    # Original model features (for compatibility)
-    features.update({
-        'solar_hour_factor': max(0, np.sin(np.pi * (now.hour - 6) / 12)),
-        'season': ((now.month - 1) // 3) + 1,
-        'summer_factor': int(6 <= now.month <= 8),
-        'weather_encoded': {'Clear': 0, 'Sunny': 1, 'Cloudy': 2, 'Overcast': 3, 'Rainy': 4}.get(weather, 0),
-        'GAS_mxm': 0,  # Placeholder for compatibility
+            value = [value]  # broadcast by the feature pipeline
+        inputs[field] = value
+
+    timestamps = (start + np.arange(horizon)).astype('datetime64[s]')
+    return coerce_inputs(inputs), timestamps, horizon
+
+def score_observations(handle, inputs, timestamps, series=False):
+    '''(predictions, method, bounds, fallback_rows) for validated input columns
+
+    bounds is (lower, upper) at INTERVAL_LEVEL from the same pass, or None.
+    series=True runs the rolling features over the rows in order; otherwise
+    every row is scored on its own. Rows the model cannot score (a
+    non-finite prediction) get the physics-based estimate and NaN bounds,
+    and their indices are returned in fallback_rows. If the model itself
+    fails, the whole batch is physics-based.
+    '''
+    timer = request_timer()
+    n_rows = len(timestamps)
+    try:
+        X_input = handle.feature_pipeline.transform(
+            inputs['temperature'],
+            inputs['weather'],
+            inputs['wind'],
+            inputs['humidity'],
+            inputs['barometer'],
+            inputs['solar_irradiance'],
+            timestamps,
+            series=series
+        )
+        timer.mark('features')
+        predictions, bounds = predict_with_interval(handle.predictor, X_input)
+        timer.mark('predict')
+
+    except Exception as model_error:
+        predict_logger.exception("Batch model scoring failed, using the physics-based estimate: %s", model_error)
+        predictions = physics_based_estimate(inputs['wind'], inputs['solar_irradiance'])
+        timer.mark('fallback')
+        return np.broadcast_to(predictions, (n_rows,)), "physics_based", None, np.arange(n_rows)
+
+    failed = np.flatnonzero(~np.isfinite(predictions))
+    if len(failed):
+        predict_logger.warning("Model gave no prediction for %d of %d rows, using the physics-based estimate",
+                               len(failed), n_rows)
+        wind = np.broadcast_to(inputs['wind'], (n_rows,))[failed]
+        solar = np.broadcast_to(inputs['solar_irradiance'], (n_rows,))[failed]
+        predictions[failed] = physics_based_estimate(wind, solar)
+        if bounds is not None:
+            bounds[0][failed] = bounds[1][failed] = np.nan
+        timer.mark('fallback')
+    return predictions, "enhanced", bounds, failed
+
+def series_response(handle, inputs, timestamps, predictions, method_used,
+                    media_type=JSON_MEDIA_TYPE, bounds=None, fallback_rows=(), **extra):
+    '''Column-oriented body shared by the batch and horizon forecasts, as JSON or binary columns
+
+    fallback_rows lists the rows of a model-scored batch that got the
+    physics-based estimate instead; their bounds are null.
+    '''
+    n_rows = len(timestamps)
+    fallback_rows = list(fallback_rows) if method_used == "enhanced" else []
+    solar_estimate, wind_estimate, backup_estimate = estimate_generation_breakdown(
+        predictions, inputs['wind'], inputs['solar_irradiance']
+    )
+    timer = request_timer()
+    timer.mark('breakdown')
+    timer.method = method_used
+    timer.rows = n_rows
+
+    base_confidence = 85 if method_used == "enhanced" else 60
+    if 'test_r2_score' in handle.model_info:
+        base_confidence = min(95, max(base_confidence, int(handle.model_info['test_r2_score'] * 100)))
+
+    if media_type != JSON_MEDIA_TYPE:
+        return columnar_response(handle, timestamps, predictions, method_used, base_confidence,
+                                 (solar_estimate, wind_estimate, backup_estimate), media_type, bounds,
+                                 fallback_rows)
+
+    def column(values):
+        values = np.round(np.broadcast_to(values, (n_rows,)), 2).tolist()
+        return [None if value != value else value for value in values] if fallback_rows else values
+
+    body = {"count": n_rows}
+    body.update(extra)
+    body.update({
+        "timestamps": np.datetime_as_string(timestamps, unit='s').tolist(),
+        "predicted_generation": column(predictions),
+        "solar_estimate": column(solar_estimate),
+        "wind_estimate": column(wind_estimate),
+        "backup_estimate": column(backup_estimate),
+        "confidence": base_confidence,
+        "prediction_method": method_used,
+        "model_name": handle.name,
+        "model_version": handle.version,
+        "model_type": handle.model_type,
+        "algorithm": handle.model_type,
+        "feature_count": len(handle.feature_names),
+        "success": True
     })
-    
-    return features
-
-def create_basic_features_for_prediction(temp, weather, wind, humidity, barometer, solar_irradiance):
-    """Create basic features that should work with most models"""
-    
-    now = datetime.now()
-    
-    # Start with essential features
-    features = {
-        'temp': temp,
-        'wind': wind,
-        'humidity': humidity,
-        'barometer': barometer,
-        'solar_irradiance': solar_irradiance,
-        'hour': now.hour,
-        'day_of_week': now.weekday(),
-        'month': now.month,
-        'day_of_year': now.timetuple().tm_yday,
-        'is_weekend': int(now.weekday() >= 5),
-        'is_daylight': int(6 <= now.hour <= 18),
-        'solar_hour_factor': max(0, np.sin(np.pi * (now.hour - 6) / 12)),
-        'wind_squared': wind ** 2,
-        'wind_cubed': wind ** 3,
-        'temp_solar_interaction': temp * solar_irradiance / 1000,
-        'humidity_temp': humidity * temp / 100,
-        'season': ((now.month - 1) // 3) + 1,
-        'summer_factor': int(6 <= now.month <= 8),
-        'weather_encoded': {'Clear': 0, 'Sunny': 1, 'Cloudy': 2, 'Overcast': 3, 'Rainy': 4}.get(weather, 0),
-        'GAS_mxm': 0  # Placeholder
+    if fallback_rows:
+        body["fallback_rows"] = [int(row) for row in fallback_rows]
+    if bounds is not None:
+        body.update({
+            "prediction_lower": column(bounds[0]),
+            "prediction_upper": column(bounds[1]),
+            "interval_level": INTERVAL_LEVEL,
+        })
+    return jsonify(body)
+
+def columnar_response(handle, timestamps, predictions, method_used, confidence, estimates, media_type,
+                      bounds=None, fallback_rows=()):
+    '''Full-precision float64 columns; the scalar fields travel as X-Power-* headers
+
+    When some rows fell back to the physics estimate, a physics_fallback
+    column (1 for those rows) says which.
+    '''
+    n_rows = len(timestamps)
+    def column(values):
+        return np.ascontiguousarray(np.broadcast_to(np.asarray(values, dtype=np.float64), (n_rows,)))
+
+    solar_estimate, wind_estimate, backup_estimate = (column(values) for values in estimates)
+    columns = {
+        "timestamp": timestamps.astype('datetime64[s]'),
+        "predicted_generation": column(predictions),
+        "solar_estimate": solar_estimate,
+        "wind_estimate": wind_estimate,
+        "backup_estimate": backup_estimate,
     }
-    
-    return features
+    fields = {
+        "count": n_rows,
+        "confidence": confidence,
+        "prediction_method": method_used,
+        "model_name": handle.name,
+        "model_version": handle.version,
+        "model_type": handle.model_type,
+    }
+    if bounds is not None:
+        columns["prediction_lower"] = column(bounds[0])
+        columns["prediction_upper"] = column(bounds[1])
+        fields["interval_level"] = INTERVAL_LEVEL
+    if len(fallback_rows):
+        fallback = np.zeros(n_rows, dtype=np.uint8)
+        fallback[np.asarray(fallback_rows)] = 1
+        columns["physics_fallback"] = fallback
+        fields["fallback_rows"] = len(fallback_rows)
+    body = encode_columns(media_type, columns, {k: str(v) for k, v in fields.items()})
+    headers = {f"X-Power-{k.replace('_', '-').title()}": str(v) for k, v in fields.items()}
+    return Response(body, mimetype=media_type, headers=headers)
+
+def predict_columnar():
+    '''Score an Arrow IPC stream or .npz bundle posted to /api/predict or /api/predict/batch'''
+    timer = request_timer()
+    if request.mimetype not in columnar_media_types():
+        return jsonify({"error": f"{request.mimetype} is not supported here (pyarrow is not installed)",
+                        "success": False}), 415
+    try:
+        inputs, timestamps, n_rows = finish_batch(*decode_columns(request.mimetype, request.get_data(),
+                                                                  max_rows=MAX_BATCH_ROWS))
+        series = batch_series(request.args.get('series'), timestamps)
+    except (ValueError, TypeError) as e:
+        return invalid_input(e)
+
+    try:
+        handle = select_model()
+    except KeyError as e:
+        return model_not_found(e.args[0])
+    timer.mark('parse')
+
+    predictions, method_used, bounds, fallback_rows = score_observations(handle, inputs, timestamps, series)
+    if request_sampler.sample():
+        predict_logger.info("columnar rows=%d format=%s method=%s mean_prediction=%.2f",
+                            n_rows, request.mimetype, method_used, float(np.mean(predictions)))
+    return series_response(handle, inputs, timestamps, predictions, method_used,
+                           media_type=response_media_type(request.mimetype), bounds=bounds,
+                           fallback_rows=fallback_rows)
+
+def predict_horizon(handle, data):
+    '''Score every hour of a start + horizon_hours forecast in one pass'''
+    try:
+        inputs, timestamps, horizon = expand_horizon(data)
+    except (ValueError, TypeError) as e:
+        return invalid_input(e)
+
+    # The hourly grid is one site's forecast, so it is always a series
+    predictions, method_used, bounds, fallback_rows = score_observations(handle, inputs, timestamps, series=True)
+
+    if request_sampler.sample():
+        predict_logger.info("horizon start=%s hours=%d method=%s mean_prediction=%.2f",
+                            timestamps[0], horizon, method_used, float(np.mean(predictions)))
+
+    return series_response(handle, inputs, timestamps, predictions, method_used,
+                           media_type=response_media_type(), bounds=bounds, fallback_rows=fallback_rows,
+                           start=np.datetime_as_string(timestamps[0], unit='s'),
+                           horizon_hours=horizon, step="1h")
 
 @app.route('/api/predict', methods=['POST'])
 def predict_api():
     '''Enhanced API endpoint for predictions using the best model'''
-    if not best_model:
-        return jsonify({
-            "error": "No model loaded",
-            "success": False,
-            "message": "Model comparison study incomplete"
-        }), 500
+    timer = start_timer('predict')
+    if not len(registry):
+        return no_model_response()
+    
+    # Binary columnar bodies are scored like a batch
+    if is_columnar_request():
+        return predict_columnar()
     
+    # Arrays, scalars and malformed JSON are rejected before any field is read
+    data = json_body()
+    if data is None:
+        return invalid_body()
+    
+    handle = None
     try:
-        data = request.json
         timestamp = datetime.now()
         
-        # Validate input data
-        required_fields = ['temperature', 'weather', 'wind', 'humidity', 'barometer', 'solar_irradiance']
-        for field in required_fields:
+        # One handle for the whole request, even if a new model is swapped in meanwhile
+        try:
+            handle = select_model(data)
+        except KeyError as e:
+            return model_not_found(e.args[0])
+        timer.mark('parse')
+        
+        # Forecast horizon: expand server-side and score all steps at once
+        if 'horizon_hours' in data:
+            return predict_horizon(handle, data)
+        
+        # Optional forecast time for the time-based features
+        forecast_time = None
+        if data.get('timestamp') is not None:
+            try:
+                forecast_time = parse_timestamp(data['timestamp'])
+            except ValueError as e:
+                return invalid_input(e)
+        
+        # Validate input data: the same finite-number and weather-label check as a batch row
+        for field in INPUT_FIELDS:
             if field not in data:
                 return jsonify({
                     "error": f"Missing required field: {field}",
                     "success": False
                 }), 400
+        try:
+            row = coerce_observation(data)
+        except ValueError as e:
+            return invalid_input(e)
+        
+        # A reading from a streaming site joins its history, which feeds the rolling features
+        site_id = data.get('site_id')
+        rolling = None
+        if site_id is not None and rolling_store is not None:
+            site_rolling = rolling_store.update(site_id, row, forecast_time or timestamp)
+            if handle.feature_pipeline.uses_rolling and rolling_store.serves(handle.feature_pipeline.state):
+                rolling = site_rolling
         
         # Try enhanced features first, fall back to basic if needed
         prediction = None
+        bounds = None
         method_used = "enhanced"
         
+        cache_key = None
+        if prediction_cache is not None and rolling is None:  # history makes inputs unrepeatable
+            try:
+                cache_key = prediction_cache.key(handle, row, forecast_time or timestamp)
+            except (ValueError, TypeError):
+                pass  # unusable input is left to the normal error handling
+        
         try:
-            # Create enhanced features
-            all_features = create_enhanced_features_for_prediction(
-                data['temperature'],
-                data['weather'], 
-                data['wind'],
-                data['humidity'],
-                data['barometer'],
-                data['solar_irradiance']
-            )
-            
-            # Create DataFrame with all possible features
-            input_df = pd.DataFrame([all_features])
-            
-            # Debug: Print feature information
-            print(f"Created features: {len(input_df.columns)}")
-            print(f"Required features: {len(feature_names)}")
-            
-            # Find missing and extra features
-            missing_features = [f for f in feature_names if f not in input_df.columns]
-            extra_features = [f for f in input_df.columns if f not in feature_names]
-            
-            if missing_features:
-                print(f"Missing features ({len(missing_features)}): {missing_features[:10]}...")  # Show first 10
-            if extra_features:
-                print(f"Extra features ({len(extra_features)}): {extra_features[:10]}...")  # Show first 10
-            
-            # Create a dataframe with only the required features
-            X_input = pd.DataFrame()
-            
-            for feature in feature_names:
-                if feature in input_df.columns:
-                    X_input[feature] = input_df[feature]
-                else:
-                    # Fill missing features with appropriate defaults
-                    if 'optimal' in feature.lower():
-                        X_input[feature] = 0  # Binary features default to 0
-                    elif 'rolling' in feature.lower():
-                        # For rolling features, use the base feature value
-                        base_feature = feature.replace('_rolling_3', '').replace('_rolling_std', '')
-                        if base_feature in input_df.columns:
-                            X_input[feature] = input_df[base_feature]
-                        else:
-                            X_input[feature] = 0
-                    elif any(weather_type in feature for weather_type in ['Clear', 'Sunny', 'Cloudy', 'Overcast', 'Rainy']):
-                        # Weather interaction features
-                        X_input[feature] = 0
-                    elif feature in ['GAS_mxm']:
-                        # Model-specific features
-                        X_input[feature] = 0
-                    else:
-                        # Default to 0 for unknown features
-                        X_input[feature] = 0
-                        print(f"Setting unknown feature '{feature}' to 0")
-            
-            print(f"Final feature matrix shape: {X_input.shape}")
-            
-            # Scale features if model requires it
-            if scaler is not None:
-                X_input_scaled = scaler.transform(X_input)
+            if cache_key is not None and (cached := prediction_cache.get(cache_key)) is not None:
+                # Same model, inputs and hour as an earlier request
+                prediction, bounds = cached
+                timer.mark('cache')
+            elif micro_batcher is not None and rolling is None:
+                # Scored together with other requests arriving in the same window
+                prediction, bounds = micro_batcher.predict(handle, row, forecast_time)
+                timer.mark('microbatch')
             else:
-                X_input_scaled = X_input.values
+                # Build exactly the model's feature columns in one pass
+                X_input = handle.feature_pipeline.transform(
+                    row['temperature'],
+                    row['weather'], 
+                    row['wind'],
+                    row['humidity'],
+                    row['barometer'],
+                    row['solar_irradiance'],
+                    None if forecast_time is None else [forecast_time],
+                    rolling=rolling
+                )
+                timer.mark('features')
+                
+                # Make prediction (scaling is folded into the predictor), non-negative
+                predictions, row_bounds = predict_with_interval(handle.predictor, X_input)
+                prediction = float(predictions[0])
+                if row_bounds is not None:
+                    bounds = (float(row_bounds[0][0]), float(row_bounds[1][0]))
+                timer.mark('predict')
             
-            # Make prediction
-            prediction = best_model.predict(X_input_scaled)[0]
-            prediction = max(0, prediction)  # Ensure non-negative
+            if cache_key is not None and np.isfinite(prediction):
+                prediction_cache.put(cache_key, (prediction, bounds))
             
         except Exception as enhanced_error:
-            print(f"Enhanced features failed: {enhanced_error}")
+            predict_logger.warning("Enhanced features failed: %s", enhanced_error)
+            bounds = None
             
             # Fall back to basic features
             try:
                 basic_features = create_basic_features_for_prediction(
-                    data['temperature'],
-                    data['weather'], 
-                    data['wind'],
-                    data['humidity'],
-                    data['barometer'],
-                    data['solar_irradiance']
+                    row['temperature'],
+                    row['weather'], 
+                    row['wind'],
+                    row['humidity'],
+                    row['barometer'],
+                    row['solar_irradiance'],
+                    forecast_time,
+                    state=handle.feature_pipeline.state
                 )
                 
-                input_df_basic = pd.DataFrame([basic_features])
-                
                 # Try to use only features that exist in both basic and required
-                available_features = [f for f in feature_names if f in input_df_basic.columns]
+                available_features = [f for f in handle.feature_names if f in basic_features]
                 
                 if len(available_features) < 5:  # Need at least 5 features
                     raise Exception("Insufficient matching features for prediction")
                 
-                print(f"Using {len(available_features)} basic features for prediction")
-                X_input = input_df_basic[available_features]
-                
-                # Add missing features as zeros
-                for feature in feature_names:
-                    if feature not in X_input.columns:
-                        X_input[feature] = 0
-                
-                # Reorder to match training
-                X_input = X_input[feature_names]
+                # Missing features are zeros, columns in training order
+                X_input = np.array([[basic_features.get(f, 0) for f in handle.feature_names]], dtype=np.float64)
                 
-                if scaler is not None:
-                    X_input_scaled = scaler.transform(X_input)
-                else:
-                    X_input_scaled = X_input.values
-                
-                prediction = best_model.predict(X_input_scaled)[0]
+                prediction = handle.predictor.predict(X_input)[0]
+                if not np.isfinite(prediction):
+                    raise ValueError("Basic features gave no prediction")
                 prediction = max(0, prediction)
                 method_used = "basic"
                 
             except Exception as basic_error:
-                print(f"Basic features also failed: {basic_error}")
-                
-                # Ultimate fallback: simple estimation
-                temp = data['temperature']
-                wind_speed = data['wind']
-                solar_rad = data['solar_irradiance']
-                weather = data['weather']
-                
-                # Simple physics-based estimation
-                solar_factor = 1.0 if weather in ['Clear', 'Sunny'] else (0.4 if weather == 'Cloudy' else 0.2)
-                solar_est = (solar_rad / 1000) * 50 * solar_factor
-                
-                wind_est = wind_speed * 2.5 if wind_speed > 3 else 0
+                predict_logger.warning("Basic features also failed: %s", basic_error)
                 
-                temp_factor = 1 - abs(temp - 25) * 0.01  # Optimal around 25°C
-                prediction = (solar_est + wind_est) * temp_factor
-                prediction = max(10, prediction)  # Minimum generation
+                # Ultimate fallback: the plant's physical model
+                prediction = float(physics_based_estimate(row['wind'], row['solar_irradiance']))
                 method_used = "physics_based"
+            
+            timer.mark('fallback')
+        
+        # A row the model cannot score (a non-finite prediction) gets the physics estimate, as in a batch
+        if not np.isfinite(prediction):
+            predict_logger.warning("Model gave no prediction, using the physics-based estimate")
+            prediction = float(physics_based_estimate(row['wind'], row['solar_irradiance']))
+            bounds = None
+            method_used = "physics_based"
+            timer.mark('fallback')
+        
+        timer.method = method_used
+        model_info = handle.model_info
         
         # Calculate confidence based on method used and model performance
         if method_used == "enhanced":
@@ -1303,20 +1574,9 @@ def predict_api():
             base_confidence = min(95, max(base_confidence, int(r2_score * 100)))
         
         # Estimate generation breakdown
-        temp = data['temperature']
-        wind_speed = data['wind']
-        solar_rad = data['solar_irradiance']
-        weather = data['weather']
-        
-        # Solar generation estimate
-        solar_factor = 1.0 if weather in ['Clear', 'Sunny'] else (0.4 if weather == 'Cloudy' else 0.2)
-        solar_estimate = min(prediction * 0.6, (solar_rad / 1000) * 50 * solar_factor)
-        
-        # Wind generation estimate
-        wind_estimate = min(prediction * 0.4, wind_speed * 2.5 if wind_speed > 3 else 0)
-        
-        # Backup generation
-        backup_estimate = max(0, prediction - solar_estimate - wind_estimate)
+        breakdown = estimate_generation_breakdown(prediction, row['wind'], row['solar_irradiance'])
+        solar_estimate, wind_estimate, backup_estimate = (float(part) for part in breakdown)
+        timer.mark('breakdown')
         
         # Format model information
         model_performance = ""
@@ -1331,17 +1591,31 @@ def predict_api():
         if model_info and 'improvement_r2' in model_info:
             improvement_text = f"+{model_info['improvement_r2']:.1f}% R² improvement over baseline"
         
+        if request_sampler.sample():
+            predict_logger.info("predict method=%s prediction=%.2f inputs=%s",
+                                method_used, prediction, row)
+        
         return jsonify({
             "predicted_generation": round(prediction, 2),
             "solar_estimate": round(solar_estimate, 2),
             "wind_estimate": round(wind_estimate, 2),
             "backup_estimate": round(backup_estimate, 2),
             "confidence": base_confidence,
+            "prediction_interval": None if bounds is None else {
+                "lower": round(bounds[0], 2),
+                "upper": round(bounds[1], 2),
+                "level": INTERVAL_LEVEL,
+            },
             "prediction_method": method_used,
             "timestamp": timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            "model_type": model_type,
-            "algorithm": model_type,
-            "feature_count": len(feature_names),
+            "forecast_time": (forecast_time or timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+            "model_name": handle.name,
+            "model_version": handle.version,
+            "model_type": handle.model_type,
+            "site_id": site_id,
+            "rolling_features": "site_history" if rolling is not None else "single_observation",
+            "algorithm": handle.model_type,
+            "feature_count": len(handle.feature_names),
             "model_r2": model_performance.split('|')[0].strip() if model_performance else "N/A",
             "model_accuracy": model_performance.split('|')[1].strip() if '|' in model_performance else "N/A",
             "improvement": improvement_text,
@@ -1350,39 +1624,179 @@ def predict_api():
         
     except Exception as e:
         error_msg = f"Prediction error: {str(e)}"
-        print(error_msg)
-        print(traceback.format_exc())
+        predict_logger.exception(error_msg)
         
         return jsonify({
             "error": error_msg,
             "success": False,
-            "model_type": model_type,
-            "feature_count": len(feature_names) if feature_names else 0
+            "model_type": handle.model_type if handle else None,
+            "feature_count": len(handle.feature_names) if handle else 0
+        }), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch_api():
+    '''Score many weather observations in one vectorized pass'''
+    timer = start_timer('predict_batch')
+    if not len(registry):
+        return no_model_response()
+
+    if is_columnar_request():
+        return predict_columnar()
+
+    data = json_body((dict, list))
+    if data is None:
+        return invalid_body("a JSON object or array")
+    try:
+        inputs, timestamps, n_rows = parse_batch_payload(data)
+        series = batch_series(data.get('series') if isinstance(data, dict) else None, timestamps)
+    except (ValueError, TypeError) as e:
+        return invalid_input(e)
+
+    try:
+        handle = select_model(data)
+    except KeyError as e:
+        return model_not_found(e.args[0])
+    timer.mark('parse')
+
+    try:
+        predictions, method_used, bounds, fallback_rows = score_observations(handle, inputs, timestamps, series)
+
+        if request_sampler.sample():
+            predict_logger.info("batch rows=%d method=%s mean_prediction=%.2f",
+                                n_rows, method_used, float(np.mean(predictions)))
+
+        return series_response(handle, inputs, timestamps, predictions, method_used,
+                               media_type=response_media_type(), bounds=bounds, fallback_rows=fallback_rows)
+
+    except Exception as e:
+        error_msg = f"Batch prediction error: {str(e)}"
+        predict_logger.exception(error_msg)
+
+        return jsonify({
+            "error": error_msg,
+            "success": False,
+            "model_type": handle.model_type,
+            "feature_count": len(handle.feature_names)
         }), 500
 
 @app.route('/api/model-comparison')
 def model_comparison():
     '''API endpoint to get detailed model comparison results'''
+    handle = registry.get() if len(registry) else None
+    model_type = handle.model_type if handle else None
     
     comparison_data = {
         "current_model": model_type,
-        "model_loaded": best_model is not None,
-        "performance_metrics": model_info or {},
+        "model_loaded": handle is not None,
+        "performance_metrics": handle.model_info if handle else {},
         "feature_engineering": "Enhanced" if "Enhanced" in str(model_type) or "Random Forest" in str(model_type) else "Basic",
-        "deployment_status": "Production Ready" if best_model else "Not Available",
+        "deployment_status": "Production Ready" if handle else "Not Available",
+        "available_models": [h.summary() for h in registry.handles()],
         "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
     return jsonify(comparison_data)
 
+@app.route('/api/health')
+def health():
+    '''Liveness probe: the process is up and serving requests, possibly still warming up'''
+    return jsonify({
+        "status": "warming" if registry.warming else "ok",
+        "models": len(registry),
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+@app.route('/api/ready')
+def ready():
+    '''Readiness probe: passes only once at least one model is loaded'''
+    if not len(registry):
+        return jsonify({"ready": False, "models": 0,
+                        "status": "warming" if registry.warming else "no_models"}), 503
+    return jsonify({"ready": True, "models": len(registry), "default": registry.default_name})
+
+@app.route('/api/metrics')
+def metrics_endpoint():
+    '''Prometheus-style latency histograms and request counters'''
+    if not metrics.enabled:
+        return Response("# metrics disabled (POWER_METRICS=0)\n", status=404, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/models')
+def list_models():
+    '''Loaded model handles, their versions and which one is the default'''
+    return jsonify(dict(registry.describe(), success=True))
+
+def admin_authorized():
+    '''Admin calls need X-Admin-Token = POWER_ADMIN_TOKEN, or come from localhost if no token is set'''
+    token = os.environ.get('POWER_ADMIN_TOKEN')
+    if token:
+        return request.headers.get('X-Admin-Token') == token
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/api/admin/models/load', methods=['POST'])
+def admin_load_model():
+    '''Load a model package in the background and swap it in without a restart'''
+    if not admin_authorized():
+        return jsonify({"error": "Not authorized", "success": False}), 403
+
+    data = json_body()
+    if data is None:
+        return invalid_body()
+    if 'path' not in data:
+        return jsonify({"error": "Missing required field: path", "success": False}), 400
+
+    make_default = bool(data.get('default', False))
+    try:
+        if data.get('wait', False):
+            handle = registry.load(data['path'], data.get('name'), make_default)
+            return jsonify({"model": handle.summary(), "default": registry.default_name, "success": True})
+        registry.load_async(data['path'], data.get('name'), make_default)
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    except Exception as e:
+        logger.exception(f"❌ Model load failed: {e}")
+        return jsonify({"error": f"Model load failed: {str(e)}", "success": False}), 500
+
+    return jsonify({"status": "loading", "path": data['path'], "success": True}), 202
+
+@app.route('/api/admin/models/default', methods=['POST'])
+def admin_set_default_model():
+    '''Route requests without an explicit model to another loaded model'''
+    if not admin_authorized():
+        return jsonify({"error": "Not authorized", "success": False}), 403
+
+    data = json_body()
+    if data is None:
+        return invalid_body()
+    key = data.get('model')
+    try:
+        handle = registry.set_default(key)
+    except KeyError:
+        return model_not_found(key)
+    return jsonify({"default": handle.name, "version": handle.version, "success": True})
+
+@app.route('/api/admin/models/reload', methods=['POST'])
+def admin_reload_models():
+    '''Reload model files that changed on disk and pick up new ones'''
+    if not admin_authorized():
+        return jsonify({"error": "Not authorized", "success": False}), 403
+
+    swapped = registry.reload_changed()
+    return jsonify({"reloaded": swapped, "default": registry.default_name, "success": True})
+
 if __name__ == '__main__':
     print("🚀 Starting Enhanced Power Generation Flask API with Dynamic Model Selection...")
     print("="*80)
 
-    if models_loaded:
+    if MODEL_LOADING == 'background':
+        print("⏳ Model Status: loading in the background - /api/ready turns 200 when done")
+    elif models_loaded:
+        default = registry.get()
+        model_info = default.model_info
         print("✅ Model Status: Best model loaded successfully")
-        print(f"✅ Algorithm: {model_type}")
-        print(f"✅ Features: {len(feature_names) if feature_names else 'Unknown'}")
+        print(f"✅ Algorithm: {default.model_type}")
+        print(f"✅ Features: {len(default.feature_names)}")
+        print(f"✅ Models loaded: {', '.join(h.name for h in registry.handles())} (default: {default.name})")
         
         if model_info:
             if 'test_r2_score' in model_info:
@@ -1398,15 +1812,30 @@ if __name__ == '__main__':
             if 'improvement_r2' in model_info:
                 print(f"✅ Improvement over baseline: +{model_info['improvement_r2']:.1f}% R²")
                 
-        print(f"✅ Scaling: {'StandardScaler' if scaler else 'None (Tree-based model)'}")
+        if default.model is None:
+            print(f"✅ Format: portable {os.path.basename(default.path)} ({default.predictor.kind} inference)")
+        else:
+            print(f"✅ Scaling: {'StandardScaler' if default.scaler else 'None (Tree-based model)'}")
     else:
         print("⚠️  Model Status: No models loaded - check model files")
     
-    print(f"📱 Enhanced Web Interface: http://localhost:5000")
+    # The debugger runs arbitrary code for whoever reaches it, so it is opt-in and local by default
+    debug = os.environ.get('POWER_DEBUG', '0').lower() not in ('0', 'false', 'no', 'off', '')
+    host = os.environ.get('POWER_HOST', '127.0.0.1')
+    port = int(os.environ.get('POWER_PORT', 5000))
+    if debug and host not in ('127.0.0.1', 'localhost', '::1'):
+        print(f"⚠️  POWER_DEBUG is on and the server listens on {host}: anyone who can reach it can run code")
+
+    print(f"📱 Enhanced Web Interface: http://{host}:{port}")
     print(f"🔌 API Endpoints:")
     print(f"   • POST /api/predict - Make predictions with best model")
+    print(f"   • POST /api/predict/batch - Vectorized predictions for many observations")
     print(f"   • GET  /api/status - Check model status and comparison data")
     print(f"   • GET  /api/model-comparison - Detailed comparison results")
+    print(f"   • GET  /api/models - Loaded models and versions")
+    print(f"   • GET  /api/metrics - Prometheus latency and request metrics")
+    print(f"   • GET  /api/health, /api/ready - Liveness and readiness probes")
+    print(f"   • POST /api/admin/models/load - Load and hot-swap a model package")
     print("="*80)
     print("🎯 Features:")
     print("   • Dynamic best model selection")
@@ -1415,6 +1844,8 @@ if __name__ == '__main__':
     print("   • Confidence scoring")
     print("   • Renewable energy breakdown")
     print("   • Production-ready deployment")
+    print(f"💡 Development server (debug {'on' if debug else 'off'}) - "
+          f"for production use: gunicorn -c gunicorn.conf.py wsgi:app")
     print("="*80)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=debug, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,644 @@
+import numpy as np
+from collections import namedtuple
+from datetime import datetime
+from functools import cached_property
+
+WEATHER_TYPES = ['Clear', 'Sunny', 'Cloudy', 'Overcast', 'Rainy']
+INPUT_FIELDS = ['temperature', 'weather', 'wind', 'humidity', 'barometer', 'solar_irradiance']
+# Training frame columns (the notebook's names) in FeaturePipeline.transform order
+TRAINING_COLUMNS = ['temp', 'weather', 'wind', 'humidity', 'barometer', 'solar_irradiance']
+
+# Binned features: source column and the pd.cut(bins=...) count used in training
+BINNED_FEATURES = {
+    'temp_bins': ('temp', 6),
+    'wind_bins': ('wind', 6),
+    'solar_bins': ('solar_irradiance', 6),
+    'humidity_bins': ('humidity', 5),
+    'barometer_bins': ('barometer', 4),
+}
+# Rolling features: source column and statistic; the window per statistic is learned state
+ROLLING_FEATURES = {
+    'temp_rolling_3': ('temp', 'mean'),
+    'wind_rolling_3': ('wind', 'mean'),
+    'solar_rolling_3': ('solar_irradiance', 'mean'),
+    'humidity_rolling_3': ('humidity', 'mean'),
+    'temp_rolling_std': ('temp', 'std'),
+    'wind_rolling_std': ('wind', 'std'),
+    'solar_rolling_std': ('solar_irradiance', 'std'),
+}
+DEFAULT_ROLLING_WINDOWS = {'mean': 3, 'std': 5}
+# Training columns a request cannot supply; served as their training mean
+UNOBSERVED_FEATURES = ('GAS_mxm',)
+
+# Model inputs selected by the notebook, in its column order
+ORIGINAL_FEATURES = [
+    'temp', 'wind', 'humidity', 'barometer', 'solar_irradiance',
+    'hour', 'day_of_week', 'month', 'day_of_year', 'is_weekend',
+    'is_daylight', 'solar_hour_factor', 'wind_squared', 'wind_cubed',
+    'temp_solar_interaction', 'humidity_temp', 'season', 'summer_factor',
+    'weather_encoded', 'GAS_mxm',
+]
+ENHANCED_FEATURES = [
+    'temp', 'wind', 'humidity', 'barometer', 'solar_irradiance',
+    'temp_squared', 'temp_cubed', 'wind_squared', 'wind_cubed', 'wind_fourth',
+    'humidity_squared', 'solar_squared', 'solar_sqrt', 'solar_cubed',
+    'temp_solar', 'temp_wind', 'temp_humidity', 'wind_solar', 'wind_humidity',
+    'solar_humidity', 'barometer_wind', 'barometer_temp', 'temp_wind_solar', 'temp_humidity_solar',
+    'solar_per_temp', 'wind_per_temp', 'solar_per_humidity', 'wind_per_humidity',
+    'temp_per_humidity', 'efficiency_ratio', 'power_density',
+    'hour_sin', 'hour_cos', 'day_sin', 'day_cos', 'month_sin', 'month_cos', 'week_sin', 'week_cos',
+    *(f'weather_{weather_type}_{term}' for weather_type in WEATHER_TYPES
+      for term in ('solar', 'temp', 'wind', 'humidity')),
+    'hour', 'day_of_week', 'month', 'day_of_year', 'week_of_year',
+    'is_weekend', 'is_weekday', 'is_monday', 'is_friday',
+    'hour_temp', 'hour_solar', 'hour_wind', 'weekend_solar', 'weekday_wind',
+    'log_solar', 'log_wind', 'log_temp', 'log_humidity',
+    *BINNED_FEATURES,
+    *ROLLING_FEATURES,
+    'solar_efficiency', 'wind_power_factor', 'solar_elevation', 'solar_azimuth', 'effective_solar',
+    'peak_solar_hours', 'morning_ramp', 'evening_ramp', 'night_time',
+    'summer', 'winter', 'spring', 'autumn',
+    'summer_clear', 'winter_solar', 'spring_wind', 'autumn_temp',
+    'optimal_solar', 'optimal_wind', 'optimal_combined',
+]
+
+def time_components(timestamps):
+    """Vectorized calendar fields for an array of timestamps (datetime64 or ISO strings)"""
+    ts = np.asarray(timestamps, dtype='datetime64[s]')
+    days = ts.astype('datetime64[D]')
+    day_number = days.astype(np.int64)
+    years = days.astype('datetime64[Y]')
+
+    hour = ((ts - days).astype('timedelta64[h]')).astype(np.int64)
+    weekday = (day_number + 3) % 7  # 1970-01-01 was a Thursday; Monday == 0
+    month = (days.astype('datetime64[M]') - years.astype('datetime64[M]')).astype(np.int64) + 1
+    day_of_year = (days - years.astype('datetime64[D]')).astype(np.int64) + 1
+
+    # ISO week: the week belongs to the year containing its Thursday
+    thursday = days - weekday.astype('timedelta64[D]') + np.timedelta64(3, 'D')
+    thursday_year = thursday.astype('datetime64[Y]').astype('datetime64[D]')
+    week_of_year = (thursday - thursday_year).astype(np.int64) // 7 + 1
+
+    return {
+        'hour': hour,
+        'day_of_week': weekday,
+        'month': month,
+        'day_of_year': day_of_year,
+        'week_of_year': week_of_year,
+    }
+
+def encode_weather(weather):
+    """Map weather labels to indices into WEATHER_TYPES (-1 for unknown labels)
+
+    An integer array is taken to hold such indices already, as decoded from
+    dictionary-encoded binary payloads, and is passed through unchanged.
+    """
+    if isinstance(weather, np.ndarray) and weather.dtype.kind in 'iu':
+        return weather.astype(np.int64, copy=False)
+    labels, inverse = np.unique(np.asarray(weather, dtype=object).astype(str), return_inverse=True)
+    lookup = np.array([WEATHER_TYPES.index(label) if label in WEATHER_TYPES else -1 for label in labels],
+                      dtype=np.int64)
+    return lookup[inverse.reshape(-1)]
+
+def compute_time_features(t):
+    """Every feature that depends only on the calendar fields in t"""
+    hour = t['hour']
+    weekday = t['day_of_week']
+    month = t['month']
+    yday = t['day_of_year']
+    solar_elevation = np.maximum(0, np.sin(np.pi * (hour - 6) / 12))
+    summer = ((month >= 6) & (month <= 8)).astype(np.int64)
+
+    features = {
+        'hour': hour,
+        'day_of_week': weekday,
+        'month': month,
+        'day_of_year': yday,
+        'week_of_year': t['week_of_year'],
+        'is_weekend': (weekday >= 5).astype(np.int64),
+        'is_weekday': (weekday < 5).astype(np.int64),
+        'is_monday': (weekday == 0).astype(np.int64),
+        'is_friday': (weekday == 4).astype(np.int64),
+
+        'hour_sin': np.sin(2 * np.pi * hour / 24),
+        'hour_cos': np.cos(2 * np.pi * hour / 24),
+        'day_sin': np.sin(2 * np.pi * yday / 365),
+        'day_cos': np.cos(2 * np.pi * yday / 365),
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+        'week_sin': np.sin(2 * np.pi * weekday / 7),
+        'week_cos': np.cos(2 * np.pi * weekday / 7),
+
+        'solar_elevation': solar_elevation,
+        'solar_azimuth': np.cos(2 * np.pi * yday / 365),
+        'peak_solar_hours': ((hour >= 10) & (hour <= 15)).astype(np.int64),
+        'morning_ramp': ((hour >= 6) & (hour <= 10)).astype(np.int64),
+        'evening_ramp': ((hour >= 15) & (hour <= 19)).astype(np.int64),
+        'night_time': ((hour <= 5) | (hour >= 20)).astype(np.int64),
+        'is_daylight': ((hour >= 6) & (hour <= 18)).astype(np.int64),
+
+        'summer': summer,
+        'winter': ((month == 12) | (month <= 2)).astype(np.int64),
+        'spring': ((month >= 3) & (month <= 5)).astype(np.int64),
+        'autumn': ((month >= 9) & (month <= 11)).astype(np.int64),
+
+        'solar_hour_factor': solar_elevation,
+        'season': ((month - 1) // 3) + 1,
+        'summer_factor': summer,
+    }
+
+    # Tables are shared between requests, so nobody may modify them in place
+    for values in features.values():
+        values.setflags(write=False)
+    return features
+
+def _calendar_fields(moment):
+    '''Calendar fields of a single datetime as length-1 arrays'''
+    return {
+        'hour': np.array([moment.hour]),
+        'day_of_week': np.array([moment.weekday()]),
+        'month': np.array([moment.month]),
+        'day_of_year': np.array([moment.timetuple().tm_yday]),
+        'week_of_year': np.array([moment.isocalendar()[1]]),
+    }
+
+class TimeFeatureCache:
+    """Time-only features memoized per (date, hour) bucket.
+
+    None of the time features look at minutes or seconds, so the table
+    for the current bucket is computed once and reused until the clock
+    crosses into the next hour (or day). Explicit timestamps are reduced
+    to their unique hour buckets before anything is computed.
+    """
+
+    max_buckets = 1024
+
+    def __init__(self, clock=datetime.now):
+        self.clock = clock
+        self._current = (None, None)
+        self._buckets = {}
+
+    def current(self):
+        '''Table of length-1 arrays for the clock's current hour'''
+        now = self.clock()
+        bucket = (now.year, now.month, now.day, now.hour)
+        key, table = self._current
+        if key != bucket:
+            table = compute_time_features(_calendar_fields(now))
+            # Swap key and table together so concurrent readers never mix them
+            self._current = (bucket, table)
+        return table
+
+    def for_moment(self, moment):
+        '''Table of length-1 arrays for one datetime, kept for recently used hours'''
+        bucket = (moment.year, moment.month, moment.day, moment.hour)
+        table = self._buckets.get(bucket)
+        if table is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._buckets = {}
+            table = self._buckets[bucket] = compute_time_features(_calendar_fields(moment))
+        return table
+
+    def for_timestamps(self, timestamps):
+        '''(table over unique hour buckets, row -> bucket index or None)'''
+        if len(timestamps) == 1 and isinstance(timestamps[0], datetime):
+            return self.for_moment(timestamps[0]), None  # single forecast time
+        buckets = np.atleast_1d(np.asarray(timestamps, dtype='datetime64[s]')).astype('datetime64[h]')
+        unique, inverse = np.unique(buckets, return_inverse=True)
+        table = compute_time_features(time_components(unique))
+        if unique.shape[0] == 1:
+            return table, None  # length-1 columns broadcast over the batch
+        return table, inverse.reshape(-1)
+
+time_feature_cache = TimeFeatureCache()
+
+def learn_bin_edges(values, n_bins):
+    '''Edges pd.cut(values, bins=n_bins) would use'''
+    values = np.asarray(values, dtype=np.float64)
+    low, high = values.min(), values.max()
+    if low == high:
+        low -= 0.001 * abs(low) if low != 0 else 0.001
+        high += 0.001 * abs(high) if high != 0 else 0.001
+        return np.linspace(low, high, n_bins + 1)
+    edges = np.linspace(low, high, n_bins + 1)
+    edges[0] -= (high - low) * 0.001  # pd.cut widens the first bin to include the minimum
+    return edges
+
+def rolling_statistic(values, window, statistic):
+    '''pandas' rolling(window, min_periods=1).mean(), or .std().fillna(0), over rows in order'''
+    n_rows = len(values)
+    padded = np.concatenate([np.full(window - 1, np.nan), values])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    counts = np.minimum(np.arange(1, n_rows + 1), window)
+    mean = np.nansum(windows, axis=1) / counts
+    if statistic == 'mean':
+        return mean
+    squares = np.nansum((windows - mean[:, None]) ** 2, axis=1)
+    return np.where(counts > 1, np.sqrt(squares / np.maximum(counts - 1, 1)), 0.0)
+
+def is_series(timestamps):
+    '''True when rows could be consecutive observations (strictly increasing timestamps)
+
+    Increasing timestamps alone do not make a series: rows from different
+    sites can be sorted by time too. Use this to check a batch the caller
+    declared a series, never to guess.
+    '''
+    if timestamps is None or len(timestamps) < 2:
+        return False
+    ts = np.asarray(timestamps, dtype='datetime64[s]')
+    return bool(np.all(ts[1:] > ts[:-1]))
+
+class FeatureState:
+    """Everything feature engineering learns from the training rows.
+
+    Saved in the model package under 'feature_state' as plain lists and
+    numbers (so a .pmf header can carry it too) and given to
+    FeaturePipeline, which then bins, encodes and fills columns exactly
+    as training did. A state that learned nothing follows the notebook's
+    recipe: LabelEncoder weather codes, fixed-width approximate bins and
+    zeros for unobserved columns.
+    """
+
+    def __init__(self, bin_edges=None, weather_classes=None, rolling_windows=None, defaults=None):
+        self.bin_edges = {name: np.asarray(edges, dtype=np.float64) for name, edges in (bin_edges or {}).items()}
+        # LabelEncoder sorts its classes, so the notebook's codes are alphabetical
+        self.weather_classes = [str(label) for label in (weather_classes or sorted(WEATHER_TYPES))]
+        self.rolling_windows = {**DEFAULT_ROLLING_WINDOWS, **(rolling_windows or {})}
+        self.defaults = {name: float(value) for name, value in (defaults or {}).items()}
+
+        # WEATHER_TYPES index -> training code; the trailing 0 is what unknown labels (-1) get
+        self.weather_lookup = np.array(
+            [self.weather_classes.index(label) if label in self.weather_classes else 0
+             for label in WEATHER_TYPES] + [0], dtype=np.int64)
+
+    @classmethod
+    def fit(cls, frame, rolling_windows=None):
+        '''Learn bin edges, weather classes and fill values from training columns
+
+        frame maps the notebook's column names (temp, weather, wind, ...,
+        optionally GAS_mxm) to values; a DataFrame will do. Pass only the
+        training rows, or the held-out rows leak into the bin edges.
+        '''
+        bin_edges = {name: learn_bin_edges(frame[source], n_bins)
+                     for name, (source, n_bins) in BINNED_FEATURES.items()}
+        weather_classes = sorted(set(np.asarray(frame['weather'], dtype=object).astype(str)))
+        defaults = {name: float(np.mean(frame[name])) for name in UNOBSERVED_FEATURES if name in frame}
+        return cls(bin_edges, weather_classes, rolling_windows, defaults)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data) if data else cls()
+
+    def as_dict(self):
+        return {
+            'bin_edges': {name: edges.tolist() for name, edges in self.bin_edges.items()},
+            'weather_classes': list(self.weather_classes),
+            'rolling_windows': dict(self.rolling_windows),
+            'defaults': dict(self.defaults),
+        }
+
+    def describe(self):
+        '''JSON-friendly summary for the status endpoint'''
+        return {
+            'learned_bins': sorted(self.bin_edges),
+            'weather_classes': list(self.weather_classes),
+            'rolling_windows': dict(self.rolling_windows),
+            'defaults': dict(self.defaults),
+        }
+
+class FeatureContext:
+    """Input columns for one batch plus intermediates shared between features.
+
+    Intermediates are computed on first use, so a pipeline only pays for
+    the time and weather fields its model actually needs. Rolling features
+    run over the rows in order when the batch is a series; otherwise every
+    row stands alone, like the first row of a training frame.
+    """
+
+    def __init__(self, temp, weather, wind, humidity, barometer, solar_irradiance, timestamps=None,
+                 time_cache=None, state=None, series=False, rolling=None):
+        # Length-1 columns broadcast against full ones in every feature expression
+        self.temp = np.atleast_1d(np.asarray(temp, dtype=np.float64))
+        self.wind = np.atleast_1d(np.asarray(wind, dtype=np.float64))
+        self.humidity = np.atleast_1d(np.asarray(humidity, dtype=np.float64))
+        self.barometer = np.atleast_1d(np.asarray(barometer, dtype=np.float64))
+        self.solar = np.atleast_1d(np.asarray(solar_irradiance, dtype=np.float64))
+        self.n_rows = max(len(self.temp), len(self.wind), len(self.humidity),
+                          len(self.barometer), len(self.solar),
+                          1 if isinstance(weather, str) else len(weather),
+                          1 if timestamps is None else len(timestamps))
+        self.weather = weather
+        self.timestamps = timestamps
+        self.time_cache = time_cache or time_feature_cache
+        self.state = state or FeatureState()
+        self.series = series and self.n_rows > 1
+        self.rolling_values = rolling or {}  # rolling features kept elsewhere, e.g. per site
+        self._time_columns = {}
+
+    @cached_property
+    def zeros(self):
+        return np.zeros(self.n_rows)
+
+    def source(self, name):
+        '''Input column by its training frame name'''
+        return self.solar if name == 'solar_irradiance' else getattr(self, name)
+
+    def bins(self, name, approximate):
+        '''Bin index with the edges learned in training, else the fixed-width approximation'''
+        values = self.source(BINNED_FEATURES[name][0])
+        edges = self.state.bin_edges.get(name)
+        if edges is None:
+            return approximate(values)
+        # Values outside the training range land in the first or last bin
+        return np.searchsorted(edges[1:-1], values, side='left')
+
+    def rolling(self, name):
+        if name in self.rolling_values:
+            return self.rolling_values[name]
+        source, statistic = ROLLING_FEATURES[name]
+        values = self.source(source)
+        if not self.series:
+            return values if statistic == 'mean' else self.zeros
+        values = np.broadcast_to(values, (self.n_rows,))
+        return rolling_statistic(values, self.state.rolling_windows[statistic], statistic)
+
+    def fill(self, name):
+        return np.array([self.state.defaults.get(name, 0.0)])
+
+    @cached_property
+    def weather_code(self):
+        if isinstance(self.weather, str):
+            code = WEATHER_TYPES.index(self.weather) if self.weather in WEATHER_TYPES else -1
+            return np.array([code], dtype=np.int64)
+        return encode_weather(self.weather)
+
+    @cached_property
+    def time_table(self):
+        if self.timestamps is None:
+            return self.time_cache.current(), None
+        return self.time_cache.for_timestamps(self.timestamps)
+
+    def time(self, name):
+        '''Time-only feature expanded to the batch's rows'''
+        column = self._time_columns.get(name)
+        if column is None:
+            table, inverse = self.time_table
+            column = table[name] if inverse is None else table[name][inverse]
+            self._time_columns[name] = column
+        return column
+
+    @cached_property
+    def is_clear(self):
+        return (self.weather_code == 0).astype(np.int64)
+
+    @cached_property
+    def optimal_solar(self):
+        return ((self.solar > 600) & (self.temp < 30) & (self.is_clear == 1)).astype(np.int64)
+
+    @cached_property
+    def optimal_wind(self):
+        return ((self.wind > 8) & (self.wind < 15)).astype(np.int64)
+
+def _wind_power_factor(wind):
+    return np.where(wind < 3, 0.0,
+           np.where(wind < 12, np.minimum(1, ((wind - 3) / 9) ** 3),
+           np.where(wind < 25, 1.0, 0.0)))
+
+def _weather_features(index, weather_type):
+    is_type = lambda c: (c.weather_code == index).astype(np.int64)
+    return {
+        f'weather_{weather_type}': is_type,
+        f'weather_{weather_type}_solar': lambda c: is_type(c) * c.solar,
+        f'weather_{weather_type}_temp': lambda c: is_type(c) * c.temp,
+        f'weather_{weather_type}_wind': lambda c: is_type(c) * c.wind,
+        f'weather_{weather_type}_humidity': lambda c: is_type(c) * c.humidity,
+    }
+
+def _time_feature(name):
+    return lambda c: c.time(name)
+
+def _rolling_feature(name):
+    return lambda c: c.rolling(name)
+
+TIME_FEATURE_NAMES = list(compute_time_features(_calendar_fields(datetime(2024, 1, 1))))
+
+# Every feature the notebook's create_enhanced_features and
+# prepare_original_features build, as column functions over a FeatureContext.
+# Training and serving both go through these; features that only depend on
+# the clock come from TimeFeatureCache.
+FEATURE_DEFINITIONS = {name: _time_feature(name) for name in TIME_FEATURE_NAMES}
+
+FEATURE_DEFINITIONS.update({
+    # Basic features
+    'temp': lambda c: c.temp,
+    'wind': lambda c: c.wind,
+    'humidity': lambda c: c.humidity,
+    'barometer': lambda c: c.barometer,
+    'solar_irradiance': lambda c: c.solar,
+
+    # Polynomial features
+    'temp_squared': lambda c: c.temp ** 2,
+    'temp_cubed': lambda c: c.temp ** 3,
+    'wind_squared': lambda c: c.wind ** 2,
+    'wind_cubed': lambda c: c.wind ** 3,
+    'wind_fourth': lambda c: c.wind ** 4,
+    'humidity_squared': lambda c: c.humidity ** 2,
+    'solar_squared': lambda c: c.solar ** 2,
+    'solar_sqrt': lambda c: np.sqrt(c.solar + 1e-6),
+    'solar_cubed': lambda c: c.solar ** 3,
+
+    # Interaction features
+    'temp_solar': lambda c: c.temp * c.solar,
+    'temp_wind': lambda c: c.temp * c.wind,
+    'temp_humidity': lambda c: c.temp * c.humidity,
+    'wind_solar': lambda c: c.wind * c.solar,
+    'wind_humidity': lambda c: c.wind * c.humidity,
+    'solar_humidity': lambda c: c.solar * c.humidity,
+    'barometer_wind': lambda c: c.barometer * c.wind,
+    'barometer_temp': lambda c: c.barometer * c.temp,
+    'temp_wind_solar': lambda c: c.temp * c.wind * c.solar / 1000,
+    'temp_humidity_solar': lambda c: c.temp * c.humidity * c.solar / 10000,
+
+    # Ratio features
+    'solar_per_temp': lambda c: c.solar / (c.temp + 1e-6),
+    'wind_per_temp': lambda c: c.wind / (c.temp + 1e-6),
+    'solar_per_humidity': lambda c: c.solar / (c.humidity + 1e-6),
+    'wind_per_humidity': lambda c: c.wind / (c.humidity + 1e-6),
+    'temp_per_humidity': lambda c: c.temp / (c.humidity + 1e-6),
+    'efficiency_ratio': lambda c: c.solar / (c.humidity + c.temp + 1e-6),
+    'power_density': lambda c: (c.wind * c.solar) / (c.temp + 1e-6),
+
+    # Time interactions
+    'hour_temp': lambda c: c.time('hour') * c.temp,
+    'hour_solar': lambda c: c.time('hour') * c.solar,
+    'hour_wind': lambda c: c.time('hour') * c.wind,
+    'weekend_solar': lambda c: c.time('is_weekend') * c.solar,
+    'weekday_wind': lambda c: c.time('is_weekday') * c.wind,
+
+    # Logarithmic transformations
+    'log_solar': lambda c: np.log1p(c.solar),
+    'log_wind': lambda c: np.log1p(c.wind),
+    'log_temp': lambda c: np.log1p(c.temp + 50),
+    'log_humidity': lambda c: np.log1p(c.humidity),
+
+    # Binned features (learned edges; the fixed widths are for packages without them)
+    'temp_bins': lambda c: c.bins('temp_bins', lambda v: np.clip(np.trunc((v - 10) / 5), 0, 5)),
+    'wind_bins': lambda c: c.bins('wind_bins', lambda v: np.clip(np.trunc(v / 5), 0, 5)),
+    'solar_bins': lambda c: c.bins('solar_bins', lambda v: np.clip(np.trunc(v / 200), 0, 5)),
+    'humidity_bins': lambda c: c.bins('humidity_bins', lambda v: np.clip(np.trunc((v - 20) / 20), 0, 4)),
+    'barometer_bins': lambda c: c.bins('barometer_bins', lambda v: np.clip(np.trunc((v - 980) / 20), 0, 3)),
+
+    # Domain-specific features
+    'solar_efficiency': lambda c: c.solar * (1 - 0.004 * np.maximum(0, c.temp - 25)),
+    'wind_power_factor': lambda c: _wind_power_factor(c.wind),
+    'effective_solar': lambda c: c.solar * c.time('solar_elevation') * c.time('solar_azimuth'),
+
+    # Season-weather interactions
+    'summer_clear': lambda c: c.time('summer') * c.is_clear,
+    'winter_solar': lambda c: c.time('winter') * c.solar,
+    'spring_wind': lambda c: c.time('spring') * c.wind,
+    'autumn_temp': lambda c: c.time('autumn') * c.temp,
+
+    # Optimal conditions indicators
+    'optimal_solar': lambda c: c.optimal_solar,
+    'optimal_wind': lambda c: c.optimal_wind,
+    'optimal_combined': lambda c: c.optimal_solar * c.optimal_wind,
+
+    # Original model features (for compatibility)
+    'temp_solar_interaction': lambda c: c.temp * c.solar / 1000,
+    'humidity_temp': lambda c: c.humidity * c.temp / 100,
+    'weather_encoded': lambda c: c.state.weather_lookup[c.weather_code],
+    'GAS_mxm': lambda c: c.fill('GAS_mxm'),  # measured after the fact; served as its training mean
+})
+
+for _index, _weather_type in enumerate(WEATHER_TYPES):
+    FEATURE_DEFINITIONS.update(_weather_features(_index, _weather_type))
+
+for _name in ROLLING_FEATURES:
+    FEATURE_DEFINITIONS[_name] = _rolling_feature(_name)
+
+class PlanEntry(namedtuple('PlanEntry', 'index feature kind source value reason')):
+    """One model column: computed from its own definition, an alias of
+    another feature, or a constant default"""
+
+    def as_dict(self):
+        return self._asdict()
+
+def resolve_column(index, feature, definitions=None):
+    '''Decide how a model column gets filled, using predict_api's historical defaults'''
+    definitions = FEATURE_DEFINITIONS if definitions is None else definitions
+
+    if feature in definitions:
+        return PlanEntry(index, feature, 'computed', feature, None, None)
+
+    if 'optimal' in feature.lower():
+        return PlanEntry(index, feature, 'default', None, 0.0, 'binary indicator')
+
+    if 'rolling' in feature.lower():
+        # For rolling features, use the base feature value
+        base_feature = feature.replace('_rolling_3', '').replace('_rolling_std', '')
+        if base_feature in definitions:
+            return PlanEntry(index, feature, 'alias', base_feature, None, 'rolling feature without history')
+        return PlanEntry(index, feature, 'default', None, 0.0, 'rolling feature without base')
+
+    if any(weather_type in feature for weather_type in WEATHER_TYPES):
+        return PlanEntry(index, feature, 'default', None, 0.0, 'weather interaction')
+
+    return PlanEntry(index, feature, 'default', None, 0.0, 'unknown feature')
+
+class ColumnPlan:
+    """Fixed mapping from a model's feature_names to feature sources.
+
+    Resolved once when the model is loaded, so requests never scan
+    feature lists or apply name heuristics.
+    """
+
+    def __init__(self, feature_names, definitions=None):
+        self.feature_names = list(feature_names)
+        self.entries = [resolve_column(index, feature, definitions)
+                        for index, feature in enumerate(self.feature_names)]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def missing(self):
+        return [entry.feature for entry in self.entries if entry.kind != 'computed']
+
+    def summary(self):
+        counts = {'computed': 0, 'alias': 0, 'default': 0}
+        for entry in self.entries:
+            counts[entry.kind] += 1
+        return counts
+
+    def describe(self):
+        '''JSON-friendly view of the plan for auditing'''
+        return {
+            **self.summary(),
+            'columns': [entry.as_dict() for entry in self.entries],
+        }
+
+class FeaturePipeline:
+    """Feature builder compiled for one model's feature_names.
+
+    Only the features the model uses are evaluated, and they are written
+    column by column into a float64 matrix in training order, following
+    the model's ColumnPlan. Training builds its matrix with the same
+    pipeline (transform_frame), so both sides share one implementation
+    and one FeatureState.
+    """
+
+    def __init__(self, feature_names, definitions=None, time_cache=None, state=None):
+        definitions = FEATURE_DEFINITIONS if definitions is None else definitions
+        self.time_cache = time_cache or time_feature_cache
+        self.state = state or FeatureState()
+        self.plan = ColumnPlan(feature_names, definitions)
+        self.feature_names = self.plan.feature_names
+        self.missing = self.plan.missing
+
+        # (column index, feature function) and (column index, constant) pairs
+        self.computed = [(entry.index, definitions[entry.source]) for entry in self.plan
+                         if entry.kind in ('computed', 'alias')]
+        self.defaults = [(entry.index, entry.value) for entry in self.plan if entry.kind == 'default']
+        self.uses_rolling = any(entry.source in ROLLING_FEATURES for entry in self.plan)
+
+    def transform(self, temp, weather, wind, humidity, barometer, solar_irradiance, timestamps=None, out=None,
+                  series=False, rolling=None):
+        '''Build the (n_rows, n_features) matrix for scalar or array inputs
+
+        series=True means the rows are one site's consecutive observations,
+        so rolling features run over them in order; callers opt in to it
+        (is_series only checks the timestamps allow it). rolling maps
+        rolling feature names to values computed elsewhere, such as a
+        site's history in a RollingStore, and takes precedence.
+        '''
+        context = FeatureContext(temp, weather, wind, humidity, barometer, solar_irradiance, timestamps,
+                                 self.time_cache, self.state, series, rolling)
+
+        if out is None:
+            out = np.empty((context.n_rows, len(self.feature_names)), dtype=np.float64)
+
+        for index, column in self.computed:
+            out[:, index] = column(context)
+        for index, value in self.defaults:
+            out[:, index] = value
+
+        return out
+
+    def transform_frame(self, frame, timestamp_column='clock', series=True):
+        '''Matrix for a training-style frame (TRAINING_COLUMNS plus a timestamp column)'''
+        timestamps = np.asarray(frame[timestamp_column], dtype='datetime64[s]')
+        return self.transform(*(np.asarray(frame[column]) for column in TRAINING_COLUMNS),
+                              timestamps=timestamps, series=series)
+
+    def transform_dict(self, *args, **kwargs):
+        '''Same as transform but keyed by feature name (handy for debugging)'''
+        X = self.transform(*args, **kwargs)
+        return {feature: X[:, index] for index, feature in enumerate(self.feature_names)}
+
+    def describe(self):
+        '''Column plan plus the feature state it is evaluated with'''
+        return {**self.plan.describe(), 'feature_state': self.state.describe()}
@@ -0,0 +1,51 @@
+import gc
+import multiprocessing
+import os
+import tempfile
+
+# Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app (and every model package) is imported once in the master and
+# the workers are forked from it, so model objects and coefficient arrays
+# are shared copy-on-write instead of being unpickled once per worker.
+
+bind = os.environ.get('POWER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('POWER_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('POWER_THREADS', 2))
+worker_class = 'gthread' if threads > 1 else 'sync'
+# With POWER_MODEL_LOADING=background the master must not fork mid-load, so
+# every worker imports the app and loads its own models instead
+preload_app = os.environ.get('POWER_MODEL_LOADING', 'eager').lower() != 'background'
+timeout = int(os.environ.get('POWER_WORKER_TIMEOUT', 60))
+keepalive = 5
+accesslog = os.environ.get('POWER_ACCESS_LOG') or None
+
+# Each worker counts its own requests. With several workers they also write
+# their totals to POWER_METRICS_DIR, and /api/metrics on any worker adds up
+# all of them. Set before the app is imported, so every worker inherits it.
+if workers > 1:
+    os.environ.setdefault('POWER_METRICS_DIR', tempfile.mkdtemp(prefix='power-metrics-'))
+
+def on_starting(server):
+    if os.environ.get('POWER_METRICS_DIR'):
+        from metrics import clear_directory
+        clear_directory(os.environ['POWER_METRICS_DIR'])  # totals restart with the server
+
+def pre_fork(server, worker):
+    # Keep the loaded models out of the collector so it never writes to
+    # their pages and un-shares them after the fork
+    gc.freeze()
+
+def post_fork(server, worker):
+    server.log.info("Worker %s ready (%d threads)", worker.pid, threads)
+
+def child_exit(server, worker):
+    # Keep an exited worker's counts, so totals survive worker restarts
+    if os.environ.get('POWER_METRICS_DIR'):
+        from metrics import retire_worker
+        retire_worker(os.environ['POWER_METRICS_DIR'], worker.pid)
+
+def worker_exit(server, worker):
+    if os.environ.get('POWER_METRICS_DIR'):
+        from metrics import metrics
+        metrics.flush()  # the last requests before the master folds this worker's file in
@@ -0,0 +1,361 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from statistics import NormalDist
+
+import numpy as np
+
+from service_logging import get_logger
+
+logger = get_logger('inference')
+
+PARITY_ROWS = 64
+PARITY_RTOL = 1e-9
+DEFAULT_FOREST_THREADS = 1
+PARALLEL_MIN_PATHS = 20000   # (rows x trees) below which threads cost more than they save
+FALLBACK_MIN_ROWS = 256      # rows above which sklearn's compiled loop is faster, whatever the tree count
+DEFAULT_INTERVAL_LEVEL = 0.9
+INTERVAL_LEVEL = float(os.environ.get('POWER_INTERVAL_LEVEL', DEFAULT_INTERVAL_LEVEL))  # 0 disables
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+class SklearnPredictor:
+    """Generic path: optional scaler.transform followed by model.predict"""
+
+    kind = 'sklearn'
+
+    def __init__(self, model, scaler=None):
+        self.model = model
+        self.scaler = scaler
+
+    def predict(self, X):
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        return np.asarray(self.model.predict(X), dtype=np.float64)
+
+@lru_cache(maxsize=64)
+def t_quantile(p, dof=None):
+    '''Student t quantile (normal when dof is unknown), without scipy
+
+    Cornish-Fisher expansion around the normal quantile; within 2e-4 of
+    the exact value from 10 degrees of freedom up.
+    '''
+    z = NormalDist().inv_cdf(p)
+    if not dof:
+        return z
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    return z + g1 / dof + g2 / dof ** 2 + g3 / dof ** 3
+
+class LinearPredictor:
+    """Linear model with the StandardScaler folded into its coefficients.
+
+    For y = coef . ((x - mean) / scale) + intercept the folded form is
+    y = (coef / scale) . x + (intercept - coef . (mean / scale)), so a
+    prediction is a single dot product on the raw feature matrix.
+
+    Prediction intervals need the residual standard deviation from
+    training. With (X'X)^-1 of the training design (intercept column
+    first) the interval also covers the uncertainty of the coefficients:
+    y +/- t * sigma * sqrt(1 + x'(X'X)^-1 x). That matrix is folded like
+    the coefficients, so it applies to raw feature rows too.
+    """
+
+    kind = 'linear'
+
+    def __init__(self, coef, intercept, residual_std=None, covariance=None, dof=None):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.residual_std = None if residual_std is None else float(residual_std)
+        self.covariance = None if covariance is None else np.ascontiguousarray(covariance, dtype=np.float64)
+        self.dof = dof
+        self._root = None
+        if self.covariance is not None:
+            # covariance = R R', so the leverage [1, x]' C [1, x] is |[1, x] @ R|^2
+            w, V = np.linalg.eigh(self.covariance)
+            self._root = V * np.sqrt(np.maximum(w, 0))
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None, interval=None):
+        '''`interval`: the package's residual_variance, and optionally xtx_inverse and dof'''
+        coef = np.asarray(model.coef_, dtype=np.float64).reshape(-1)
+        intercept = float(np.asarray(model.intercept_).reshape(-1)[0])
+        n = coef.shape[0]
+        # z = A @ [1, x] maps a raw row to the model's (scaled) input
+        A = np.eye(n + 1)
+
+        if scaler is not None:
+            mean = getattr(scaler, 'mean_', None)
+            scale = getattr(scaler, 'scale_', None)
+            if scale is not None:
+                coef = coef / np.asarray(scale, dtype=np.float64)
+                A[1:, 1:] /= np.asarray(scale, dtype=np.float64)
+            if mean is not None:
+                intercept -= float(np.dot(coef, np.asarray(mean, dtype=np.float64)))
+                A[1:, 0] = -np.asarray(mean, dtype=np.float64) @ A[1:, 1:]
+
+        if not interval or interval.get('residual_variance') is None:
+            return cls(coef, intercept)
+        covariance = interval.get('xtx_inverse')
+        if covariance is not None:
+            covariance = A.T @ np.asarray(covariance, dtype=np.float64) @ A
+        return cls(coef, intercept, residual_std=float(interval['residual_variance']) ** 0.5,
+                   covariance=covariance, dof=interval.get('dof'))
+
+    @property
+    def interval_method(self):
+        if self.residual_std is None:
+            return None
+        return 'analytic' if self.covariance is not None else 'residual'
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict_interval(self, X, level):
+        '''(predictions, lower, upper); bounds are None without residual statistics'''
+        X = np.asarray(X, dtype=np.float64)
+        predictions = X @ self.coef + self.intercept
+        if self.residual_std is None:
+            return predictions, None, None
+
+        half_width = t_quantile(0.5 + level / 2, self.dof) * self.residual_std
+        if self._root is not None:
+            projected = X @ self._root[1:] + self._root[0]
+            half_width = half_width * np.sqrt(1 + np.einsum('ij,ij->i', projected, projected))
+        return predictions, predictions - half_width, predictions + half_width
+
+def _forest_pool(threads):
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL._max_workers < threads:
+            _POOL = ThreadPoolExecutor(threads, thread_name_prefix='forest')
+        return _POOL
+
+class ForestPredictor:
+    """Averaged regression trees packed into contiguous node arrays.
+
+    All trees share one set of arrays and `roots` holds each tree's first
+    node. `children` has two entries per node, left then right; a child
+    that is a leaf is stored as ~index (negative), and a leaf's own entries
+    point to ~itself, so reaching a leaf needs no extra lookup.
+
+    Every (tree, row) path is walked at once: a step moves all pending
+    paths down one level with a few gathers, and paths that reached a leaf
+    drop out. Rows are compared as float32 against float64 thresholds, as
+    sklearn's trees do, and leaf values are added up in tree order before
+    dividing, so results match a sequential sklearn predict() bit for bit.
+    A NaN goes to the side sklearn recorded for the node (`missing_right`);
+    without that array it goes left.
+
+    NumPy pays for each node visit where sklearn's compiled loop does not,
+    so batches of more than about FALLBACK_MIN_ROWS rows go to
+    `fallback` (the sklearn model) when there is one; for intervals its
+    trees' compiled predict gives the per-tree values. With `threads` > 1
+    the trees are split into groups walked in parallel instead; NumPy
+    releases the GIL while gathering.
+    """
+
+    kind = 'forest'
+
+    def __init__(self, roots, feature, threshold, children, value, missing_right=None, threads=None,
+                 fallback=None):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.missing_right = None if missing_right is None else np.asarray(missing_right, dtype=bool)
+        if threads is None:
+            threads = int(os.environ.get('POWER_FOREST_THREADS', DEFAULT_FOREST_THREADS))
+        self.threads = max(1, min(threads, len(roots)))
+        self.fallback = fallback
+
+    @classmethod
+    def from_sklearn(cls, model, threads=None, fallback=None):
+        estimators = getattr(model, 'estimators_', None) or [model]
+        roots, parts = [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            # sklearn >= 1.3 records where a NaN goes at each split
+            missing_left = getattr(tree, 'missing_go_to_left', None)
+            missing_right = (np.zeros(tree.node_count, dtype=bool) if missing_left is None
+                             else ~np.asarray(missing_left, dtype=bool) & ~leaf)
+
+            def encode(child):
+                child = np.where(leaf, nodes, child)
+                return np.where(leaf[child], ~(child + offset), child + offset)
+
+            parts.append((np.where(leaf, 0, tree.feature),
+                          np.where(leaf, np.inf, tree.threshold),
+                          np.column_stack([encode(tree.children_left), encode(tree.children_right)]).reshape(-1),
+                          tree.value[:, 0, 0],
+                          missing_right))
+            roots.append(offset)
+            offset += tree.node_count
+
+        feature, threshold, children, value, missing_right = (np.concatenate(column) for column in zip(*parts))
+        return cls(np.array(roots, dtype=np.int64), feature.astype(np.int32), threshold.astype(np.float64),
+                   children.astype(np.int32), value.astype(np.float64), missing_right,
+                   threads=threads, fallback=fallback)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def probe_rows(self, rows, n_features, seed=0):
+        '''Rows on and around the split thresholds, so parity probes take many different paths'''
+        rng = np.random.default_rng(seed)
+        X = rng.standard_normal((rows, n_features))
+        splits = np.flatnonzero(np.isfinite(self.threshold))
+        if splits.size:
+            splits = rng.choice(splits, min(splits.size, 4096))
+        for j in range(n_features):
+            thresholds = self.threshold[splits[self.feature[splits] == j]]
+            if thresholds.size:
+                values = rng.choice(thresholds, rows)
+                X[:, j] = np.where(rng.random(rows) < 0.5, values, values * (1 + rng.normal(0, 0.01, rows)))
+        return X
+
+    def leaf_values(self, X, trees=slice(None)):
+        '''(trees, rows) value of the leaf each row reaches in each tree'''
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        roots = self.roots[trees]
+        flat = X.reshape(-1)
+        route_nan = self.missing_right is not None and np.isnan(flat).any()
+
+        node = np.repeat(roots, n_rows)
+        row_start = np.tile(np.arange(n_rows, dtype=np.intp) * n_features, len(roots))
+        path = np.arange(node.size)
+        leaf = np.empty(node.size, dtype=np.intp)
+        while path.size:
+            values = flat[row_start + self.feature[node]]
+            go_right = values > self.threshold[node]
+            if route_nan:
+                go_right |= np.isnan(values) & self.missing_right[node]
+            child = self.children[2 * node + go_right]
+            done = child < 0
+            if done.any():
+                leaf[path[done]] = ~child[done]
+                pending = ~done
+                node, row_start, path = child[pending], row_start[pending], path[pending]
+            else:
+                node = child
+        return self.value[leaf].reshape(len(roots), n_rows)
+
+    interval_method = 'trees'
+
+    def _all_leaf_values(self, X):
+        if self.threads > 1 and X.shape[0] * self.n_trees >= PARALLEL_MIN_PATHS:
+            bounds = np.linspace(0, self.n_trees, self.threads + 1).astype(int)
+            groups = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+            return np.concatenate(list(_forest_pool(self.threads).map(
+                lambda trees: self.leaf_values(X, trees), groups)))
+        return self.leaf_values(X)
+
+    def _average(self, values):
+        total = np.zeros(values.shape[1], dtype=np.float64)
+        for tree_values in values:  # sklearn's accumulation order
+            total += tree_values
+        return total / self.n_trees
+
+    def _use_fallback(self, X):
+        return self.fallback is not None and self.threads == 1 and X.shape[0] >= FALLBACK_MIN_ROWS
+
+    def _fallback_leaf_values(self, X):
+        '''(trees, rows) per-tree predictions from the fallback model's own trees'''
+        model = self.fallback.model
+        estimators = getattr(model, 'estimators_', None) or [model]
+        return np.stack([estimator.tree_.predict(X).reshape(X.shape[0], -1)[:, 0] for estimator in estimators])
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self._use_fallback(X):
+            return self.fallback.predict(X)
+        return self._average(self._all_leaf_values(X))
+
+    def predict_interval(self, X, level):
+        '''(predictions, lower, upper): the mean and central `level` range of the per-tree predictions'''
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        values = self._fallback_leaf_values(X) if self._use_fallback(X) else self._all_leaf_values(X)
+        lower, upper = np.quantile(values, [0.5 - level / 2, 0.5 + level / 2], axis=0)
+        return self._average(values), lower, upper
+
+def is_forest_model(model):
+    '''True for single-output sklearn regression trees and bagged forests of them'''
+    if not type(model).__module__.startswith(('sklearn.ensemble', 'sklearn.tree')):
+        return False
+    if type(model).__name__ not in ('RandomForestRegressor', 'ExtraTreesRegressor',
+                                    'DecisionTreeRegressor', 'ExtraTreeRegressor'):
+        return False
+    return getattr(model, 'n_outputs_', 1) == 1
+
+def is_foldable_linear_model(model, scaler=None):
+    '''True for single-output sklearn linear regressors behind an optional StandardScaler'''
+    if not type(model).__module__.startswith('sklearn.linear_model'):
+        return False
+    coef = getattr(model, 'coef_', None)
+    if coef is None or np.ndim(coef) != 1 or np.size(getattr(model, 'intercept_', 0)) != 1:
+        return False
+    if scaler is not None and type(scaler).__name__ != 'StandardScaler':
+        return False
+    return True
+
+def check_parity(fast, reference, n_features, scaler=None, rows=PARITY_ROWS, rtol=PARITY_RTOL):
+    '''Compare two predictors on reproducible probe rows spread around the training data'''
+    if hasattr(fast, 'probe_rows'):
+        X = fast.probe_rows(rows, n_features)
+    else:
+        rng = np.random.default_rng(0)
+        center = np.zeros(n_features)
+        spread = np.ones(n_features)
+        if scaler is not None and getattr(scaler, 'mean_', None) is not None:
+            center = np.asarray(scaler.mean_, dtype=np.float64)
+        if scaler is not None and getattr(scaler, 'scale_', None) is not None:
+            spread = np.asarray(scaler.scale_, dtype=np.float64)
+        X = center + rng.standard_normal((rows, n_features)) * spread * 2
+
+    expected = reference.predict(X)
+    actual = fast.predict(X)
+    tolerance = rtol * max(1.0, float(np.max(np.abs(expected))))
+    return bool(np.all(np.abs(actual - expected) <= tolerance))
+
+def predict_with_interval(predictor, X, level=INTERVAL_LEVEL):
+    '''Non-negative predictions and (lower, upper) bounds at `level` from the same pass
+
+    The bounds are None when the level is 0 or the predictor has no
+    uncertainty estimate (the generic sklearn path, or a linear model
+    without residual statistics).
+    '''
+    if level > 0 and getattr(predictor, 'interval_method', None):
+        predictions, lower, upper = predictor.predict_interval(X, level)
+        return np.maximum(0, predictions), (np.maximum(0, lower), np.maximum(0, upper))
+    return np.maximum(0, predictor.predict(X)), None
+
+def compile_predictor(model, scaler, n_features, interval=None):
+    '''Pick the fastest predictor for a loaded model, verified against sklearn
+
+    `interval` holds the package's residual statistics for linear models.
+    '''
+    reference = SklearnPredictor(model, scaler)
+
+    if is_forest_model(model) and scaler is None:
+        fast = ForestPredictor.from_sklearn(model)
+        if check_parity(fast, reference, n_features):
+            fast.fallback = reference
+            return fast
+        logger.warning("⚠️  Flattened forest does not match sklearn, using sklearn path")
+
+    if is_foldable_linear_model(model, scaler):
+        fast = LinearPredictor.from_sklearn(model, scaler, interval)
+        if fast.coef.shape[0] == n_features and check_parity(fast, reference, n_features, scaler):
+            return fast
+        logger.warning("⚠️  Folded linear model does not match sklearn, using sklearn path")
+
+    return reference
@@ -0,0 +1,377 @@
+import atexit
+import glob
+import json
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter, time
+
+from service_logging import get_logger
+
+logger = get_logger('metrics')
+
+# Upper bounds in seconds, from 10µs feature builds up to multi-second batches
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Rows per micro-batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# Multi-worker aggregation: each worker writes its totals to POWER_METRICS_DIR
+FLUSH_INTERVAL = 1.0  # seconds between a worker's snapshots
+RETIRED_FILE = 'retired.json'  # totals of workers that have exited
+# State tables and how many leading key columns each entry has
+HISTOGRAM_TABLES = {'stage_seconds': 2, 'request_seconds': 1}
+COUNTER_TABLES = {'requests': 3, 'rows': 2}
+SINGLE_HISTOGRAMS = ('microbatch_size', 'microbatch_wait')
+
+class Histogram:
+    """Fixed-bucket histogram; callers serialize access through Metrics' lock"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return list(self.counts), self.sum, self.count
+
+class RequestTimer:
+    """Splits one request into consecutive stages; mark(stage) closes the current one"""
+
+    __slots__ = ('metrics', 'endpoint', 'start', 'last', 'stages', 'method', 'rows')
+
+    def __init__(self, metrics, endpoint):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.start = self.last = perf_counter()
+        self.stages = []
+        self.method = None
+        self.rows = 1
+
+    def mark(self, stage):
+        now = perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def finish(self, status_code):
+        '''Close the response stage and record everything in one go'''
+        self.mark('respond')
+        self.metrics.record(self, self.last - self.start, status_code)
+
+class NullTimer:
+    """Stand-in used when metrics are switched off"""
+
+    __slots__ = ()
+    method = None
+    rows = 1
+
+    def mark(self, stage):
+        pass
+
+    def finish(self, status_code):
+        pass
+
+    def __setattr__(self, name, value):
+        pass  # timer.method = ... is a no-op
+
+NULL_TIMER = NullTimer()
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+def _add_snapshots(a, b):
+    if a is None:
+        return [list(b[0]), b[1], b[2]]
+    return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+def merge_states(states):
+    '''Sum Metrics.state() snapshots of several processes into one'''
+    histograms = {name: {} for name in HISTOGRAM_TABLES}
+    counters = {name: {} for name in COUNTER_TABLES}
+    singles = dict.fromkeys(SINGLE_HISTOGRAMS)
+    for state in states:
+        for name, width in HISTOGRAM_TABLES.items():
+            table = histograms[name]
+            for entry in state.get(name, ()):
+                key = tuple(entry[:width])
+                table[key] = _add_snapshots(table.get(key), entry[width:])
+        for name, width in COUNTER_TABLES.items():
+            table = counters[name]
+            for entry in state.get(name, ()):
+                key = tuple(entry[:width])
+                table[key] = table.get(key, 0) + entry[width]
+        for name in SINGLE_HISTOGRAMS:
+            if state.get(name):
+                singles[name] = _add_snapshots(singles[name], state[name])
+
+    merged = {name: [[*key, *snapshot] for key, snapshot in table.items()] for name, table in histograms.items()}
+    merged.update({name: [[*key, count] for key, count in table.items()] for name, table in counters.items()})
+    merged.update(singles)
+    return merged
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None  # retired meanwhile, or a file from before the last restart
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def read_directory(directory):
+    '''(merged state, live workers) over every snapshot in a metrics directory
+
+    Worker files are read before the retired totals, so a worker retired
+    in between is counted once, from the retired totals.
+    '''
+    snapshots = {}
+    for path in glob.glob(os.path.join(directory, 'worker-*.json')):
+        state = _read_json(path)
+        if state is not None:
+            snapshots[os.path.basename(path)] = state
+    retired = _read_json(os.path.join(directory, RETIRED_FILE)) or {'files': [], 'state': {}}
+    for name in retired['files']:
+        snapshots.pop(name, None)
+    return merge_states([retired['state'], *snapshots.values()]), len(snapshots)
+
+def retire_worker(directory, pid):
+    '''Fold an exited worker's snapshot into the retired totals; run by the gunicorn master
+
+    Counters keep growing across worker restarts instead of dropping
+    whatever the old worker had counted.
+    '''
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    for path in glob.glob(os.path.join(directory, f'worker-{pid}-*.json')):
+        state = _read_json(path)
+        if state is None:
+            continue
+        retired = _read_json(retired_path) or {'files': [], 'state': {}}
+        _write_json(retired_path, {'files': retired['files'] + [os.path.basename(path)],
+                                   'state': merge_states([retired['state'], state])})
+        os.remove(path)
+
+def clear_directory(directory):
+    '''Remove the snapshots of a previous run'''
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')) + glob.glob(os.path.join(directory, '*.tmp')):
+        os.remove(path)
+
+class Metrics:
+    """In-process request metrics rendered in the Prometheus text format.
+
+    Set POWER_METRICS=0 to disable; timers then become no-ops and nothing
+    is recorded.
+
+    Every worker process counts its own requests. With a metrics directory
+    (POWER_METRICS_DIR, set by gunicorn.conf.py for several workers) each
+    worker also writes its totals there every FLUSH_INTERVAL seconds and
+    at exit, and render() adds up all workers, so any worker answers a
+    scrape for the whole server.
+    """
+
+    def __init__(self, enabled=None, buckets=LATENCY_BUCKETS, directory=None, flush_interval=FLUSH_INTERVAL):
+        if enabled is None:
+            enabled = os.environ.get('POWER_METRICS', '1').lower() not in ('0', 'false', 'no', 'off')
+        self.enabled = enabled
+        self.directory = directory or os.environ.get('POWER_METRICS_DIR') or None
+        self.flush_interval = flush_interval
+        self._pid = None
+        self._path = None
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self.buckets = buckets
+        self.stage_seconds = {}   # (endpoint, stage) -> Histogram
+        self.request_seconds = {}  # endpoint -> Histogram
+        self.requests = {}         # (endpoint, method, status) -> count
+        self.rows = {}             # (endpoint, method) -> predicted rows
+        self.microbatch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.microbatch_wait = Histogram(buckets)
+        self._lock = threading.Lock()
+
+    def timer(self, endpoint):
+        return RequestTimer(self, endpoint) if self.enabled else NULL_TIMER
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    def record(self, timer, total, status_code):
+        '''Fold one finished request into the histograms under a single lock acquisition'''
+        endpoint = timer.endpoint
+        method = timer.method or 'none'
+        with self._lock:
+            for stage, seconds in timer.stages:
+                self._histogram(self.stage_seconds, (endpoint, stage)).observe(seconds)
+            self._histogram(self.request_seconds, endpoint).observe(total)
+
+            key = (endpoint, method, status_code)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status_code < 400:
+                key = (endpoint, method)
+                self.rows[key] = self.rows.get(key, 0) + timer.rows
+        if self.directory and self._pid != os.getpid():
+            self._ensure_flusher()
+
+    def record_microbatch(self, size, queue_seconds):
+        '''Rows in one micro-batch and how long its first request waited in the queue'''
+        if not self.enabled:
+            return
+        with self._lock:
+            self.microbatch_size.observe(size)
+            self.microbatch_wait.observe(queue_seconds)
+        if self.directory and self._pid != os.getpid():
+            self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        # Started lazily, and again after a fork: threads do not survive into workers
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # The start time keeps a later process with a reused pid apart from this one
+            self._path = os.path.join(self.directory, f'worker-{self._pid}-{int(time() * 1000)}.json')
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+        atexit.register(self._final_flush)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"❌ Metrics snapshot failed: {e}")
+
+    def _final_flush(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.exception(f"❌ Metrics snapshot failed: {e}")
+
+    def state(self):
+        '''JSON-friendly copy of this process' counters and histograms'''
+        with self._lock:
+            return {
+                'stage_seconds': [[*key, *h.snapshot()] for key, h in self.stage_seconds.items()],
+                'request_seconds': [[key, *h.snapshot()] for key, h in self.request_seconds.items()],
+                'requests': [[*key, count] for key, count in self.requests.items()],
+                'rows': [[*key, count] for key, count in self.rows.items()],
+                'microbatch_size': list(self.microbatch_size.snapshot()),
+                'microbatch_wait': list(self.microbatch_wait.snapshot()),
+            }
+
+    def flush(self):
+        '''Write this process' state to its file in the metrics directory'''
+        if not self.directory:
+            return
+        if self._pid != os.getpid():
+            self._ensure_flusher()
+        state = self.state()
+        with self._flush_lock:
+            _write_json(self._path, state)
+
+    def _render_histogram(self, lines, name, labels, snapshot, buckets=None):
+        counts, total, count = snapshot
+        cumulative = 0
+        for bound, n in zip((buckets or self.buckets) + ('+Inf',), counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+        suffix = _labels(**labels) if labels else ''
+        lines.append(f'{name}_sum{suffix} {total}')
+        lines.append(f'{name}_count{suffix} {count}')
+
+    def collect(self):
+        '''(state, workers): this process' state, or the sum over every worker sharing the directory'''
+        if not self.directory:
+            return self.state(), 1
+        self.flush()
+        return read_directory(self.directory)
+
+    def render(self):
+        '''Prometheus text exposition (version 0.0.4)'''
+        state, workers = self.collect()
+        stage_seconds = sorted(((endpoint, stage), snapshot)
+                               for endpoint, stage, *snapshot in state['stage_seconds'])
+        request_seconds = sorted((endpoint, snapshot) for endpoint, *snapshot in state['request_seconds'])
+        requests = sorted(((endpoint, method, status), count)
+                          for endpoint, method, status, count in state['requests'])
+        rows = sorted(((endpoint, method), count) for endpoint, method, count in state['rows'])
+        microbatch_size = state['microbatch_size']
+        microbatch_wait = state['microbatch_wait']
+
+        lines = [
+            '# HELP power_stage_seconds Time spent in each stage of a prediction request.',
+            '# TYPE power_stage_seconds histogram',
+        ]
+        for (endpoint, stage), snapshot in stage_seconds:
+            self._render_histogram(lines, 'power_stage_seconds',
+                                   {'endpoint': endpoint, 'stage': stage}, snapshot)
+
+        lines += [
+            '# HELP power_request_seconds Total time of a prediction request inside the view.',
+            '# TYPE power_request_seconds histogram',
+        ]
+        for endpoint, snapshot in request_seconds:
+            self._render_histogram(lines, 'power_request_seconds', {'endpoint': endpoint}, snapshot)
+
+        lines += [
+            '# HELP power_requests_total Prediction requests by prediction method and HTTP status.',
+            '# TYPE power_requests_total counter',
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append(f'power_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+        lines += [
+            '# HELP power_errors_total Prediction requests that ended with an HTTP error status.',
+            '# TYPE power_errors_total counter',
+        ]
+        errors = {}
+        for (endpoint, method, status), count in requests:
+            if status >= 400:
+                errors[(endpoint, status)] = errors.get((endpoint, status), 0) + count
+        for (endpoint, status), count in sorted(errors.items()):
+            lines.append(f'power_errors_total{_labels(endpoint=endpoint, status=status)} {count}')
+
+        lines += [
+            '# HELP power_predicted_rows_total Rows scored, by prediction method.',
+            '# TYPE power_predicted_rows_total counter',
+        ]
+        for (endpoint, method), count in rows:
+            lines.append(f'power_predicted_rows_total{_labels(endpoint=endpoint, method=method)} {count}')
+
+        if microbatch_size and microbatch_size[2]:
+            lines += [
+                '# HELP power_microbatch_size Rows scored together by the micro-batcher.',
+                '# TYPE power_microbatch_size histogram',
+            ]
+            self._render_histogram(lines, 'power_microbatch_size', {}, microbatch_size, BATCH_SIZE_BUCKETS)
+            lines += [
+                '# HELP power_microbatch_wait_seconds Queue time of the first request in each micro-batch.',
+                '# TYPE power_microbatch_wait_seconds histogram',
+            ]
+            self._render_histogram(lines, 'power_microbatch_wait_seconds', {}, microbatch_wait)
+
+        if self.directory:
+            lines += [
+                '# HELP power_metrics_workers Running worker processes whose metrics this scrape adds up.',
+                '# TYPE power_metrics_workers gauge',
+                f'power_metrics_workers {workers}',
+            ]
+
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
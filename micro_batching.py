@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+
+from feature_engineering import INPUT_FIELDS
+from inference import predict_with_interval
+from metrics import metrics
+from service_logging import get_logger
+
+DEFAULT_MAX_ROWS = 64
+DEFAULT_WAIT_MS = 2.0
+DEFAULT_RESULT_TIMEOUT = 5.0  # seconds a caller waits before falling back
+
+logger = get_logger('microbatch')
+
+class _Pending:
+    __slots__ = ('handle', 'row', 'timestamp', 'future', 'enqueued')
+
+    def __init__(self, handle, row, timestamp):
+        self.handle = handle
+        self.row = row
+        self.timestamp = timestamp
+        self.future = Future()
+        self.enqueued = perf_counter()
+
+def score_rows(handle, rows, timestamps):
+    '''(predictions, (lower, upper) or None) for single-row requests gathered into one batch'''
+    columns = {field: [row[field] for row in rows] for field in INPUT_FIELDS}
+    X_input = handle.feature_pipeline.transform(
+        columns['temperature'],
+        columns['weather'],
+        columns['wind'],
+        columns['humidity'],
+        columns['barometer'],
+        columns['solar_irradiance'],
+        np.array(timestamps, dtype='datetime64[s]')
+    )
+    return predict_with_interval(handle.predictor, X_input)
+
+class MicroBatcher:
+    """Gathers concurrent single-row predictions and scores them together.
+
+    The first request to arrive opens a window of `max_wait_ms`; everything
+    queued before the window closes (or until `max_rows` is reached) is
+    scored in one vectorized call per model, and each caller's future gets
+    its own (prediction, (lower, upper) or None) back. A failed batch fails every future in it, so callers
+    fall back exactly as they would after a failed single prediction.
+    """
+
+    def __init__(self, max_rows=DEFAULT_MAX_ROWS, max_wait_ms=DEFAULT_WAIT_MS,
+                 result_timeout=DEFAULT_RESULT_TIMEOUT, score=score_rows):
+        self.max_rows = max(1, int(max_rows))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.result_timeout = result_timeout
+        self.score = score
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        '''Batcher configured by POWER_MICROBATCH_*, or None when POWER_MICROBATCH is off'''
+        if os.environ.get('POWER_MICROBATCH', '0').lower() in ('0', 'false', 'no', 'off', ''):
+            return None
+        return cls(max_rows=int(os.environ.get('POWER_MICROBATCH_MAX_ROWS', DEFAULT_MAX_ROWS)),
+                   max_wait_ms=float(os.environ.get('POWER_MICROBATCH_WAIT_MS', DEFAULT_WAIT_MS)))
+
+    def _ensure_running(self):
+        # Started lazily, and again after a fork: threads do not survive into workers
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, handle, row, timestamp=None):
+        '''Queue one observation; the returned future resolves to (prediction, bounds)'''
+        # Bad input fails here, in the caller, instead of failing the whole batch
+        row = {field: row[field] if field == 'weather' else float(row[field]) for field in INPUT_FIELDS}
+        if not isinstance(row['weather'], str):
+            raise ValueError("weather must be a string")
+
+        self._ensure_running()
+        pending = _Pending(handle, row, timestamp or datetime.now())
+        self._queue.put(pending)
+        return pending.future
+
+    def predict(self, handle, row, timestamp=None):
+        return self.submit(handle, row, timestamp).result(timeout=self.result_timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        while len(batch) < self.max_rows:
+            remaining = deadline - perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())  # take what is already queued
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._score_batch(batch)
+            except Exception as e:
+                logger.exception(f"❌ Micro-batch of {len(batch)} failed: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def _score_batch(self, batch):
+        started = perf_counter()
+
+        # One vectorized call per model; requests may pick different models
+        groups = {}
+        for pending in batch:
+            groups.setdefault(id(pending.handle), []).append(pending)
+
+        for group in groups.values():
+            try:
+                predictions, bounds = self.score(group[0].handle, [p.row for p in group],
+                                                 [p.timestamp for p in group])
+            except Exception as e:
+                for pending in group:
+                    pending.future.set_exception(e)
+                continue
+            for i, pending in enumerate(group):
+                pending.future.set_result((float(predictions[i]), None if bounds is None
+                                           else (float(bounds[0][i]), float(bounds[1][i]))))
+
+        metrics.record_microbatch(len(batch), started - batch[0].enqueued)
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import warnings
+
+import numpy as np
+
+from inference import ForestPredictor, LinearPredictor, check_parity, is_forest_model, is_foldable_linear_model
+
+# File layout (all little-endian):
+#   8-byte magic | uint32 format version | uint32 header length | JSON header
+#   | arrays, each starting on an ALIGNMENT boundary
+# The header lists every array's dtype, shape and byte offset, counted from
+# the first ALIGNMENT boundary after the header. A reader maps the file once
+# and views the arrays in place: nothing is unpickled, and neither joblib
+# nor sklearn is imported.
+MAGIC = b'PWRMODEL'
+FORMAT_VERSION = 2
+MODEL_EXTENSION = '.pmf'
+ALIGNMENT = 64
+
+# Arrays making up each predictor kind, with the dtype they are stored in
+PREDICTOR_ARRAYS = {
+    'linear': {'coef': '<f8', 'covariance': '<f8'},
+    'forest': {'roots': '<i8', 'feature': '<i4', 'threshold': '<f8', 'children': '<i4', 'value': '<f8',
+               'missing_right': '|u1'},
+}
+OPTIONAL_ARRAYS = {'covariance', 'missing_right'}  # written only when the predictor has them
+# Format version 1 stored forests as separate left/right arrays with self-looping leaves
+FOREST_MIN_VERSION = 2
+
+def _align(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+def predictor_params(predictor):
+    '''Scalars stored in the header next to the arrays'''
+    if predictor.kind == 'linear':
+        return {'intercept': predictor.intercept, 'residual_std': predictor.residual_std, 'dof': predictor.dof}
+    return {}
+
+def build_predictor(kind, params, arrays):
+    if kind == 'linear':
+        return LinearPredictor(arrays['coef'], params['intercept'], params.get('residual_std'),
+                               arrays.get('covariance'), params.get('dof'))
+    if kind == 'forest':
+        return ForestPredictor(**arrays)
+    raise ValueError(f"Unknown predictor kind '{kind}'")
+
+def write_model(path, predictor, feature_names, model_type, model_info=None, version=None, feature_state=None):
+    '''Write a predictor and its metadata; the file is replaced atomically
+
+    feature_state is FeatureState.as_dict(): the bin edges, weather codes
+    and fill values the feature pipeline needs to match training.
+    '''
+    if predictor.kind not in PREDICTOR_ARRAYS:
+        raise ValueError(f"Predictor kind '{predictor.kind}' cannot be exported")
+
+    arrays = {name: np.ascontiguousarray(getattr(predictor, name), dtype=dtype)
+              for name, dtype in PREDICTOR_ARRAYS[predictor.kind].items()
+              if getattr(predictor, name) is not None}
+    header = {
+        'kind': predictor.kind,
+        'params': predictor_params(predictor),
+        'feature_names': list(feature_names),
+        'model_type': model_type,
+        'model_info': {k: (v.item() if isinstance(v, np.generic) else v)
+                       for k, v in (model_info or {}).items() if isinstance(v, (int, float, str, np.number))},
+        'version': version,
+        'feature_state': feature_state,
+        'arrays': {},
+    }
+
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    encoded = json.dumps(header).encode('utf-8')
+    data_start = _align(16 + len(encoded))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<II', FORMAT_VERSION, len(encoded)) + encoded)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+def read_model(path):
+    '''(header, arrays) of an exported model; arrays are read-only views on a memory map'''
+    with open(path, 'rb') as f:
+        prefix = f.read(16)
+        if len(prefix) < 16 or prefix[:8] != MAGIC:
+            raise ValueError(f"{path} is not a {MODEL_EXTENSION} model file")
+        version, header_length = struct.unpack('<II', prefix[8:])
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{path} uses format version {version}; this build reads up to {FORMAT_VERSION}")
+        header = json.loads(f.read(header_length))
+    header['format_version'] = version
+    data_start = _align(16 + header_length)
+
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        start = data_start + spec['offset']
+        end = start + count * dtype.itemsize
+        if end > len(data):
+            raise ValueError(f"{path} is truncated (array '{name}')")
+        arrays[name] = data[start:end].view(dtype).reshape(spec['shape'])
+    return header, arrays
+
+def load_model(path):
+    '''Header and compiled predictor of an exported model'''
+    header, arrays = read_model(path)
+    if header['kind'] == 'forest' and header['format_version'] < FOREST_MIN_VERSION:
+        raise ValueError(f"{path} holds a version {header['format_version']} forest; "
+                         f"export it again with model_format.py")
+    missing = set(PREDICTOR_ARRAYS.get(header['kind'], {})) - OPTIONAL_ARRAYS - set(arrays)
+    if missing:
+        raise ValueError(f"{path} is missing arrays: {', '.join(sorted(missing))}")
+    return header, build_predictor(header['kind'], header['params'], arrays)
+
+# ---- export from pickled packages ------------------------------------------
+
+def export_predictor(model, scaler, n_features, interval=None):
+    '''Portable predictor for a pickled model, checked against sklearn
+
+    `interval` holds the package's residual statistics, so a linear model
+    keeps its prediction intervals in the exported file.
+    '''
+    from inference import SklearnPredictor
+
+    if is_foldable_linear_model(model, scaler):
+        predictor = LinearPredictor.from_sklearn(model, scaler, interval)
+    elif is_forest_model(model) and scaler is None:
+        predictor = ForestPredictor.from_sklearn(model)
+    else:
+        raise ValueError(f"{type(model).__name__} cannot be exported"
+                         f"{' behind a scaler' if scaler is not None else ''}")
+    if not check_parity(predictor, SklearnPredictor(model, scaler), n_features, scaler):
+        raise ValueError(f"Exported {type(model).__name__} does not match sklearn")
+    return predictor
+
+def export_package(path, output_path=None):
+    '''Convert a joblib model package into a .pmf file next to it (or at output_path)'''
+    from model_registry import load_model_handle
+
+    handle = load_model_handle(path)
+    # The handle's compiled predictor already passed the parity check and
+    # carries the package's interval statistics (or the RMSE fallback)
+    predictor = handle.predictor
+    if predictor.kind not in PREDICTOR_ARRAYS:
+        predictor = export_predictor(handle.model, handle.scaler, len(handle.feature_names))
+    output_path = output_path or os.path.splitext(path)[0] + MODEL_EXTENSION
+    return write_model(output_path, predictor, handle.feature_names, handle.model_type,
+                       handle.model_info, handle.version, handle.feature_pipeline.state.as_dict())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export joblib model packages to the portable .pmf format")
+    parser.add_argument('packages', nargs='+', help="*.pkl model packages to convert")
+    parser.add_argument('--output-dir', help="Write .pmf files here instead of next to each package")
+    args = parser.parse_args(argv)
+    warnings.filterwarnings('ignore')  # unpickling an older sklearn's models is what export is for
+
+    failed = 0
+    for path in args.packages:
+        output_path = None
+        if args.output_dir:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            output_path = os.path.join(args.output_dir, stem + MODEL_EXTENSION)
+        try:
+            output_path = export_package(path, output_path)
+        except Exception as e:
+            print(f"❌ {path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"✅ {path} -> {output_path} ({os.path.getsize(output_path):,} bytes)")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,394 @@
+import glob
+import hashlib
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from feature_engineering import FEATURE_DEFINITIONS, UNOBSERVED_FEATURES, FeaturePipeline, FeatureState
+from inference import compile_predictor
+from model_format import MODEL_EXTENSION, load_model
+from service_logging import get_logger, log_feature_schema
+
+MODEL_PATTERN = '*power_generation_model.*'
+# Package formats by preference: a portable export shadows the pickle it was made from
+MODEL_EXTENSIONS = (MODEL_EXTENSION, '.pkl')
+# Default model when several packages are present, matching the old load order
+MODEL_PRECEDENCE = ('best', 'improved', 'original')
+DEFAULT_WATCH_INTERVAL = 0  # seconds, 0 disables the file watcher
+
+logger = get_logger('registry')
+
+class ModelHandle(namedtuple('ModelHandle', [
+        'name', 'version', 'path', 'mtime', 'loaded_at',
+        'model', 'scaler', 'feature_names', 'model_info', 'model_type',
+        'feature_pipeline', 'predictor'])):
+    """Everything needed to serve one model package; never mutated after loading"""
+
+    __slots__ = ()
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'path': os.path.basename(self.path),
+            'model_type': self.model_type,
+            'feature_count': len(self.feature_names),
+            'inference_path': self.predictor.kind,
+            'prediction_interval': getattr(self.predictor, 'interval_method', None),
+            'loaded_at': self.loaded_at,
+        }
+
+def model_name_for(path):
+    '''Registry name for a package file: best, improved, original or the file stem'''
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem == 'power_generation_model':
+        return 'original'
+    return stem.replace('_power_generation_model', '') or stem
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+def model_files(directory, pattern=MODEL_PATTERN):
+    '''Model packages in a directory, one per stem, in the preferred format'''
+    chosen = {}
+    for path in glob.glob(os.path.join(directory, pattern)):
+        stem, extension = os.path.splitext(path)
+        if extension not in MODEL_EXTENSIONS:
+            continue
+        current = chosen.get(stem)
+        if current is None or MODEL_EXTENSIONS.index(extension) < MODEL_EXTENSIONS.index(os.path.splitext(current)[1]):
+            chosen[stem] = path
+    return sorted(chosen.values())
+
+def package_feature_state(package, feature_names, scaler):
+    '''The package's saved FeatureState, or what the notebook's training implies
+
+    Packages from before feature state was saved were encoded with the
+    notebook's LabelEncoder (kept in the original package), and their
+    scaler remembers the training mean of columns a request cannot supply.
+    '''
+    if package.get('feature_state'):
+        return FeatureState.from_dict(package['feature_state'])
+    encoder = package.get('label_encoder')
+    means = getattr(scaler, 'mean_', None)
+    defaults = {}
+    if means is not None and len(means) == len(feature_names):
+        defaults = {name: means[feature_names.index(name)] for name in UNOBSERVED_FEATURES if name in feature_names}
+    return FeatureState(weather_classes=list(encoder.classes_) if encoder is not None else None,
+                        defaults=defaults)
+
+def package_interval(package, model_info=None):
+    '''Residual statistics for linear prediction intervals, or None
+
+    Packages from before interval statistics were saved fall back to the
+    held-out RMSE as residual spread, without the coefficient uncertainty.
+    '''
+    interval = package.get('prediction_interval')
+    if interval is not None:
+        return interval
+    if model_info is None:
+        model_info = dict(package.get('performance_metrics') or package.get('performance') or {})
+    rmse = model_info.get('test_rmse', model_info.get('rmse'))
+    return {'residual_variance': float(rmse) ** 2} if rmse is not None else None
+
+def load_portable_handle(path, name=None):
+    '''Map an exported .pmf model; no unpickling, and sklearn is never imported'''
+    mtime = os.path.getmtime(path)
+    header, predictor = load_model(path)
+    feature_names = list(header['feature_names'])
+
+    feature_pipeline = FeaturePipeline(feature_names, state=FeatureState.from_dict(header.get('feature_state')))
+    log_feature_schema(logger, feature_pipeline, FEATURE_DEFINITIONS)
+
+    return ModelHandle(
+        name=name or model_name_for(path),
+        version=str(header.get('version') or file_digest(path)),
+        path=os.path.abspath(path),
+        mtime=mtime,
+        loaded_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        model=None,
+        scaler=None,
+        feature_names=feature_names,
+        model_info=dict(header.get('model_info') or {}),
+        model_type=header.get('model_type', 'Unknown'),
+        feature_pipeline=feature_pipeline,
+        predictor=predictor,
+    )
+
+def load_model_handle(path, name=None):
+    '''Load a .pkl or .pmf model package and compile its feature pipeline and predictor'''
+    if path.endswith(MODEL_EXTENSION):
+        return load_portable_handle(path, name)
+
+    import joblib  # deferred: unpickling pulls in sklearn, and a fast start should not wait for it
+
+    mtime = os.path.getmtime(path)
+    package = joblib.load(path)
+
+    # The three package layouts written by the notebook over time
+    feature_names = package.get('feature_names') or package.get('feature_columns')
+    if 'model' not in package or not feature_names:
+        raise ValueError(f"{path} is not a model package (needs 'model' and feature names)")
+    model_info = dict(package.get('performance_metrics') or package.get('performance') or {})
+    model_info.update(package.get('comparison_results') or {})
+    if 'feature_columns' in package and 'feature_names' not in package:
+        model_type = 'Original Linear Regression'
+    else:
+        model_type = package.get('algorithm', package.get('model_type', 'Unknown'))
+
+    model = package['model']
+    scaler = package.get('scaler')
+    feature_names = list(feature_names)
+
+    interval = package_interval(package, model_info)
+    feature_pipeline = FeaturePipeline(feature_names, state=package_feature_state(package, feature_names, scaler))
+    log_feature_schema(logger, feature_pipeline, FEATURE_DEFINITIONS)
+    predictor = compile_predictor(model, scaler, len(feature_names), interval)
+
+    return ModelHandle(
+        name=name or model_name_for(path),
+        version=str(package.get('version') or file_digest(path)),
+        path=os.path.abspath(path),
+        mtime=mtime,
+        loaded_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        model=model,
+        scaler=scaler,
+        feature_names=feature_names,
+        model_info=model_info,
+        model_type=model_type,
+        feature_pipeline=feature_pipeline,
+        predictor=predictor,
+    )
+
+class ModelRegistry:
+    """Preloaded model handles with per-request lookup and atomic swaps.
+
+    The registry state is a single (handles, default) tuple that is replaced
+    as a whole, so readers never take a lock and a request that already
+    holds a handle keeps using it while a new version is swapped in.
+    """
+
+    def __init__(self, directory='.', pattern=MODEL_PATTERN, precedence=MODEL_PRECEDENCE):
+        self.directory = os.path.abspath(directory)
+        self.pattern = pattern
+        self.precedence = precedence
+        self._state = ({}, None)
+        self._swap_lock = threading.Lock()
+        self._watcher = None
+        self._watch_interval = None
+        self._fork_hook = False
+        self.warming = False  # a background load_all() is still running
+        self._stop = threading.Event()
+        self._listeners = []
+        self.load_errors = {}
+
+    # ---- reads (lock-free) -------------------------------------------------
+
+    @property
+    def default_name(self):
+        return self._state[1]
+
+    def get(self, key=None):
+        '''Handle by name or version; the default model when key is None'''
+        handles, default = self._state
+        if key is None:
+            key = default
+        if key in handles:
+            return handles[key]
+        for handle in handles.values():
+            if handle.version == key:
+                return handle
+        raise KeyError(key)
+
+    def handles(self):
+        return list(self._state[0].values())
+
+    def __len__(self):
+        return len(self._state[0])
+
+    def describe(self):
+        handles, default = self._state
+        return {
+            'default': default,
+            'models': [dict(h.summary(), default=(h.name == default)) for h in handles.values()],
+            'load_errors': dict(self.load_errors),
+        }
+
+    # ---- writes ------------------------------------------------------------
+
+    def on_change(self, callback):
+        '''Call callback(name) after a model is (re)loaded; name is None after load_all'''
+        self._listeners.append(callback)
+
+    def _notify(self, name):
+        for callback in self._listeners:
+            try:
+                callback(name)
+            except Exception as e:
+                logger.exception(f"❌ Model change listener failed: {e}")
+
+    def _install(self, handle, make_default=False):
+        with self._swap_lock:
+            handles, default = self._state
+            handles = dict(handles)
+            handles[handle.name] = handle
+            if make_default or default is None:
+                default = handle.name
+            self._state = (handles, default)
+        self._notify(handle.name)
+
+    def _pick_default(self, handles):
+        for name in self.precedence:
+            if name in handles:
+                return name
+        return next(iter(handles), None)
+
+    def resolve_path(self, path):
+        '''Absolute path of a package file, which must live in the model directory'''
+        full = os.path.abspath(os.path.join(self.directory, path))
+        if os.path.dirname(full) != self.directory:
+            raise ValueError(f"Model files must be in {self.directory}")
+        if not os.path.isfile(full):
+            raise FileNotFoundError(f"No model file {os.path.basename(full)}")
+        return full
+
+    def load_all(self):
+        '''Load every package in the model directory; the default follows MODEL_PRECEDENCE'''
+        handles = {}
+        for path in model_files(self.directory, self.pattern):
+            try:
+                handle = load_model_handle(path)
+            except Exception as e:
+                self.load_errors[os.path.basename(path)] = str(e)
+                logger.exception(f"❌ Error loading {os.path.basename(path)}: {e}")
+                continue
+            self.load_errors.pop(os.path.basename(path), None)
+            handles[handle.name] = handle
+            logger.info(f"✅ Model '{handle.name}' loaded: {handle.model_type} "
+                        f"(version {handle.version}, {handle.predictor.kind} inference)")
+
+        with self._swap_lock:
+            self._state = (handles, self._pick_default(handles))
+        self._notify(None)
+        return len(handles)
+
+    def load_all_async(self, then=None):
+        '''Run load_all(), then `then()`, on a background thread; `warming` is True until both finish
+
+        Do not fork while this runs: a child inherits the import locks held
+        by the loading thread, which is gone, and would hang on its first
+        import of sklearn.
+        '''
+        self.warming = True
+
+        def run():
+            try:
+                self.load_all()
+                if then is not None:
+                    then()
+            except Exception as e:
+                logger.exception(f"❌ Background model loading failed: {e}")
+            finally:
+                self.warming = False
+
+        thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+        thread.start()
+        logger.info(f"⏳ Loading models from {self.directory} in the background")
+        return thread
+
+    def load(self, path, name=None, make_default=False):
+        '''Load one package off the request path and swap it in when it is ready'''
+        path = self.resolve_path(path)
+        try:
+            handle = load_model_handle(path, name)
+        except Exception as e:
+            self.load_errors[os.path.basename(path)] = str(e)
+            raise
+        self.load_errors.pop(os.path.basename(path), None)
+        self._install(handle, make_default)
+        logger.info(f"🔄 Model '{handle.name}' swapped in: version {handle.version}"
+                    f"{' (default)' if make_default else ''}")
+        return handle
+
+    def load_async(self, path, name=None, make_default=False):
+        '''Start loading a package on a background thread'''
+        path = self.resolve_path(path)
+
+        def run():
+            try:
+                self.load(path, name, make_default)
+            except Exception as e:
+                logger.exception(f"❌ Background load of {os.path.basename(path)} failed: {e}")
+
+        thread = threading.Thread(target=run, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def set_default(self, key):
+        handle = self.get(key)
+        with self._swap_lock:
+            self._state = (self._state[0], handle.name)
+        logger.info(f"🔄 Default model is now '{handle.name}' (version {handle.version})")
+        return handle
+
+    # ---- file watcher ------------------------------------------------------
+
+    def reload_changed(self):
+        '''Reload packages whose file changed and load new ones; returns the names swapped in'''
+        known = {h.path: h for h in self.handles()}
+        swapped = []
+        for path in model_files(self.directory, self.pattern):
+            path = os.path.abspath(path)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue  # removed while scanning
+            current = known.get(path)
+            if current is not None and current.mtime == mtime:
+                continue
+            try:
+                handle = self.load(path, current.name if current else None)
+            except Exception as e:
+                logger.warning(f"⚠️  Could not reload {os.path.basename(path)}: {e}")
+                continue
+            swapped.append(handle.name)
+        return swapped
+
+    def start_watcher(self, interval=None):
+        '''Poll the model directory every `interval` seconds (POWER_MODEL_WATCH_INTERVAL)'''
+        if interval is None:
+            interval = float(os.environ.get('POWER_MODEL_WATCH_INTERVAL', DEFAULT_WATCH_INTERVAL))
+        if interval <= 0 or self._watcher is not None:
+            return None
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.reload_changed()
+                except Exception as e:
+                    logger.exception(f"❌ Model watcher error: {e}")
+
+        self._watcher = threading.Thread(target=run, name='model-watcher', daemon=True)
+        self._watcher.start()
+        self._watch_interval = interval
+        if hasattr(os, 'register_at_fork') and not self._fork_hook:
+            # Threads do not survive fork(): preloaded server workers watch for themselves
+            os.register_at_fork(after_in_child=self._restart_watcher_after_fork)
+            self._fork_hook = True
+        logger.info(f"👀 Watching {self.directory} for model changes every {interval:g}s")
+        return self._watcher
+
+    def _restart_watcher_after_fork(self):
+        if self._watcher is not None and not self._stop.is_set():
+            self._watcher = None
+            self._swap_lock = threading.Lock()
+            self.start_watcher(self._watch_interval)
+
+    def stop_watcher(self):
+        self._stop.set()
+        self._watcher = None
@@ -0,0 +1,244 @@
+import argparse
+import itertools
+import math
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from time import perf_counter
+
+import numpy as np
+
+# The notebook's Cell 6 grid. n_estimators is not searched over: it is the
+# resource successive halving hands out, so its largest value is the most
+# trees any candidate gets.
+RF_PARAM_GRID = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [10, 20, 30, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 'log2', None],
+}
+DEFAULT_CANDIDATES = 27
+DEFAULT_ETA = 3  # each rung keeps 1/eta of the candidates and gives them eta times the trees
+DEFAULT_MIN_ESTIMATORS = 10
+DEFAULT_FOLDS = 5
+DEFAULT_TIME_BUDGET = 300  # seconds
+DEFAULT_SEED = 42
+
+class SearchResult(namedtuple('SearchResult', [
+        'best_params', 'best_rmse', 'model', 'rungs', 'fits', 'trees', 'wall_seconds',
+        'search_seconds', 'refit_seconds', 'budget_exhausted', 'seed'])):
+    """Outcome of one search; rungs lists what each round of halving did"""
+
+    __slots__ = ()
+
+    @property
+    def fits_per_second(self):
+        return self.fits / self.search_seconds if self.search_seconds else 0.0
+
+    def summary(self):
+        '''JSON-friendly report (without the fitted model)'''
+        return {
+            'best_params': self.best_params,
+            'best_cv_rmse': self.best_rmse,
+            'rungs': self.rungs,
+            'fits': self.fits,
+            'trees': self.trees,
+            'wall_seconds': self.wall_seconds,
+            'search_seconds': self.search_seconds,
+            'refit_seconds': self.refit_seconds,
+            'fits_per_second': self.fits_per_second,
+            'budget_exhausted': self.budget_exhausted,
+            'seed': self.seed,
+        }
+
+def fold_assignments(n_rows, n_folds, seed):
+    '''Shuffled fold number per row (KFold(shuffle=True) sizes), computed once per search'''
+    order = np.random.default_rng(seed).permutation(n_rows)
+    folds = np.empty(n_rows, dtype=np.int8)
+    sizes = np.full(n_folds, n_rows // n_folds)
+    sizes[:n_rows % n_folds] += 1
+    folds[order] = np.repeat(np.arange(n_folds), sizes)
+    return folds
+
+def sample_candidates(param_grid, n_candidates, seed):
+    '''Distinct parameter sets drawn from the grid without n_estimators, in a seeded order'''
+    grid = {name: values for name, values in param_grid.items() if name != 'n_estimators'}
+    combinations = list(itertools.product(*grid.values()))
+    rng = np.random.default_rng(seed)
+    chosen = rng.permutation(len(combinations))[:n_candidates]
+    return [dict(zip(grid, combinations[i])) for i in sorted(chosen)]
+
+def rung_schedule(n_candidates, max_estimators, min_estimators=DEFAULT_MIN_ESTIMATORS, eta=DEFAULT_ETA):
+    '''[(candidates kept, trees each)] per rung, ending at max_estimators trees'''
+    n_rungs = 1 + min(int(math.log(max(n_candidates, 1), eta) + 1e-9),
+                      int(math.log(max(max_estimators / min_estimators, 1), eta) + 1e-9))
+    schedule = []
+    for rung in range(n_rungs):
+        keep = max(1, n_candidates // eta ** rung)
+        trees = max(min_estimators, round(max_estimators / eta ** (n_rungs - 1 - rung)))
+        schedule.append((keep, trees))
+    return schedule
+
+def tree_seed(seed, candidate, fold, rung):
+    '''Independent, reproducible seed for the trees one rung adds to one candidate's fold forest'''
+    return int(np.random.SeedSequence([seed, candidate, fold, rung]).generate_state(1)[0])
+
+# ---- worker side -----------------------------------------------------------
+
+_data = {}
+
+def _init_worker(X, y, folds):
+    _data.update(X=X, y=y, folds=folds)
+
+def _grow(candidate, params, fold, rung, n_trees, seed):
+    '''Sum of the predictions of n_trees new trees on one validation fold'''
+    from sklearn.ensemble import RandomForestRegressor
+
+    X, y, folds = _data['X'], _data['y'], _data['folds']
+    train = folds != fold
+    started = perf_counter()
+    forest = RandomForestRegressor(n_estimators=n_trees, random_state=tree_seed(seed, candidate, fold, rung),
+                                   n_jobs=1, **params)
+    forest.fit(X[train], y[train])
+    return candidate, fold, forest.predict(X[~train]) * n_trees, perf_counter() - started
+
+# ---- search ----------------------------------------------------------------
+
+def search_random_forest(X, y, param_grid=None, n_candidates=DEFAULT_CANDIDATES, n_folds=DEFAULT_FOLDS,
+                         time_budget=DEFAULT_TIME_BUDGET, workers=None, seed=DEFAULT_SEED,
+                         eta=DEFAULT_ETA, min_estimators=DEFAULT_MIN_ESTIMATORS, refit=True, log=print):
+    '''Successive-halving search over Random Forest parameters within a time budget
+
+    Candidates are drawn from the grid, scored by cross-validated MSE on
+    a small forest each, and the best 1/eta go on with eta times more
+    trees until the survivors have the grid's largest n_estimators.
+    Growing a forest only fits the trees it gains: a forest predicts the
+    mean of its trees, so each candidate keeps the per-fold sum of its
+    trees' predictions and every rung adds the new trees' sum. Fits run
+    on a process pool, fold by fold; the folds are assigned once and
+    shared with the workers.
+
+    When the budget runs out, pending fits are cancelled and the best
+    candidate of the last finished rung wins. Everything random derives
+    from seed, so a search with the same seed (and the same budget
+    outcome) picks the same parameters whatever the worker count.
+    '''
+    param_grid = RF_PARAM_GRID if param_grid is None else param_grid
+    X = np.ascontiguousarray(X, dtype=np.float32)  # what sklearn's trees fit on anyway
+    y = np.asarray(y, dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    started = perf_counter()
+
+    folds = fold_assignments(len(y), n_folds, seed)
+    candidates = sample_candidates(param_grid, n_candidates, seed)
+    schedule = rung_schedule(len(candidates), max(param_grid['n_estimators']), min_estimators, eta)
+    validation = [np.flatnonzero(folds == fold) for fold in range(n_folds)]
+    sums = {(c, fold): 0.0 for c in range(len(candidates)) for fold in range(n_folds)}
+
+    alive = list(range(len(candidates)))
+    grown = 0  # trees every alive candidate has per fold
+    ranking = None  # (mse, candidate) of the last finished rung
+    rungs, fits, trees, exhausted = [], 0, 0, False
+    log(f"🔍 Searching {len(candidates)} Random Forest candidates, {n_folds}-fold CV, "
+        f"{workers} workers, budget {time_budget:g}s: rungs {schedule}")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y, folds)) as pool:
+        for rung, (keep, n_trees) in enumerate(schedule):
+            if ranking is not None:
+                alive = [candidate for _, candidate in ranking[:keep]]
+            rung_started = perf_counter()
+            pending = {pool.submit(_grow, c, candidates[c], fold, rung, n_trees - grown, seed)
+                       for c in alive for fold in range(n_folds)}
+            finished = 0
+            while pending:
+                remaining = time_budget - (perf_counter() - started)
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    c, fold, tree_sum, _ = future.result()
+                    sums[c, fold] = sums[c, fold] + tree_sum
+                    finished += 1
+            fits += finished
+            trees += finished * (n_trees - grown)
+            if pending:
+                for future in pending:
+                    future.cancel()
+                exhausted = True
+                if rung:
+                    log(f"⏱️  Time budget spent in rung {rung + 1}; keeping the results of rung {rung}")
+                break
+
+            grown = n_trees
+            ranking = sorted(
+                (float(np.mean([np.mean((sums[c, fold] / grown - y[validation[fold]]) ** 2)
+                                for fold in range(n_folds)])), c)
+                for c in alive)
+            seconds = perf_counter() - rung_started
+            rungs.append({'n_estimators': n_trees, 'candidates': len(alive), 'fits': finished,
+                          'seconds': seconds, 'best_rmse': math.sqrt(ranking[0][0])})
+            log(f"   rung {rung + 1}: {len(alive)} candidates × {n_trees} trees, "
+                f"{finished} fits in {seconds:.1f}s, best CV RMSE {math.sqrt(ranking[0][0]):.3f}")
+        if exhausted:
+            pool.shutdown(wait=True, cancel_futures=True)
+    search_seconds = perf_counter() - started
+
+    if ranking is None:
+        raise RuntimeError(f"Time budget of {time_budget:g}s ran out before the first rung finished")
+    best_mse, best = ranking[0]
+    best_params = dict(candidates[best], n_estimators=grown)
+
+    model, refit_seconds = None, 0.0
+    if refit:
+        from sklearn.ensemble import RandomForestRegressor
+
+        refit_started = perf_counter()
+        model = RandomForestRegressor(random_state=seed, n_jobs=workers, **best_params).fit(X, y)
+        model.set_params(n_jobs=None)  # serving decides its own parallelism
+        refit_seconds = perf_counter() - refit_started
+
+    return SearchResult(best_params=best_params, best_rmse=math.sqrt(best_mse), model=model, rungs=rungs,
+                        fits=fits, trees=trees, wall_seconds=perf_counter() - started,
+                        search_seconds=search_seconds, refit_seconds=refit_seconds,
+                        budget_exhausted=exhausted, seed=seed)
+
+def print_report(result, file=sys.stdout):
+    print("🌲 Random Forest search", file=file)
+    for i, rung in enumerate(result.rungs, 1):
+        print(f"   rung {i}: {rung['candidates']:>3} candidates × {rung['n_estimators']:>3} trees  "
+              f"{rung['fits']:>4} fits  {rung['seconds']:7.1f}s  best CV RMSE {rung['best_rmse']:.3f}", file=file)
+    print(f"   Best parameters: {result.best_params}", file=file)
+    print(f"   Best CV RMSE: {result.best_rmse:.3f} kW", file=file)
+    print(f"   {result.fits} fits ({result.trees:,} trees) in {result.search_seconds:.1f}s: "
+          f"{result.fits_per_second:.2f} fits/s", file=file)
+    print(f"   Refit on all rows: {result.refit_seconds:.1f}s | wall time {result.wall_seconds:.1f}s"
+          f"{' (budget exhausted)' if result.budget_exhausted else ''}", file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Successive-halving Random Forest search on a training frame")
+    parser.add_argument('data', help="CSV or Parquet file with the notebook's columns (clock, temp, weather, ...)")
+    parser.add_argument('--target', default='total_generation')
+    parser.add_argument('--budget', type=float, default=DEFAULT_TIME_BUDGET, help="Seconds for the search")
+    parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES)
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    from feature_engineering import ENHANCED_FEATURES, FeaturePipeline, FeatureState
+
+    frame = pd.read_parquet(args.data) if args.data.endswith('.parquet') else pd.read_csv(args.data)
+    frame['clock'] = pd.to_datetime(frame['clock'])
+    pipeline = FeaturePipeline(ENHANCED_FEATURES, state=FeatureState.fit(frame))
+    result = search_random_forest(pipeline.transform_frame(frame), frame[args.target].to_numpy(),
+                                  n_candidates=args.candidates, n_folds=args.folds, time_budget=args.budget,
+                                  workers=args.workers, seed=args.seed, refit=False)
+    print_report(result)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import numpy as np
+
+# Plant behind the notebook's create_power_generation_data (all outputs in kW)
+SOLAR_CAPACITY = 50.0       # array output at 1000 W/m²
+CUT_IN_SPEED = 3.0          # m/s
+RATED_SPEED = 12.0          # m/s
+CUT_OUT_SPEED = 25.0        # m/s
+RATED_WIND_POWER = 30.0
+BACKUP_TARGET = 70.0        # gas tops renewables up towards this level...
+BACKUP_SHARE = 0.85         # ...covering this share of the shortfall
+
+# Every function takes arrays or plain numbers. Single-row requests pass
+# numbers, which skip numpy: its per-call overhead is ~20x the arithmetic.
+
+def _is_number(value):
+    return isinstance(value, (int, float))
+
+def solar_power(solar_irradiance):
+    '''Array output, linear in irradiance
+
+    Weather and panel temperature already act on the measured irradiance,
+    so they are not applied a second time here.
+    '''
+    if _is_number(solar_irradiance):
+        return SOLAR_CAPACITY * max(0.0, solar_irradiance) / 1000
+    return SOLAR_CAPACITY * np.maximum(0, np.asarray(solar_irradiance, dtype=np.float64)) / 1000
+
+def wind_power(wind_speed):
+    '''Turbine power curve: nothing below cut-in, cubic up to rated speed, flat until cut-out'''
+    if _is_number(wind_speed):
+        if wind_speed >= CUT_OUT_SPEED:
+            return 0.0
+        ramp = (min(max(wind_speed, CUT_IN_SPEED), RATED_SPEED) - CUT_IN_SPEED) / (RATED_SPEED - CUT_IN_SPEED)
+        return RATED_WIND_POWER * ramp ** 3
+    wind_speed = np.asarray(wind_speed, dtype=np.float64)
+    ramp = (np.clip(wind_speed, CUT_IN_SPEED, RATED_SPEED) - CUT_IN_SPEED) / (RATED_SPEED - CUT_IN_SPEED)
+    return np.where(wind_speed < CUT_OUT_SPEED, RATED_WIND_POWER * ramp ** 3, 0.0)
+
+def backup_power(renewable):
+    '''Gas generation dispatched to cover the renewable shortfall'''
+    if _is_number(renewable):
+        return BACKUP_SHARE * max(0.0, BACKUP_TARGET - renewable)
+    return BACKUP_SHARE * np.maximum(0, BACKUP_TARGET - renewable)
+
+def physics_components(wind_speed, solar_irradiance):
+    '''Expected solar, wind and backup generation for each observation'''
+    solar = solar_power(solar_irradiance)
+    wind = wind_power(wind_speed)
+    return solar, wind, backup_power(solar + wind)
+
+def physics_based_estimate(wind_speed, solar_irradiance):
+    '''Total generation from the plant model alone; the fallback when no model can score'''
+    solar, wind, backup = physics_components(wind_speed, solar_irradiance)
+    return solar + wind + backup
+
+def estimate_generation_breakdown(prediction, wind_speed, solar_irradiance):
+    '''Split predicted totals into solar, wind and backup
+
+    Renewables are dispatched first at their physical output and backup
+    covers the rest. When the prediction is below what the renewables alone
+    would produce, both are scaled down so the parts still add up.
+    '''
+    solar = solar_power(solar_irradiance)
+    wind = wind_power(wind_speed)
+    renewable = solar + wind
+    if _is_number(prediction) and _is_number(renewable):
+        prediction = max(0.0, prediction)
+        scale = min(1.0, prediction / renewable) if renewable > 0 else 1.0
+        solar, wind = solar * scale, wind * scale
+        return solar, wind, max(0.0, prediction - solar - wind)
+
+    prediction = np.maximum(0, np.asarray(prediction, dtype=np.float64))
+    scale = np.minimum(1.0, prediction / np.where(renewable > 0, renewable, 1.0))
+    solar = solar * scale
+    wind = wind * scale
+    return solar, wind, np.maximum(0, prediction - solar - wind)
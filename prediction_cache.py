@@ -0,0 +1,122 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic
+
+from feature_engineering import INPUT_FIELDS
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600
+NUMERIC_FIELDS = tuple(field for field in INPUT_FIELDS if field != 'weather')
+
+def parse_quantization(spec):
+    '''"temperature=0.5,solar_irradiance=10" -> {field: step}; unknown fields are an error'''
+    steps = {}
+    for part in filter(None, (p.strip() for p in (spec or '').split(','))):
+        field, _, step = part.partition('=')
+        field = field.strip()
+        if field not in NUMERIC_FIELDS:
+            raise ValueError(f"Cannot quantize unknown field '{field}'")
+        steps[field] = float(step)
+    return steps
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of model predictions for repeated inputs.
+
+    Keys are (model name, model version, quantized inputs, hour bucket).
+    Every time feature depends only on the date and hour, so with the
+    default step of 0 (exact match) a hit returns exactly what the model
+    would have computed. Coarser steps per field trade accuracy for hit
+    rate: readings within one step share the first prediction made.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 quantization=None, clock=monotonic):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.steps = tuple((quantization or {}).get(field, 0.0) for field in NUMERIC_FIELDS)
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls):
+        '''Cache configured by POWER_CACHE_*, or None when POWER_CACHE=0'''
+        if os.environ.get('POWER_CACHE', '1').lower() in ('0', 'false', 'no', 'off'):
+            return None
+        return cls(max_entries=int(os.environ.get('POWER_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+                   ttl_seconds=float(os.environ.get('POWER_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+                   quantization=parse_quantization(os.environ.get('POWER_CACHE_QUANTIZATION')))
+
+    def key(self, handle, data, moment=None):
+        '''Cache key for one observation; raises ValueError/TypeError for unusable input'''
+        moment = moment or datetime.now()
+        quantized = []
+        for field, step in zip(NUMERIC_FIELDS, self.steps):
+            value = float(data[field])
+            quantized.append(round(value / step) if step > 0 else value)
+        weather = data['weather']
+        if not isinstance(weather, str):
+            raise TypeError("weather must be a string")
+        return (handle.name, handle.version, weather, tuple(quantized),
+                (moment.year, moment.month, moment.day, moment.hour))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_model(self, name):
+        '''Drop every entry of a model, e.g. after a new version was swapped in'''
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == name]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'quantization': {field: step for field, step in zip(NUMERIC_FIELDS, self.steps) if step},
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,277 @@
+import atexit
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from feature_engineering import DEFAULT_ROLLING_WINDOWS, ROLLING_FEATURES
+from service_logging import get_logger
+
+DEFAULT_MAX_SITES = 10000
+DEFAULT_MAX_GAP_SECONDS = 3 * 3600  # an hourly site that skipped more than two readings starts over
+DEFAULT_SNAPSHOT_INTERVAL = 60  # seconds
+RESYNC_INTERVAL = 1024  # observations between exact recomputations of a site's running sums
+
+# Training column behind each rolling feature -> request field carrying it
+SOURCE_FIELDS = {'temp': 'temperature', 'wind': 'wind', 'humidity': 'humidity',
+                 'solar_irradiance': 'solar_irradiance'}
+
+logger = get_logger('rolling')
+
+class RollingStore:
+    """Recent observations per site, for true rolling features on streaming input.
+
+    A site's last `capacity` readings live in a ring buffer inside one
+    preallocated (max_sites, sources, capacity) array, next to running sums
+    and sums of squares for every window. An observation updates them in
+    O(1), so the rolling mean and std come out without rescanning history.
+    Memory is fixed by max_sites; when it is full the site heard from least
+    recently gives up its slot. A site silent for longer than max_gap
+    seconds starts a fresh window, as stale readings do not describe the
+    current weather. So does a site whose readings go back in time, since
+    the windows only describe readings in order.
+
+    The store lives in one process. With several server workers, route each
+    site to the same worker (or run one worker with threads), and give each
+    process its own snapshot path.
+    """
+
+    def __init__(self, max_sites=DEFAULT_MAX_SITES, rolling_windows=None, max_gap=DEFAULT_MAX_GAP_SECONDS,
+                 snapshot_path=None, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        self.max_sites = max(1, int(max_sites))
+        self.rolling_windows = {**DEFAULT_ROLLING_WINDOWS, **(rolling_windows or {})}
+        self.windows = tuple(sorted(set(self.rolling_windows.values())))
+        self._window_sizes = np.array(self.windows)
+        self.capacity = max(self.windows)
+        self.sources = tuple(SOURCE_FIELDS)
+        self.max_gap = float(max_gap)
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = float(snapshot_interval)
+
+        # feature -> (window index, source index, statistic)
+        self._features = {name: (self.windows.index(self.rolling_windows[statistic]),
+                                 self.sources.index(source), statistic)
+                          for name, (source, statistic) in ROLLING_FEATURES.items()}
+
+        shape = (self.max_sites, len(self.windows), len(self.sources))
+        self._values = np.zeros((self.max_sites, len(self.sources), self.capacity))
+        self._sums = np.zeros(shape)
+        self._squares = np.zeros(shape)
+        self._count = np.zeros(self.max_sites, dtype=np.int64)
+        self._head = np.zeros(self.max_sites, dtype=np.int64)  # next ring position to write
+        self._pushes = np.zeros(self.max_sites, dtype=np.int64)
+        self._last_seen = np.zeros(self.max_sites)  # epoch seconds of the latest observation
+
+        self._slots = OrderedDict()  # site id -> slot, least recently updated first
+        self._free = list(range(self.max_sites - 1, -1, -1))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+        self.evictions = 0
+        self.resets = 0
+
+    @classmethod
+    def from_env(cls):
+        '''Store configured by POWER_ROLLING_*, or None when POWER_ROLLING_STORE=0'''
+        if os.environ.get('POWER_ROLLING_STORE', '1').lower() in ('0', 'false', 'no', 'off'):
+            return None
+        store = cls(max_sites=int(os.environ.get('POWER_ROLLING_MAX_SITES', DEFAULT_MAX_SITES)),
+                    max_gap=float(os.environ.get('POWER_ROLLING_MAX_GAP', DEFAULT_MAX_GAP_SECONDS)),
+                    snapshot_path=os.environ.get('POWER_ROLLING_SNAPSHOT') or None,
+                    snapshot_interval=float(os.environ.get('POWER_ROLLING_SNAPSHOT_INTERVAL',
+                                                           DEFAULT_SNAPSHOT_INTERVAL)))
+        if store.snapshot_path and os.path.exists(store.snapshot_path):
+            try:
+                store.restore(store.snapshot_path)
+            except Exception as e:
+                logger.exception(f"❌ Could not restore rolling history from {store.snapshot_path}: {e}")
+        return store
+
+    def serves(self, state):
+        '''True when a model's FeatureState uses this store's windows'''
+        return state.rolling_windows == self.rolling_windows
+
+    # ---- updates -----------------------------------------------------------
+
+    def _slot(self, site_id):
+        slot = self._slots.get(site_id)
+        if slot is not None:
+            self._slots.move_to_end(site_id)
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self.evictions += 1
+        self._clear(slot)
+        self._slots[site_id] = slot
+        return slot
+
+    def _clear(self, slot):
+        self._count[slot] = self._head[slot] = self._pushes[slot] = 0
+        self._sums[slot] = self._squares[slot] = 0.0
+
+    def update(self, site_id, observation, moment=None):
+        '''Add one observation (request fields -> values) and return the site's rolling features
+
+        The result maps every rolling feature name to its value over the
+        latest readings, this one included, exactly as a training frame
+        computes it for the same sequence of rows.
+        '''
+        x = np.array([float(observation[SOURCE_FIELDS[source]]) for source in self.sources])
+        seen = (moment or datetime.now()).timestamp()
+        self._ensure_snapshots()
+
+        with self._lock:
+            slot = self._slot(str(site_id))
+            gap = seen - self._last_seen[slot]
+            if self._count[slot] and (gap < 0 or gap > self.max_gap):
+                self._clear(slot)
+                self.resets += 1
+
+            head, count = self._head[slot], self._count[slot]
+            # Per window, the reading that drops out of it (zero while the window is filling)
+            old = self._values[slot][:, (head - self._window_sizes) % self.capacity].T
+            old *= (count >= self._window_sizes)[:, None]
+            self._sums[slot] += x - old
+            self._squares[slot] += x * x - old * old
+            self._values[slot, :, head] = x
+            self._head[slot] = (head + 1) % self.capacity
+            self._count[slot] = min(count + 1, self.capacity)
+            self._last_seen[slot] = seen
+            self._pushes[slot] += 1
+            if self._pushes[slot] % RESYNC_INTERVAL == 0:
+                self._recompute(np.array([slot]))  # drop accumulated rounding error
+            return self._statistics(slot)
+
+    def _statistics(self, slot):
+        # A handful of numbers: plain floats beat numpy's per-operation overhead here
+        count = int(self._count[slot])
+        sums, squares = self._sums[slot].tolist(), self._squares[slot].tolist()
+        result = {}
+        for name, (k, j, statistic) in self._features.items():
+            n = min(count, self.windows[k])
+            mean = sums[k][j] / n
+            if statistic == 'mean':
+                result[name] = mean
+            else:
+                result[name] = math.sqrt(max(squares[k][j] - sums[k][j] * mean, 0.0) / (n - 1)) if n > 1 else 0.0
+        return result
+
+    def _recompute(self, slots):
+        '''Running sums of the given slots, summed afresh from their rings'''
+        head, count = self._head[slots], self._count[slots]
+        for k, window in enumerate(self.windows):
+            lag = np.arange(window)
+            positions = (head[:, None] - 1 - lag) % self.capacity  # newest reading first
+            held = lag < np.minimum(count, window)[:, None]
+            readings = np.where(held[:, :, None], self._values[slots[:, None], :, positions], 0.0)
+            self._sums[slots, k] = readings.sum(axis=1)
+            self._squares[slots, k] = (readings * readings).sum(axis=1)
+
+    # ---- reads -------------------------------------------------------------
+
+    def history(self, site_id):
+        '''(n, sources) array of a site's readings, oldest first; empty for unknown sites'''
+        with self._lock:
+            slot = self._slots.get(str(site_id))
+            if slot is None:
+                return np.empty((0, len(self.sources)))
+            count = self._count[slot]
+            positions = (self._head[slot] - count + np.arange(count)) % self.capacity
+            return self._values[slot][:, positions].T.copy()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def stats(self):
+        return {
+            'sites': len(self._slots),
+            'max_sites': self.max_sites,
+            'capacity': self.capacity,
+            'evictions': self.evictions,
+            'resets': self.resets,
+            'snapshot_path': self.snapshot_path,
+        }
+
+    # ---- snapshots ---------------------------------------------------------
+
+    def save(self, path=None):
+        '''Write every site's readings to an .npz file; the file is replaced atomically'''
+        path = path or self.snapshot_path
+        with self._lock:
+            sites = list(self._slots)
+            slots = np.array([self._slots[site] for site in sites], dtype=np.int64)
+            count = self._count[slots]
+            # Rings rotated so position 0 is the oldest reading each site holds
+            positions = (self._head[slots, None] - count[:, None] + np.arange(self.capacity)) % self.capacity
+            values = self._values[slots[:, None], :, positions].transpose(0, 2, 1)
+            last_seen = self._last_seen[slots]
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, sites=np.array(sites, dtype=str), sources=np.array(self.sources),
+                     values=values, count=count, last_seen=last_seen)
+        os.replace(tmp_path, path)
+        return len(sites)
+
+    def restore(self, path=None):
+        '''Load readings written by save(); sites beyond max_sites (oldest first) are dropped'''
+        path = path or self.snapshot_path
+        with np.load(path, allow_pickle=False) as snapshot:
+            sources = [str(source) for source in snapshot['sources']]
+            if sources != list(self.sources):
+                raise ValueError(f"Snapshot holds {sources}, expected {list(self.sources)}")
+            sites = snapshot['sites'][-self.max_sites:]
+            values = snapshot['values'][-self.max_sites:]
+            count = snapshot['count'][-self.max_sites:]
+            last_seen = snapshot['last_seen'][-self.max_sites:]
+
+        with self._lock:
+            self._slots.clear()
+            self._free = list(range(self.max_sites - 1, -1, -1))
+            n_sites = len(sites)
+            slots = np.arange(n_sites)
+            # Keep the newest `capacity` readings, oldest at ring position 0
+            keep = np.minimum(count, self.capacity)
+            start = count - keep
+            positions = (start[:, None] + np.arange(self.capacity)) % max(values.shape[2], 1)
+            self._values[:n_sites] = values[slots[:, None], :, positions].transpose(0, 2, 1)
+            self._count[:n_sites] = keep
+            self._head[:n_sites] = keep % self.capacity
+            self._pushes[:n_sites] = 0
+            self._last_seen[:n_sites] = last_seen
+            self._recompute(slots)
+            for slot, site in enumerate(sites):
+                self._slots[str(site)] = slot
+            self._free = list(range(self.max_sites - 1, n_sites - 1, -1))
+        logger.info(f"♻️  Restored rolling history for {n_sites} sites from {path}")
+        return n_sites
+
+    def _ensure_snapshots(self):
+        # Started lazily, and again after a fork: threads do not survive into workers
+        if not self.snapshot_path or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._snapshot_loop, name='rolling-snapshots', daemon=True).start()
+        atexit.register(self._final_snapshot)
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            try:
+                self.save()
+            except Exception as e:
+                logger.exception(f"❌ Rolling history snapshot failed: {e}")
+
+    def _final_snapshot(self):
+        self._stop.set()
+        try:
+            self.save()
+        except Exception as e:
+            logger.exception(f"❌ Rolling history snapshot failed: {e}")
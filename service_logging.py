@@ -0,0 +1,93 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+LOGGER_NAME = 'power_service'
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_SAMPLE_RATE = 0.01
+
+_listener = None
+
+def configure_logging(level=None, sample_rate=None):
+    """Route service logs through a non-blocking queue handler.
+
+    Request threads only put records on an in-memory queue; a single
+    background listener thread formats them and writes to stderr. Level
+    and request sampling rate come from POWER_LOG_LEVEL and
+    POWER_LOG_SAMPLE_RATE unless passed explicitly.
+    """
+    global _listener
+
+    logger = logging.getLogger(LOGGER_NAME)
+    level = level or os.environ.get('POWER_LOG_LEVEL', DEFAULT_LEVEL)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+    if sample_rate is None:
+        sample_rate = float(os.environ.get('POWER_LOG_SAMPLE_RATE', DEFAULT_SAMPLE_RATE))
+    request_sampler.rate = sample_rate
+
+    if _listener is None:
+        log_queue = queue.SimpleQueue()
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+    return logger
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def _restart_listener_after_fork():
+    '''The listener thread does not survive fork(); give each forked worker its own'''
+    global _listener
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger(LOGGER_NAME).handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+def get_logger(name=None):
+    '''Child logger of the service logger, e.g. get_logger("predict")'''
+    return logging.getLogger(f'{LOGGER_NAME}.{name}' if name else LOGGER_NAME)
+
+class RequestSampler:
+    """Decides once per request whether its detail lines get logged"""
+
+    def __init__(self, rate=DEFAULT_SAMPLE_RATE):
+        self.rate = rate
+
+    def sample(self):
+        if self.rate >= 1:
+            return True
+        if self.rate <= 0:
+            return False
+        return random.random() < self.rate
+
+request_sampler = RequestSampler()
+
+def log_feature_schema(logger, pipeline, available_features):
+    '''One-time report of how the model's columns line up with the feature builder'''
+    missing = pipeline.missing
+    extra = sorted(set(available_features) - set(pipeline.feature_names))
+
+    logger.info("Feature schema: %d model features, %d built by the feature pipeline, %d unused builder features",
+                len(pipeline.feature_names), len(pipeline.feature_names) - len(missing), len(extra))
+    if missing:
+        logger.warning("Model features missing from the feature builder (%d), filled with defaults: %s",
+                       len(missing), missing)
+    if extra:
+        logger.debug("Builder features not used by the model (%d): %s", len(extra), extra)
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope='session')
+def service():
+    '''The Flask app module, serving the repository's model packages'''
+    os.environ.setdefault('POWER_MODEL_DIR', ROOT)
+    import enhanced_flask_app
+    assert len(enhanced_flask_app.registry)
+    return enhanced_flask_app
+
+@pytest.fixture
+def client(service, monkeypatch):
+    '''Test client with the cache, micro-batcher and rolling store off unless a test turns them on'''
+    monkeypatch.setattr(service, 'prediction_cache', None)
+    monkeypatch.setattr(service, 'micro_batcher', None)
+    monkeypatch.setattr(service, 'rolling_store', None)
+    return service.app.test_client()
+
+@pytest.fixture
+def make_package(tmp_path):
+    '''Writes a small linear <name>_power_generation_model.pkl into tmp_path and returns its path'''
+    import joblib
+    import numpy as np
+    from sklearn.linear_model import LinearRegression
+    from feature_engineering import ORIGINAL_FEATURES
+
+    def make(name, seed=0):
+        rng = np.random.default_rng(seed)
+        X = rng.normal(size=(100, len(ORIGINAL_FEATURES)))
+        model = LinearRegression().fit(X, X @ rng.normal(size=X.shape[1]) + 50)
+        path = tmp_path / f'{name}_power_generation_model.pkl'
+        joblib.dump({'model': model, 'scaler': None, 'feature_names': list(ORIGINAL_FEATURES),
+                     'version': f'{name}-{seed}'}, path)
+        return str(path)
+    return make
@@ -0,0 +1,87 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from batch_score import score_file
+from feature_engineering import ENHANCED_FEATURES, ROLLING_FEATURES
+from model_registry import load_model_handle
+from physics import physics_based_estimate
+
+def rolling_handle(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(ENHANCED_FEATURES)))
+    model = LinearRegression().fit(X, X @ rng.normal(size=X.shape[1]))
+    path = str(tmp_path / 'rolling_power_generation_model.pkl')
+    joblib.dump({'model': model, 'scaler': None, 'feature_names': list(ENHANCED_FEATURES)}, path)
+    return load_model_handle(path)
+
+def history_file(tmp_path, n_rows=60):
+    rng = np.random.default_rng(1)
+    frame = pd.DataFrame({
+        'clock': pd.date_range('2025-07-01', periods=n_rows, freq='h'),
+        'temp': rng.uniform(5, 35, n_rows),
+        'weather': rng.choice(['Clear', 'Sunny', 'Cloudy', 'Overcast', 'Rainy'], n_rows),
+        'wind': rng.uniform(0, 25, n_rows),
+        'humidity': rng.uniform(20, 95, n_rows),
+        'barometer': rng.uniform(990, 1030, n_rows),
+        'solar_irradiance': rng.uniform(0, 1000, n_rows),
+    })
+    path = tmp_path / 'history.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+def score(tmp_path, handle, source, chunk_rows, series):
+    output = str(tmp_path / f'predictions_{chunk_rows}_{series}.csv')
+    score_file(source, output, handle, chunk_rows=chunk_rows, series=series, quiet=True)
+    return pd.read_csv(output)
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 7, 25])
+def test_series_scoring_does_not_depend_on_chunk_size(tmp_path, chunk_rows):
+    handle = rolling_handle(tmp_path)
+    assert any(name in ROLLING_FEATURES for name in handle.feature_names)
+    source = history_file(tmp_path)
+
+    whole = score(tmp_path, handle, source, 1000, series=True)
+    chunked = score(tmp_path, handle, source, chunk_rows, series=True)
+    assert len(chunked) == len(whole) == 60
+    assert (chunked['prediction_method'] == 'enhanced').all()
+    np.testing.assert_allclose(chunked['predicted_generation'], whole['predicted_generation'], rtol=1e-9)
+
+    independent = score(tmp_path, handle, source, 1000, series=False)
+    assert not np.allclose(independent['predicted_generation'], whole['predicted_generation'])
+
+def test_series_scoring_rejects_unordered_timestamps(tmp_path):
+    handle = rolling_handle(tmp_path)
+    source = history_file(tmp_path)
+    frame = pd.read_csv(source)
+    frame.iloc[::-1].to_csv(source, index=False)
+    with pytest.raises(ValueError, match='strictly increasing'):
+        score(tmp_path, handle, source, 1000, series=True)
+
+@pytest.mark.parametrize('series', [False, True])
+def test_invalid_cells_fall_back_row_by_row(tmp_path, series):
+    handle = rolling_handle(tmp_path)
+    source = history_file(tmp_path)
+    clean = score(tmp_path, handle, source, 1000, series=series)
+
+    frame = pd.read_csv(source).astype({'temp': object})
+    frame.loc[5, 'temp'] = 'n/a'       # non-numeric cell
+    frame.loc[9, 'humidity'] = None     # blank cell
+    frame.loc[12, 'weather'] = None
+    frame.to_csv(source, index=False)
+    output = str(tmp_path / 'predictions.csv')
+    stats = score_file(source, output, handle, chunk_rows=7, series=series, quiet=True)
+    scored = pd.read_csv(output)
+
+    bad = [5, 9, 12]
+    assert stats['fallback_rows'] == len(bad)
+    assert list(np.flatnonzero(scored['prediction_method'] == 'physics_based')) == bad
+    expected = physics_based_estimate(frame.loc[bad, 'wind'].to_numpy(), frame.loc[bad, 'solar_irradiance'].to_numpy())
+    np.testing.assert_allclose(scored.loc[bad, 'predicted_generation'], expected, atol=1e-4)
+    if not series:  # independent rows: the neighbours of a bad row are untouched
+        good = scored.index.difference(bad)
+        np.testing.assert_allclose(scored.loc[good, 'predicted_generation'],
+                                   clean.loc[good, 'predicted_generation'], rtol=1e-9)
+    assert np.isfinite(scored['predicted_generation']).all()
@@ -0,0 +1,80 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from columnar_io import (ARROW_MEDIA_TYPE, MAX_NPZ_MEMBERS, NPZ_MEDIA_TYPE, decode_columns, encode_npz)
+from feature_engineering import INPUT_FIELDS
+
+def columns(n_rows):
+    rng = np.random.default_rng(0)
+    bundle = {field: rng.uniform(0, 30, n_rows) for field in INPUT_FIELDS if field != 'weather'}
+    bundle['weather'] = np.array(['Sunny', 'Cloudy'])[rng.integers(0, 2, n_rows)]
+    return bundle
+
+def compressed_npz(bundle):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **bundle)
+    return buffer.getvalue()
+
+def test_npz_round_trip_within_limits():
+    bundle = columns(100)
+    for body in (encode_npz(bundle), compressed_npz(bundle)):
+        inputs, timestamps, n_rows = decode_columns(NPZ_MEDIA_TYPE, body, max_rows=100)
+        assert n_rows == 100 and timestamps is None
+        np.testing.assert_array_equal(inputs['wind'], bundle['wind'])
+
+@pytest.mark.parametrize('pack', [encode_npz, compressed_npz])
+def test_npz_rows_are_limited_before_the_data_is_read(pack):
+    body = pack(dict(columns(10), temperature=np.zeros(1_000_000)))
+    if pack is compressed_npz:
+        assert len(body) < 100_000  # 8 MB of zeros
+    with pytest.raises(ValueError, match="Batch too large: column 'temperature' has 1000000 rows"):
+        decode_columns(NPZ_MEDIA_TYPE, body, max_rows=50_000)
+
+@pytest.mark.parametrize('column, message', [
+    (np.zeros((10, 2)), "must be one-dimensional"),
+    (np.array(['x' * 200] * 10), "bytes wide"),
+])
+def test_npz_refuses_oversized_columns(column, message):
+    body = encode_npz(dict(columns(10), humidity=column))
+    with pytest.raises(ValueError, match=message):
+        decode_columns(NPZ_MEDIA_TYPE, body, max_rows=50_000)
+
+def test_npz_refuses_too_many_members_and_lying_headers():
+    extra = {f'extra_{i}': np.zeros(1) for i in range(MAX_NPZ_MEMBERS)}
+    with pytest.raises(ValueError, match='arrays'):
+        decode_columns(NPZ_MEDIA_TYPE, encode_npz(dict(columns(10), **extra)))
+
+    # A stored member whose header promises more rows than the body holds
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {'descr': '<f8', 'fortran_order': False, 'shape': (1000,)})
+        archive.writestr('temperature.npy', header.getvalue() + b'\0' * 80)
+    with pytest.raises(ValueError, match="column 'temperature' is not a readable"):
+        decode_columns(NPZ_MEDIA_TYPE, buffer.getvalue(), max_rows=50_000)
+
+def test_arrow_rows_are_limited():
+    pytest.importorskip('pyarrow')
+    from columnar_io import encode_arrow
+    body = encode_arrow(columns(100))
+    inputs, _, n_rows = decode_columns(ARROW_MEDIA_TYPE, body, max_rows=100)
+    assert n_rows == 100 and isinstance(inputs['temperature'], np.ndarray)
+    with pytest.raises(ValueError, match='Batch too large'):
+        decode_columns(ARROW_MEDIA_TYPE, body, max_rows=99)
+    with pytest.raises(ValueError, match='not a readable Arrow stream'):
+        decode_columns(ARROW_MEDIA_TYPE, b'\xff' * 64)
+
+def test_endpoint_limits(service, client, monkeypatch):
+    monkeypatch.setattr(service, 'MAX_BATCH_ROWS', 50)
+    response = client.post('/api/predict/batch', data=compressed_npz(columns(51)), content_type=NPZ_MEDIA_TYPE)
+    assert response.status_code == 400
+    assert 'Batch too large' in response.get_json()['error']
+
+    assert service.app.config['MAX_CONTENT_LENGTH']
+    monkeypatch.setitem(service.app.config, 'MAX_CONTENT_LENGTH', 1024)
+    response = client.post('/api/predict/batch', data=encode_npz(columns(200)), content_type=NPZ_MEDIA_TYPE)
+    assert response.status_code == 413
+    assert response.get_json()['success'] is False
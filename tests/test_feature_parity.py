@@ -0,0 +1,62 @@
+import ast
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from feature_engineering import (ENHANCED_FEATURES, ORIGINAL_FEATURES, ROLLING_FEATURES, UNOBSERVED_FEATURES,
+                                 FeaturePipeline, FeatureState)
+
+NOTEBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'power_generation_notebook.ipynb')
+NOTEBOOK_FUNCTIONS = ('create_power_generation_data', 'prepare_original_features', 'create_enhanced_features')
+
+pytestmark = pytest.mark.filterwarnings('ignore::pandas.errors.PerformanceWarning')  # the notebook's column inserts
+
+def notebook_functions():
+    '''The notebook's own data and feature functions, taken from its cells without running them'''
+    with open(NOTEBOOK) as f:
+        cells = [''.join(cell['source']) for cell in json.load(f)['cells'] if cell['cell_type'] == 'code']
+    definitions = [node for source in cells for node in ast.parse(source).body
+                   if isinstance(node, ast.FunctionDef) and node.name in NOTEBOOK_FUNCTIONS]
+    namespace = {'np': np, 'pd': pd, 'datetime': datetime, 'timedelta': timedelta,
+                 'LabelEncoder': LabelEncoder, 'print': lambda *args, **kwargs: None}
+    exec(compile(ast.Module(body=definitions, type_ignores=[]), NOTEBOOK, 'exec'), namespace)
+    return [namespace[name] for name in NOTEBOOK_FUNCTIONS]
+
+@pytest.fixture(scope='module')
+def notebook():
+    create_data, prepare_original, create_enhanced = notebook_functions()
+    data = create_data(2000)
+    return data, prepare_original(data)[0], create_enhanced(data)
+
+def assert_columns_match(expected, actual, names):
+    for index, name in enumerate(names):
+        # pandas' rolling std keeps running sums, so all-zero windows come out near, not at, zero
+        atol = 1e-4 if name in ROLLING_FEATURES else 1e-9
+        np.testing.assert_allclose(actual[:, index], np.asarray(expected[name], dtype=np.float64),
+                                   rtol=1e-9, atol=atol, err_msg=name)
+
+@pytest.mark.parametrize('features, frame_index', [(ORIGINAL_FEATURES, 1), (ENHANCED_FEATURES, 2)])
+def test_pipeline_matches_notebook_features(notebook, features, frame_index):
+    data, expected = notebook[0], notebook[frame_index]
+    state = FeatureState.fit(data)  # the notebook fits its encoder and bins on every row
+    X = FeaturePipeline(features, state=state).transform_frame(data)
+
+    observed = [name for name in features if name not in UNOBSERVED_FEATURES]
+    assert_columns_match(expected, X[:, [features.index(name) for name in observed]], observed)
+    for name in UNOBSERVED_FEATURES:
+        if name in features:
+            np.testing.assert_allclose(X[:, features.index(name)], data[name].mean())
+
+def test_single_observation_matches_first_training_row(notebook):
+    data, expected = notebook[0], notebook[2]
+    pipeline = FeaturePipeline(ENHANCED_FEATURES, state=FeatureState.fit(data))
+    first = data.iloc[0]
+    X = pipeline.transform(first['temp'], first['weather'], first['wind'], first['humidity'],
+                           first['barometer'], first['solar_irradiance'], [first['clock']])
+    assert_columns_match(expected.iloc[:1], X, ENHANCED_FEATURES)
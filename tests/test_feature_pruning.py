@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_pruning import (correlated_features, pandas_correlated_features, prune_features,
+                             synthetic_features)
+
+def greedy_reference(X, threshold):
+    '''Keep a column unless DataFrame.corr() puts it above threshold with a column already kept'''
+    corr = pd.DataFrame(X).corr().abs().to_numpy()
+    kept = []
+    for j in range(corr.shape[1]):
+        if not any(corr[i, j] > threshold for i in kept):
+            kept.append(j)
+    return np.setdiff1d(np.arange(corr.shape[1]), kept)
+
+def wide_features(n_features=150, seed=0):
+    X = synthetic_features(400, n_features, seed=seed)
+    X[:, 5] = 3.0  # constant: pandas gives NaN, which correlates with nothing
+    X[:, 9] = -2 * X[:, 8] + 1  # exactly anti-correlated
+    return X
+
+@pytest.mark.parametrize('block_bytes', [4 * 150, 4 * 150 * 7, 64 << 20])
+def test_notebook_rule_drops_what_the_pandas_scan_drops(block_bytes):
+    X = wide_features()
+    dropped = correlated_features(X, 0.9, 'notebook', block_bytes)
+    np.testing.assert_array_equal(dropped, pandas_correlated_features(X, 0.9))
+    assert 9 in dropped and 5 not in dropped
+
+@pytest.mark.parametrize('block_bytes', [4 * 150, 4 * 150 * 7, 64 << 20])
+def test_greedy_rule_matches_a_dataframe_corr_walk(block_bytes):
+    X = wide_features(seed=1)
+    dropped = correlated_features(X, 0.8, 'greedy', block_bytes)
+    assert len(dropped) > 0
+    np.testing.assert_array_equal(dropped, greedy_reference(X, 0.8))
+    # Keeping only the first of each group drops no more than the notebook's scan
+    assert set(dropped) <= set(pandas_correlated_features(X, 0.8))
+
+def test_prune_features_names_the_kept_and_dropped_columns():
+    X = wide_features(n_features=20)
+    names = [f'f{i}' for i in range(20)]
+    result = prune_features(X, names, 0.9)
+    assert sorted(result.kept + result.dropped, key=names.index) == names
+    assert result.dropped == [names[i] for i in greedy_reference(X, 0.9)]
+    with pytest.raises(ValueError, match="Unknown pruning rule"):
+        prune_features(X, names, rule='average')
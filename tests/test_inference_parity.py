@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from inference import FALLBACK_MIN_ROWS, ForestPredictor, LinearPredictor, SklearnPredictor
+
+N_FEATURES = 6
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+def training_data(n_rows=400, seed=0, missing=False):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES)) * rng.uniform(0.5, 200, N_FEATURES)
+    y = X @ rng.normal(size=N_FEATURES) + np.sin(X[:, 0]) * 10 + rng.normal(0, 1, n_rows)
+    if missing:
+        X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+def edge_rows(thresholds, n_rows=300, seed=1):
+    '''Random rows, values exactly on split thresholds and just either side, float32 extremes and zeros'''
+    rng = np.random.default_rng(seed)
+    X = training_data(n_rows, seed)[0]
+    if thresholds.size:
+        on = rng.choice(thresholds, (n_rows, N_FEATURES))
+        pick = rng.random(X.shape)
+        X = np.where(pick < 0.3, on, X)
+        X = np.where((pick >= 0.3) & (pick < 0.4), np.nextafter(on.astype(np.float32), np.inf), X)
+        X = np.where((pick >= 0.4) & (pick < 0.5), np.nextafter(on.astype(np.float32), -np.inf), X)
+    X[:20] = rng.choice([0.0, -0.0, FLOAT32_MAX, -FLOAT32_MAX, 1e-45], (20, N_FEATURES))
+    return X
+
+def with_nan(X, seed=2):
+    X = X.copy()
+    X[np.random.default_rng(seed).random(X.shape) < 0.15] = np.nan
+    X[0] = np.nan
+    return X
+
+FORESTS = {
+    'random_forest': lambda: RandomForestRegressor(n_estimators=30, max_depth=8, random_state=0),
+    'extra_trees': lambda: ExtraTreesRegressor(n_estimators=30, max_depth=8, random_state=0),
+    'tree': lambda: DecisionTreeRegressor(max_depth=10, random_state=0),
+}
+
+@pytest.mark.filterwarnings('ignore:invalid value encountered:RuntimeWarning')  # sklearn fitting on NaN
+@pytest.mark.parametrize('threads', [1, 4])
+@pytest.mark.parametrize('trained_with_nan', [False, True])
+@pytest.mark.parametrize('name', sorted(FORESTS))
+def test_flattened_forest_matches_sklearn(name, trained_with_nan, threads):
+    model = FORESTS[name]().fit(*training_data(missing=trained_with_nan))
+    fast = ForestPredictor.from_sklearn(model, threads=threads)  # no fallback: always the flattened walk
+    X = edge_rows(fast.threshold[np.isfinite(fast.threshold)])
+
+    for rows in (X, with_nan(X)):
+        np.testing.assert_array_equal(fast.predict(rows), model.predict(rows))
+        if hasattr(model, 'estimators_'):
+            per_tree = np.array([tree.predict(rows.astype(np.float32)) for tree in model.estimators_])
+            np.testing.assert_array_equal(fast.leaf_values(rows), per_tree)
+
+@pytest.mark.filterwarnings('ignore:invalid value encountered:RuntimeWarning')
+@pytest.mark.parametrize('name', sorted(FORESTS))
+def test_large_batch_intervals_from_sklearn_trees_match(name):
+    model = FORESTS[name]().fit(*training_data(missing=True))
+    flat = ForestPredictor.from_sklearn(model, threads=1)
+    served = ForestPredictor.from_sklearn(model, threads=1, fallback=SklearnPredictor(model))
+    X = with_nan(edge_rows(flat.threshold[np.isfinite(flat.threshold)], n_rows=2 * FALLBACK_MIN_ROWS))
+
+    for expected, actual in zip(flat.predict_interval(X, 0.9), served.predict_interval(X, 0.9)):
+        np.testing.assert_array_equal(actual, expected)
+    np.testing.assert_array_equal(served.predict_interval(X, 0.9)[0], model.predict(X))
+
+@pytest.mark.parametrize('model', [LinearRegression(), Ridge(alpha=3.0)])
+@pytest.mark.parametrize('scaled', [False, True])
+def test_folded_linear_model_matches_sklearn(model, scaled):
+    X_train, y = training_data()
+    scaler = StandardScaler().fit(X_train) if scaled else None
+    model.fit(scaler.transform(X_train) if scaled else X_train, y)
+    fast = LinearPredictor.from_sklearn(model, scaler)
+
+    X = np.vstack([training_data(300, seed=3)[0] * 1e3, training_data(50, seed=4)[0] * 1e-9,
+                   np.zeros((1, N_FEATURES)), np.full((1, N_FEATURES), 1e150)])
+    expected = model.predict(scaler.transform(X) if scaled else X)
+    np.testing.assert_allclose(fast.predict(X), expected, rtol=1e-9, atol=1e-9 * np.abs(expected).max())
+
+    # sklearn refuses NaN; the folded model lets it through so the row can fall back on its own
+    predictions = fast.predict(with_nan(X))
+    assert np.isnan(predictions[np.isnan(with_nan(X)).any(axis=1)]).all()
+    assert np.isfinite(predictions[~np.isnan(with_nan(X)).any(axis=1)]).all()
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+
+import pytest
+
+from metrics import Metrics, read_directory, retire_worker
+
+def serve(metrics, requests, status):
+    for _ in range(requests):
+        timer = metrics.timer('predict')
+        timer.mark('features')
+        timer.method = 'enhanced'
+        timer.finish(status)
+
+def worker(directory, requests, status):
+    '''A worker process: record some requests and write its snapshot'''
+    metrics = Metrics(enabled=True, directory=directory)
+    serve(metrics, requests, status)
+    metrics.flush()
+
+def run_workers(directory, jobs):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=worker, args=(directory, *job)) for job in jobs]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    return [process.pid for process in processes]
+
+def count(text, status):
+    prefix = f'power_requests_total{{endpoint="predict",method="enhanced",status="{status}"}} '
+    return int(next(line for line in text.splitlines() if line.startswith(prefix))[len(prefix):])
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_scrape_adds_up_every_worker_and_keeps_retired_ones(tmp_path):
+    directory = str(tmp_path)
+    pids = run_workers(directory, [(3, 200), (5, 200), (2, 500)])
+    scraper = Metrics(enabled=True, directory=directory)
+    serve(scraper, 1, 200)  # the worker answering the scrape counts too
+
+    text = scraper.render()
+    assert count(text, 200) == 3 + 5 + 1
+    assert count(text, 500) == 2
+    assert 'power_metrics_workers 4' in text
+
+    # The master folds an exited worker into the retired totals
+    retire_worker(directory, pids[1])
+    text = scraper.render()
+    assert count(text, 200) == 3 + 5 + 1
+    assert 'power_metrics_workers 3' in text
+    state, workers = read_directory(directory)
+    assert workers == 3
+    assert sorted(entry[:2] for entry in state['stage_seconds']) == [['predict', 'features'],
+                                                                     ['predict', 'respond']]
+
+def test_without_directory_only_this_process_is_counted():
+    metrics = Metrics(enabled=True, directory=None)
+    serve(metrics, 2, 200)
+    text = metrics.render()
+    assert count(text, 200) == 2
+    assert 'power_metrics_workers' not in text
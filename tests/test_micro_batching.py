@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from feature_engineering import INPUT_FIELDS
+from inference import predict_with_interval
+from micro_batching import MicroBatcher, score_rows
+
+def observations(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 6, 1)
+    return [({'temperature': rng.uniform(5, 35), 'weather': str(rng.choice(['Sunny', 'Cloudy', 'Rainy'])),
+              'wind': rng.uniform(0, 25), 'humidity': rng.uniform(20, 95),
+              'barometer': rng.uniform(990, 1030), 'solar_irradiance': rng.uniform(0, 1000)},
+             start + timedelta(hours=i)) for i in range(n_rows)]
+
+class Recorder:
+    '''Stands in for score_rows: remembers each batch and returns row i's temperature as its prediction'''
+
+    def __init__(self, fail_handle=None):
+        self.batches = []
+        self.fail_handle = fail_handle
+
+    def __call__(self, handle, rows, timestamps):
+        self.batches.append((handle, len(rows)))
+        if handle == self.fail_handle:
+            raise RuntimeError("model failed")
+        return np.array([row['temperature'] for row in rows]), None
+
+def submit_concurrently(batcher, requests):
+    '''Submit (handle, row, timestamp) requests from one thread each; returns their results or errors'''
+    results = [None] * len(requests)
+    ready = threading.Barrier(len(requests))
+
+    def call(i, handle, row, moment):
+        ready.wait()
+        try:
+            results[i] = batcher.predict(handle, row, moment)
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=call, args=(i, *request)) for i, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_requests_are_merged():
+    score = Recorder()
+    batcher = MicroBatcher(max_rows=64, max_wait_ms=200, score=score)
+    requests = [('model', row, moment) for row, moment in observations(16)]
+    results = submit_concurrently(batcher, requests)
+
+    assert sum(size for _, size in score.batches) == 16
+    assert len(score.batches) < 16  # at least some requests shared a batch
+    assert [prediction for prediction, _ in results] == [row['temperature'] for _, row, _ in requests]
+
+def test_max_rows_caps_a_batch():
+    score = Recorder()
+    batcher = MicroBatcher(max_rows=4, max_wait_ms=200, score=score)
+    futures = [batcher.submit('model', row, moment) for row, moment in observations(10)]
+    for future in futures:
+        future.result(timeout=5)
+    assert max(size for _, size in score.batches) <= 4
+    assert sum(size for _, size in score.batches) == 10
+
+def test_bad_row_does_not_fail_its_neighbours():
+    score = Recorder(fail_handle='broken')
+    batcher = MicroBatcher(max_rows=64, max_wait_ms=200, score=score)
+    rows = observations(6)
+    requests = [('model', row, moment) for row, moment in rows[:3]]
+    requests.append(('model', dict(rows[3][0], humidity='damp'), rows[3][1]))  # rejected in the caller
+    requests += [('broken', row, moment) for row, moment in rows[4:]]  # a model that fails its group
+    results = submit_concurrently(batcher, requests)
+
+    assert [prediction for prediction, _ in results[:3]] == [row['temperature'] for row, _ in rows[:3]]
+    assert isinstance(results[3], ValueError)
+    assert all(isinstance(result, RuntimeError) for result in results[4:])
+    assert all(size <= 3 for handle, size in score.batches if handle == 'model')
+
+def test_batched_results_equal_unbatched_scoring(service):
+    handle = service.registry.get()
+    requests = [(handle, row, moment) for row, moment in observations(24, seed=1)]
+    batched = submit_concurrently(MicroBatcher(max_rows=64, max_wait_ms=50), requests)
+
+    for (_, row, moment), (prediction, bounds) in zip(requests, batched):
+        X = handle.feature_pipeline.transform(*(row[field] for field in INPUT_FIELDS), [moment])
+        expected, expected_bounds = predict_with_interval(handle.predictor, X)
+        assert prediction == pytest.approx(float(expected[0]), rel=1e-12)
+        if expected_bounds is None:
+            assert bounds is None
+        else:
+            assert bounds == pytest.approx((expected_bounds[0][0], expected_bounds[1][0]), rel=1e-12)
+
+    # score_rows on its own matches too: the batcher only regroups the rows
+    predictions, _ = score_rows(handle, [row for _, row, _ in requests], [moment for _, _, moment in requests])
+    np.testing.assert_allclose(predictions, [prediction for prediction, _ in batched], rtol=1e-12)
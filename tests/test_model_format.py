@@ -0,0 +1,56 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+from feature_engineering import ORIGINAL_FEATURES
+from model_format import MODEL_EXTENSION, export_package
+from model_registry import load_model_handle
+from train_pipeline import interval_statistics
+
+LEVEL = 0.9
+
+def training_data(n_rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, len(ORIGINAL_FEATURES))) * rng.uniform(1, 50, len(ORIGINAL_FEATURES))
+    y = X @ rng.normal(size=X.shape[1]) + rng.normal(0, 2, n_rows)
+    return X, y
+
+def linear_package(with_statistics):
+    X, y = training_data()
+    scaler = StandardScaler()
+    Z = scaler.fit_transform(X)
+    model = LinearRegression().fit(Z, y)
+    package = {'model': model, 'scaler': scaler, 'feature_names': list(ORIGINAL_FEATURES),
+               'performance_metrics': {'test_rmse': 2.07}}
+    if with_statistics:
+        package['prediction_interval'] = interval_statistics(Z, y - model.predict(Z))
+    return package
+
+def forest_package():
+    X, y = training_data(seed=1)
+    model = RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0).fit(X, y)
+    return {'model': model, 'scaler': None, 'feature_names': list(ORIGINAL_FEATURES)}
+
+def round_trip(tmp_path, package):
+    path = str(tmp_path / 'test_power_generation_model.pkl')
+    joblib.dump(package, path)
+    return load_model_handle(path), load_model_handle(export_package(path))
+
+@pytest.mark.parametrize('package, method', [
+    (linear_package(with_statistics=True), 'analytic'),
+    (linear_package(with_statistics=False), 'residual'),  # held-out RMSE fallback
+    (forest_package(), 'trees'),
+])
+def test_exported_model_keeps_its_prediction_intervals(tmp_path, package, method):
+    pickled, portable = round_trip(tmp_path, package)
+    assert portable.path.endswith(MODEL_EXTENSION)
+    assert pickled.predictor.interval_method == portable.predictor.interval_method == method
+
+    X = training_data(50, seed=2)[0]
+    expected, lower, upper = pickled.predictor.predict_interval(X, LEVEL)
+    predictions, portable_lower, portable_upper = portable.predictor.predict_interval(X, LEVEL)
+    np.testing.assert_allclose(predictions, expected, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(portable_upper - portable_lower, upper - lower, rtol=1e-9, atol=1e-9)
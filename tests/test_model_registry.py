@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from model_registry import ModelRegistry
+
+OBSERVATION = {'temperature': 24.0, 'weather': 'Sunny', 'wind': 11.0, 'humidity': 55.0,
+               'barometer': 1013.0, 'solar_irradiance': 600.0}
+
+@pytest.fixture
+def registry(tmp_path, make_package):
+    make_package('best')
+    make_package('improved', seed=1)
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.load_all() == 2
+    return registry
+
+def test_default_follows_precedence_and_can_be_moved(registry):
+    assert registry.get().name == 'best'
+    assert registry.get('improved-1').name == 'improved'  # by version
+    registry.set_default('improved')
+    assert registry.get().name == 'improved'
+    with pytest.raises(KeyError):
+        registry.set_default('missing')
+
+def test_swap_is_atomic_for_readers(registry, make_package):
+    held = registry.get('best')
+    failures = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                handle = registry.get('best')
+                assert handle.version in ('best-0', 'best-2', 'best-3')
+                assert handle.predictor is not None
+            except Exception as e:
+                failures.append(e)
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for seed in (2, 3, 2, 3):
+            registry.load(make_package('best', seed=seed))
+    finally:
+        stop.set()
+        reader.join()
+
+    assert not failures
+    assert held.version == 'best-0'  # a request keeps the handle it started with
+    assert registry.get('best').version == 'best-3'
+    assert registry.get().name == 'best'
+
+def test_only_files_in_the_model_directory_load(registry, tmp_path):
+    with pytest.raises(ValueError):
+        registry.load(str(tmp_path.parent / 'best_power_generation_model.pkl'))
+    with pytest.raises(FileNotFoundError):
+        registry.load('other_power_generation_model.pkl')
+
+@pytest.fixture
+def app_registry(service, registry, monkeypatch):
+    monkeypatch.setattr(service, 'registry', registry)
+    monkeypatch.delenv('POWER_ADMIN_TOKEN', raising=False)
+    return registry
+
+def test_each_request_picks_its_model(client, app_registry):
+    assert client.post('/api/predict', json=OBSERVATION).get_json()['model_name'] == 'best'
+    assert client.post('/api/predict?model=improved', json=OBSERVATION).get_json()['model_name'] == 'improved'
+    body = client.post('/api/predict', json=dict(OBSERVATION, model='improved-1')).get_json()
+    assert (body['model_name'], body['model_version']) == ('improved', 'improved-1')
+    batch = client.post('/api/predict/batch', json={'observations': [OBSERVATION], 'model': 'improved'})
+    assert batch.get_json()['model_name'] == 'improved'
+
+@pytest.mark.parametrize('path', ['/api/predict', '/api/predict/batch'])
+def test_unknown_model_is_a_404(client, app_registry, path):
+    response = client.post(f'{path}?model=missing', json=[OBSERVATION] if 'batch' in path else OBSERVATION)
+    assert response.status_code == 404
+    body = response.get_json()
+    assert body['error'] == 'Unknown model: missing'
+    assert sorted(body['available_models']) == ['best', 'improved']
+
+def test_admin_needs_localhost_or_the_token(service, client, app_registry, monkeypatch):
+    remote = {'REMOTE_ADDR': '10.0.0.5'}
+    payload = {'model': 'improved'}
+    assert client.post('/api/admin/models/default', json=payload, environ_base=remote).status_code == 403
+    assert client.post('/api/admin/models/reload', environ_base=remote).status_code == 403
+    assert app_registry.get().name == 'best'
+
+    assert client.post('/api/admin/models/default', json=payload).status_code == 200  # from localhost
+    assert app_registry.get().name == 'improved'
+
+    monkeypatch.setenv('POWER_ADMIN_TOKEN', 'secret')
+    payload = {'model': 'best'}
+    assert client.post('/api/admin/models/default', json=payload).status_code == 403
+    assert client.post('/api/admin/models/default', json=payload,
+                       headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    response = client.post('/api/admin/models/default', json=payload, environ_base=remote,
+                           headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200 and app_registry.get().name == 'best'
+
+def test_admin_swaps_in_a_new_version(client, app_registry, make_package):
+    path = make_package('improved', seed=5)
+    response = client.post('/api/admin/models/load', json={'path': path, 'wait': True, 'default': True})
+    assert response.status_code == 200
+    assert response.get_json()['default'] == 'improved'
+    body = client.post('/api/predict', json=OBSERVATION).get_json()
+    assert (body['model_name'], body['model_version']) == ('improved', 'improved-5')
+
+    response = client.post('/api/admin/models/default', json={'model': 'missing'})
+    assert response.status_code == 404
+    response = client.post('/api/admin/models/load', json={'path': '../elsewhere.pkl', 'wait': True})
+    assert response.status_code == 400
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from model_search import fold_assignments, rung_schedule, sample_candidates, search_random_forest
+
+GRID = {
+    'n_estimators': [27],
+    'max_depth': [1, None],
+    'min_samples_leaf': [1, 40],
+    'max_features': [None],
+}
+
+def staircase(n_rows=300, seed=0):
+    '''A target only deep trees with small leaves can follow'''
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 10, (n_rows, 3))
+    y = np.floor(X[:, 0]) * 10 + np.floor(X[:, 1] * 2) + 0.1 * rng.standard_normal(n_rows)
+    return X, y
+
+def cv_mse(X, y, params, folds, seed):
+    '''Plain K-fold MSE of a forest fitted in one go, on the search's folds'''
+    errors = []
+    for fold in range(folds.max() + 1):
+        train = folds != fold
+        forest = RandomForestRegressor(random_state=seed, n_jobs=1, **params).fit(X[train], y[train])
+        errors.append(np.mean((forest.predict(X[~train]) - y[~train]) ** 2))
+    return float(np.mean(errors))
+
+def test_rung_schedule_halves_candidates_and_ends_at_the_largest_forest():
+    assert rung_schedule(27, 300, min_estimators=10, eta=3) == [(27, 11), (9, 33), (3, 100), (1, 300)]
+    assert rung_schedule(4, 27, min_estimators=3, eta=3) == [(4, 9), (1, 27)]
+
+def test_search_returns_the_configuration_plain_cross_validation_ranks_first():
+    X, y = staircase()
+    seed, n_folds = 7, 3
+    result = search_random_forest(X, y, param_grid=GRID, n_candidates=4, n_folds=n_folds, time_budget=120,
+                                  workers=1, seed=seed, min_estimators=3, log=lambda *_: None)
+
+    folds = fold_assignments(len(y), n_folds, seed)
+    scores = {tuple(sorted(params.items())): cv_mse(X, y, dict(params, n_estimators=27), folds, seed)
+              for params in sample_candidates(GRID, 4, seed)}
+    ranked = sorted(scores, key=scores.get)
+    best = dict(ranked[0], n_estimators=27)
+
+    assert result.best_params == best
+    assert not result.budget_exhausted
+    assert [rung['candidates'] for rung in result.rungs] == [4, 1]
+    assert result.fits == 4 * n_folds + n_folds
+    assert result.best_rmse == pytest.approx(result.rungs[-1]['best_rmse'])
+    # Grown tree by tree with other seeds, the winner still scores like its one-go forest
+    assert result.best_rmse ** 2 == pytest.approx(scores[ranked[0]], rel=0.25)
+    assert result.best_rmse ** 2 < scores[ranked[1]]
+    assert result.model.get_params()['max_depth'] == best['max_depth']
+
+def test_search_is_reproducible_whatever_the_worker_count():
+    X, y = staircase(seed=1)
+    kwargs = dict(param_grid=GRID, n_candidates=4, n_folds=3, time_budget=120, seed=3, min_estimators=3,
+                  refit=False, log=lambda *_: None)
+    one = search_random_forest(X, y, workers=1, **kwargs)
+    two = search_random_forest(X, y, workers=2, **kwargs)
+    assert one.best_params == two.best_params
+    assert one.best_rmse == two.best_rmse
+    assert one.model is None
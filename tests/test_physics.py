@@ -0,0 +1,66 @@
+import ast
+import json
+import os
+
+import numpy as np
+import pytest
+
+from physics import (estimate_generation_breakdown, physics_based_estimate, physics_components, solar_power,
+                     wind_power)
+
+NOTEBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'power_generation_notebook.ipynb')
+
+def notebook_wind_power_curve():
+    '''The power curve defined inside the notebook's create_power_generation_data'''
+    with open(NOTEBOOK) as f:
+        cells = [''.join(cell['source']) for cell in json.load(f)['cells'] if cell['cell_type'] == 'code']
+    definition = next(node for source in cells for node in ast.walk(ast.parse(source))
+                      if isinstance(node, ast.FunctionDef) and node.name == 'wind_power_curve')
+    namespace = {'np': np}
+    exec(compile(ast.Module(body=[definition], type_ignores=[]), NOTEBOOK, 'exec'), namespace)
+    return namespace['wind_power_curve']
+
+def notebook_plant(wind_speed, solar_irradiance):
+    '''The notebook's noise-free solar, wind and backup generation, written out row by row'''
+    solar = 50 * (solar_irradiance / 1000)
+    if wind_speed < 3:
+        wind = 0.0
+    elif wind_speed < 12:
+        wind = 30 * ((wind_speed - 3) / (12 - 3)) ** 3
+    elif wind_speed < 25:
+        wind = 30.0
+    else:
+        wind = 0.0
+    return solar, wind, 0.85 * max(0, 70 - (solar + wind))
+
+# The curve's corners and either side of them, plus typical readings
+WIND = np.array([0, 1.5, 2.999, 3, 3.001, 7.5, 11.999, 12, 12.001, 18, 24.999, 25, 25.001, 40])
+SOLAR = np.array([0, 1, 150, 400, 999, 1000, 1250, 0, 600, 800, 1000, 300, 50, 900])
+
+def test_wind_curve_matches_the_notebook():
+    np.testing.assert_allclose(wind_power(WIND), notebook_wind_power_curve()(WIND), rtol=1e-12, atol=1e-12)
+
+def test_components_match_the_notebook_row_by_row():
+    expected = np.array([notebook_plant(w, s) for w, s in zip(WIND.tolist(), SOLAR.tolist())])
+    solar, wind, backup = physics_components(WIND, SOLAR)
+    np.testing.assert_allclose(np.column_stack([solar, wind, backup]), expected, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(physics_based_estimate(WIND, SOLAR), expected.sum(axis=1), rtol=1e-12)
+
+    # Single-row requests take the plain-float path; it must agree with the arrays
+    for w, s, row in zip(WIND.tolist(), SOLAR.tolist(), expected):
+        assert physics_components(w, s) == pytest.approx(tuple(row), rel=1e-12, abs=1e-12)
+        assert isinstance(physics_based_estimate(w, s), float)
+
+def test_negative_irradiance_gives_no_solar_power():
+    assert solar_power(-20.0) == 0.0
+    np.testing.assert_array_equal(solar_power(np.array([-20.0, 0.0])), [0.0, 0.0])
+
+@pytest.mark.parametrize('prediction', [0.0, 10.0, 55.0, 120.0])
+def test_breakdown_adds_up_to_the_prediction(prediction):
+    predictions = np.full(len(WIND), prediction)
+    parts = np.array(estimate_generation_breakdown(predictions, WIND, SOLAR))
+    np.testing.assert_allclose(parts.sum(axis=0), predictions, atol=1e-9)
+    assert (parts >= 0).all()
+    for i, (w, s) in enumerate(zip(WIND.tolist(), SOLAR.tolist())):
+        assert estimate_generation_breakdown(prediction, w, s) == pytest.approx(tuple(parts[:, i]), abs=1e-12)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from micro_batching import MicroBatcher
+from physics import physics_based_estimate
+
+OBSERVATION = {'temperature': 24.0, 'weather': 'Sunny', 'wind': 11.0, 'humidity': 55.0,
+               'barometer': 1013.0, 'solar_irradiance': 600.0, 'timestamp': '2024-06-01T12:00:00'}
+
+class NanPredictor:
+    kind = 'nan'
+
+    def predict(self, X):
+        return np.full(len(X), np.nan)
+
+@pytest.fixture(params=['direct', 'microbatch'])
+def scoring_path(request, service, client, monkeypatch):
+    if request.param == 'microbatch':
+        monkeypatch.setattr(service, 'micro_batcher', MicroBatcher(max_wait_ms=0))
+    return client
+
+@pytest.mark.parametrize('field, value', [('temperature', None), ('wind', 'inf'), ('humidity', 'humid'),
+                                          ('solar_irradiance', [600]), ('weather', 3)])
+def test_invalid_single_row_is_rejected(scoring_path, field, value):
+    response = scoring_path.post('/api/predict', json=dict(OBSERVATION, **{field: value}))
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['success'] is False
+    assert field in body['error']
+
+def test_valid_single_row_matches_batch(scoring_path):
+    single = scoring_path.post('/api/predict', json=OBSERVATION).get_json()
+    batch = scoring_path.post('/api/predict/batch', json=[OBSERVATION]).get_json()
+    assert single['prediction_method'] == batch['prediction_method'] == 'enhanced'
+    assert single['predicted_generation'] == batch['predicted_generation'][0]
+
+def test_non_finite_prediction_falls_back_to_physics(service, client, monkeypatch):
+    handle = service.registry.get()._replace(predictor=NanPredictor())
+    monkeypatch.setattr(service, 'select_model', lambda data=None: handle)
+
+    body = client.post('/api/predict', json=OBSERVATION).get_json()
+    assert body['prediction_method'] == 'physics_based'
+    expected = float(physics_based_estimate(OBSERVATION['wind'], OBSERVATION['solar_irradiance']))
+    assert body['predicted_generation'] == round(expected, 2)
+    assert body['prediction_interval'] is None
+
+    batch = client.post('/api/predict/batch', json=[OBSERVATION, OBSERVATION]).get_json()
+    assert batch['fallback_rows'] == [0, 1]
+    assert batch['predicted_generation'] == [round(expected, 2)] * 2
+
+def batch_rows(**changes):
+    rows = [dict(OBSERVATION, timestamp=f'2024-06-01T{hour:02d}:00:00') for hour in range(4)]
+    for row, fields in changes.items():
+        rows[int(row[1:])].update(fields)
+    return rows
+
+HORIZON = dict(OBSERVATION, horizon_hours=4, start='2024-06-01T00:00:00')
+
+@pytest.mark.parametrize('path, payload, message', [
+    ('/api/predict', dict(OBSERVATION, timestamp='soon'), "Invalid timestamp: 'soon'"),
+    ('/api/predict', dict(OBSERVATION, barometer=float('nan')), "Invalid values for barometer"),
+    ('/api/predict/batch', {'columns': [1, 2]}, "'columns' must be an object"),
+    ('/api/predict/batch', {'columns': dict(OBSERVATION)}, "Column 'temperature' must be an array"),
+    ('/api/predict/batch', {'observations': [1]}, "Observation 0 must be an object"),
+    ('/api/predict/batch', batch_rows(r1={'timestamp': 'soon'}, r3={'timestamp': '2024-13-40'}),
+     "Invalid values in 2 rows, expected ISO-8601 timestamps: row 1: timestamp; row 3: timestamp"),
+    ('/api/predict/batch', batch_rows(r2={'wind': 'calm'}), "row 2: wind"),
+    ('/api/predict', dict(HORIZON, start='soon'), "Invalid start: 'soon'"),
+    ('/api/predict', dict(HORIZON, temperature=[20, 21, None, 23]), "row 2: temperature"),
+])
+def test_validation_errors_name_the_field_and_row(client, path, payload, message):
+    response = client.post(path, json=payload)
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
+
+@pytest.mark.parametrize('body', [b'PK\x03\x04 not a zip', b'not a zip'])
+def test_unreadable_npz_is_a_400_without_python_errors(client, body):
+    response = client.post('/api/predict/batch', data=body, content_type='application/x-npz')
+    assert response.status_code == 400
+    error = response.get_json()['error']
+    assert '.npz' in error and 'Error' not in error
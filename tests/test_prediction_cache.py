@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, parse_quantization
+
+OBSERVATION = {'temperature': 20.1, 'weather': 'Sunny', 'wind': 8.0, 'humidity': 50.0,
+               'barometer': 1013.0, 'solar_irradiance': 600.0}
+NOON = datetime(2024, 6, 1, 12, 0)
+
+class Handle:
+    def __init__(self, name='best', version='1'):
+        self.name = name
+        self.version = version
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = PredictionCache(ttl_seconds=60, clock=clock)
+    cache.put('a', 1)
+    clock.now = 59.9
+    assert cache.get('a') == 1
+    clock.now = 60.0
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['expirations'], stats['entries'], stats['hits'], stats['misses']) == (1, 0, 1, 1)
+
+def test_exact_keys_by_default():
+    cache = PredictionCache()
+    key = cache.key(Handle(), OBSERVATION, NOON)
+    assert cache.key(Handle(), dict(OBSERVATION), NOON.replace(minute=59)) == key  # same hour
+    assert cache.key(Handle(), OBSERVATION, NOON.replace(hour=13)) != key
+    assert cache.key(Handle(), dict(OBSERVATION, temperature=20.2), NOON) != key
+    assert cache.key(Handle(version='2'), OBSERVATION, NOON) != key
+    with pytest.raises(TypeError):
+        cache.key(Handle(), dict(OBSERVATION, weather=3), NOON)
+
+def test_quantized_keys_share_a_step():
+    cache = PredictionCache(quantization=parse_quantization('temperature=0.5, solar_irradiance=10'))
+    key = cache.key(Handle(), OBSERVATION, NOON)
+    assert cache.key(Handle(), dict(OBSERVATION, temperature=20.2, solar_irradiance=603), NOON) == key
+    assert cache.key(Handle(), dict(OBSERVATION, temperature=20.4), NOON) != key
+    assert cache.key(Handle(), dict(OBSERVATION, wind=8.01), NOON) != key  # not quantized
+    with pytest.raises(ValueError, match='unknown field'):
+        parse_quantization('pressure=1')
+
+def test_reloading_a_model_drops_only_its_entries(tmp_path, make_package):
+    best = make_package('best')
+    make_package('improved')
+    registry = ModelRegistry(str(tmp_path))
+    cache = PredictionCache()
+    registry.on_change(lambda name: cache.clear() if name is None else cache.invalidate_model(name))
+    registry.load_all()
+
+    for name in ('best', 'improved'):
+        cache.put(cache.key(registry.get(name), OBSERVATION, NOON), 1.0)
+    registry.load(best)  # swap in the package again, as the admin endpoint or file watcher would
+    assert cache.get(cache.key(registry.get('best'), OBSERVATION, NOON)) is None
+    assert cache.get(cache.key(registry.get('improved'), OBSERVATION, NOON)) == 1.0
+
+    registry.load_all()
+    assert cache.stats()['entries'] == 0
+
+def test_repeated_request_is_served_from_the_cache(service, client, monkeypatch):
+    cache = PredictionCache()
+    monkeypatch.setattr(service, 'prediction_cache', cache)
+    payload = dict(OBSERVATION, timestamp=NOON.isoformat())
+    first = client.post('/api/predict', json=payload).get_json()
+    second = client.post('/api/predict', json=payload).get_json()
+    assert cache.stats()['hits'] == 1
+    assert first['predicted_generation'] == second['predicted_generation']
+    assert first['prediction_interval'] == second['prediction_interval']
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from feature_engineering import DEFAULT_ROLLING_WINDOWS, ENHANCED_FEATURES, ROLLING_FEATURES, rolling_statistic
+from model_registry import load_model_handle
+from rolling_store import SOURCE_FIELDS, RollingStore
+
+START = datetime(2024, 6, 1)
+
+def readings(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'temperature': rng.uniform(5, 35), 'weather': 'Sunny', 'wind': rng.uniform(0, 25),
+             'humidity': rng.uniform(20, 95), 'barometer': 1013.0, 'solar_irradiance': rng.uniform(0, 1000)}
+            for _ in range(n_rows)]
+
+def expected_features(rows):
+    '''Rolling features of the last row, as a training frame computes them over all rows'''
+    result = {}
+    for name, (source, statistic) in ROLLING_FEATURES.items():
+        values = np.array([row[SOURCE_FIELDS[source]] for row in rows])
+        result[name] = rolling_statistic(values, DEFAULT_ROLLING_WINDOWS[statistic], statistic)[-1]
+    return result
+
+def feed(store, site, rows, start=START):
+    return [store.update(site, row, start + timedelta(hours=i)) for i, row in enumerate(rows)]
+
+def test_ring_buffer_matches_training_windows():
+    store = RollingStore(max_sites=4)
+    rows = readings(12)
+    for i, features in enumerate(feed(store, 'plant-7', rows)):
+        assert features == pytest.approx(expected_features(rows[:i + 1]), rel=1e-9, abs=1e-9)
+
+    history = store.history('plant-7')
+    assert history.shape == (store.capacity, len(SOURCE_FIELDS))  # only the newest readings are kept
+    np.testing.assert_array_equal(history[:, 0], [row['temperature'] for row in rows[-store.capacity:]])
+
+def test_least_recently_updated_site_gives_up_its_slot():
+    store = RollingStore(max_sites=2)
+    feed(store, 'a', readings(2))
+    feed(store, 'b', readings(2))
+    feed(store, 'a', readings(1), START + timedelta(hours=2))
+    feed(store, 'c', readings(1))  # evicts b, heard from least recently
+
+    assert len(store) == 2 and store.stats()['evictions'] == 1
+    assert len(store.history('b')) == 0
+    assert len(store.history('a')) == 3 and len(store.history('c')) == 1
+
+@pytest.mark.parametrize('step', [timedelta(minutes=-30), timedelta(hours=4)])
+def test_window_starts_over_when_time_goes_back_or_jumps(step):
+    store = RollingStore(max_gap=3 * 3600)
+    rows = readings(3)
+    feed(store, 'plant-7', rows[:2])
+    features = store.update('plant-7', rows[2], START + timedelta(hours=1) + step)
+
+    assert store.stats()['resets'] == 1
+    assert len(store.history('plant-7')) == 1
+    assert features == pytest.approx(expected_features(rows[2:]))
+
+def test_snapshot_restores_every_site(tmp_path):
+    path = str(tmp_path / 'rolling.npz')
+    store = RollingStore(max_sites=8)
+    rows = readings(9)
+    feed(store, 'plant-7', rows[:7])
+    feed(store, 'plant-8', rows[7:])
+    assert store.save(path) == 2
+
+    restored = RollingStore(max_sites=8)
+    assert restored.restore(path) == 2
+    for site in ('plant-7', 'plant-8'):
+        np.testing.assert_array_equal(restored.history(site), store.history(site))
+
+    # Both stores continue from the same windows
+    later = START + timedelta(hours=7)
+    new = readings(1, seed=1)[0]
+    assert restored.update('plant-7', new, later) == pytest.approx(store.update('plant-7', new, later))
+
+def test_site_readings_get_the_rolling_features_of_a_series(tmp_path, service, client, monkeypatch):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(ENHANCED_FEATURES)))
+    path = str(tmp_path / 'rolling_power_generation_model.pkl')
+    joblib.dump({'model': LinearRegression().fit(X, X @ rng.uniform(0.5, 1.5, X.shape[1]) + 1e5), 'scaler': None,
+                 'feature_names': list(ENHANCED_FEATURES)}, path)
+    handle = load_model_handle(path)
+    monkeypatch.setattr(service, 'select_model', lambda data=None: handle)
+    monkeypatch.setattr(service, 'rolling_store', RollingStore())
+
+    rows = [dict(row, timestamp=(START + timedelta(hours=i)).isoformat()) for i, row in enumerate(readings(6))]
+    responses = [client.post('/api/predict', json=dict(row, site_id='plant-7')).get_json() for row in rows]
+    series = client.post('/api/predict/batch', json={'observations': rows, 'series': True}).get_json()
+
+    assert [r['rolling_features'] for r in responses] == ['site_history'] * len(rows)
+    assert [r['predicted_generation'] for r in responses] == series['predicted_generation']
+    alone = client.post('/api/predict', json=rows[-1]).get_json()
+    assert alone['rolling_features'] == 'single_observation'
+    assert alone['predicted_generation'] != responses[-1]['predicted_generation']
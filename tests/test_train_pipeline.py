@@ -0,0 +1,68 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from train_pipeline import STAGES, StageCache, run_stages
+
+def make_config(**overrides):
+    config = {
+        'data': None,
+        'data_digest': None,
+        'samples': 300,
+        'test_size': 0.2,
+        'split_seed': 42,
+        'correlation_threshold': 0.9,
+        'correlation_rule': 'greedy',
+        'k_best': 20,
+        'linear_models': ['enhanced', 'original'],
+        'forest': False,
+        'seed': 42,
+        'budget': 60,
+        'candidates': 4,
+        'folds': 3,
+        'workers': 1,
+    }
+    return dict(config, **overrides)
+
+def run(config, cache, **kwargs):
+    lines = []
+    outputs, manifests = run_stages(config, cache, log=lines.append, **kwargs)
+    return outputs, manifests, {line.split()[1]: 'cached' in line for line in lines}
+
+def test_second_run_loads_every_stage_without_refitting(tmp_path, monkeypatch):
+    cache = StageCache(str(tmp_path))
+    first, manifests, cached = run(make_config(), cache)
+    assert not any(cached.values())
+
+    def refit(*args, **kwargs):
+        raise AssertionError("a cached stage was refitted")
+
+    monkeypatch.setattr(LinearRegression, 'fit', refit)
+    second, again, cached = run(make_config(), StageCache(str(tmp_path)))
+    assert cached == {stage.name: True for stage in STAGES}
+    assert {name: m['digest'] for name, m in again.items()} == {name: m['digest'] for name, m in manifests.items()}
+    assert second['evaluate']['results'] == first['evaluate']['results']
+    assert second['selection'] == first['selection']
+
+def test_changed_parameter_reruns_its_stage_and_only_what_it_changes(tmp_path):
+    cache = StageCache(str(tmp_path))
+    run(make_config(), cache)
+
+    # The forest stage reruns for a new budget, but with the forest off its output is unchanged
+    _, _, cached = run(make_config(budget=30), cache)
+    assert [name for name, hit in cached.items() if not hit] == ['fit_forest']
+
+    _, _, cached = run(make_config(folds=4), cache)
+    assert [name for name, hit in cached.items() if not hit] == ['fit_forest', 'evaluate']
+
+    # A different k changes the selection, so everything fitted on it reruns
+    _, _, cached = run(make_config(k_best=10), cache)
+    assert [name for name, hit in cached.items() if not hit] == ['selection', 'fit_linear', 'evaluate']
+
+def test_forced_stage_reruns_and_same_output_keeps_later_stages_cached():
+    cache = StageCache(None)
+    first, _, _ = run(make_config(), cache)
+    second, _, cached = run(make_config(), cache, force=('correlation',))
+    # The in-memory cache digests the key, so an identical rerun gives later stages the same keys
+    assert [name for name, hit in cached.items() if not hit] == ['correlation']
+    assert second['correlation'] == first['correlation']
+    np.testing.assert_array_equal(second['features']['X'], first['features']['X'])
@@ -0,0 +1,571 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import warnings
+from collections import namedtuple
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from feature_engineering import ENHANCED_FEATURES, ORIGINAL_FEATURES, FeaturePipeline, FeatureState
+from feature_pruning import DEFAULT_THRESHOLD as DEFAULT_CORRELATION_THRESHOLD, PRUNING_RULES, prune_features
+from model_format import MODEL_EXTENSION, export_package
+from model_registry import file_digest
+from model_search import DEFAULT_CANDIDATES, DEFAULT_FOLDS, DEFAULT_SEED, DEFAULT_TIME_BUDGET, search_random_forest
+warnings.filterwarnings('ignore')
+
+DEFAULT_CACHE_DIR = '.train_cache'
+DEFAULT_SAMPLES = 2000
+DEFAULT_TEST_SIZE = 0.2
+DEFAULT_K_BEST = 60
+MODEL_FILENAME = 'best_power_generation_model.pkl'
+TARGET = 'total_generation'
+
+MODEL_NAMES = {
+    'original': 'Original Linear Regression',
+    'enhanced': 'Enhanced Linear Regression',
+    'forest': 'Random Forest',
+}
+CATEGORY_LABELS = ['Low', 'Medium-Low', 'Medium-High', 'High']
+
+# Columns of every model the pipeline trains, built once: the enhanced set, then the original extras
+ALL_FEATURES = ENHANCED_FEATURES + [name for name in ORIGINAL_FEATURES if name not in ENHANCED_FEATURES]
+
+# ---- data ------------------------------------------------------------------
+
+def generate_data(n_samples=DEFAULT_SAMPLES, seed=42):
+    '''The notebook's synthetic dataset (Cell 2), row for row for the same seed'''
+    rng = np.random.RandomState(seed)
+    clock = pd.date_range(datetime(2024, 1, 1), periods=n_samples, freq='h')
+    hours = np.arange(n_samples)
+
+    seasonal_temp = 20 + 15 * np.sin(2 * np.pi * hours / (24 * 365))
+    daily_temp = 5 * np.sin(2 * np.pi * hours / 24)
+    temp = seasonal_temp + daily_temp + rng.normal(0, 3, n_samples)
+    wind = np.maximum(0, 8 + 3 * np.sin(2 * np.pi * hours / (24 * 7)) + rng.normal(0, 4, n_samples))
+    humidity = np.clip(60 - 0.3 * (temp - 20) + rng.normal(0, 15, n_samples), 10, 95)
+    barometer = rng.normal(1013, 15, n_samples)
+    weather = rng.choice(['Clear', 'Sunny', 'Cloudy', 'Overcast', 'Rainy'],
+                         n_samples, p=[0.35, 0.25, 0.25, 0.1, 0.05])
+
+    hour_of_day = clock.hour.to_numpy()
+    day_of_year = clock.dayofyear.to_numpy()
+    solar_elevation = np.maximum(0, np.sin(np.pi * (hour_of_day - 6) / 12))
+    seasonal_factor = 1 + 0.4 * np.sin(2 * np.pi * (day_of_year - 80) / 365)
+    weather_factor = np.select([weather == 'Clear', weather == 'Sunny', weather == 'Cloudy',
+                                weather == 'Overcast', weather == 'Rainy'],
+                               [1.0, 0.95, 0.4, 0.2, 0.05], default=0.5)
+    temp_factor = 1 - 0.004 * np.maximum(0, temp - 25)
+    solar_irradiance = 1000 * solar_elevation * seasonal_factor * weather_factor * temp_factor
+    solar_irradiance = np.maximum(0, solar_irradiance + rng.normal(0, 50, n_samples))
+    solar_generation = np.maximum(0, 50 * (solar_irradiance / 1000) + rng.normal(0, 2, n_samples))
+
+    cut_in, rated, cut_out, rated_power = 3.0, 12.0, 25.0, 30.0
+    wind_curve = np.where(wind < cut_in, 0,
+                          np.where(wind < rated, rated_power * ((wind - cut_in) / (rated - cut_in)) ** 3,
+                                   np.where(wind < cut_out, rated_power, 0)))
+    wind_generation = np.maximum(0, wind_curve + rng.normal(0, 1, n_samples))
+
+    backup_needed = np.maximum(0, 70 - (solar_generation + wind_generation))
+    gas_generation = np.maximum(0, backup_needed * 0.85 + rng.normal(0, 2, n_samples))
+    total_generation = solar_generation + wind_generation + gas_generation
+    gas_mxm = np.maximum(0, gas_generation * 0.2 + rng.normal(0, 1, n_samples))
+
+    return pd.DataFrame({
+        'clock': clock, 'temp': temp, 'weather': weather, 'wind': wind, 'humidity': humidity,
+        'barometer': barometer, 'solar_irradiance': solar_irradiance, 'solar_generation': solar_generation,
+        'wind_generation': wind_generation, 'gas_generation': gas_generation,
+        'total_generation': total_generation, 'GAS_mxm': gas_mxm,
+    })
+
+def load_data(path):
+    '''Training frame from CSV or Parquet, in time order (rolling features need it)'''
+    frame = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    frame['clock'] = pd.to_datetime(frame['clock'])
+    return frame.sort_values('clock', kind='stable').reset_index(drop=True)
+
+# ---- metrics ---------------------------------------------------------------
+
+def quartile_categories(values):
+    '''Low..High category codes by the values' own quartiles, like the notebook's pd.cut (Cell 7)'''
+    values = np.asarray(values, dtype=np.float64)
+    return np.searchsorted(np.quantile(values, [0.25, 0.5, 0.75]), values, side='left')
+
+def regression_metrics(y_true, y_pred):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    return {
+        'r2': float(r2_score(y_true, y_pred)),
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'mape': float(np.mean(np.abs((y_true - y_pred) / y_true)) * 100),
+        'classification_accuracy': float(np.mean(quartile_categories(y_true) == quartile_categories(y_pred))),
+    }
+
+def interval_statistics(Z, residuals):
+    '''prediction_interval entry for a linear model: residual variance and (X'X)^-1 of the scaled design'''
+    design = np.column_stack([np.ones(len(Z)), Z])
+    dof = max(len(Z) - design.shape[1], 1)
+    return {
+        'residual_variance': float(residuals @ residuals / dof),
+        'xtx_inverse': np.linalg.pinv(design.T @ design).tolist(),  # pinv: constant columns scale to zeros
+        'dof': dof,
+    }
+
+def fitted_models(*fits):
+    return {name: entry for fit in fits for name, entry in fit['models'].items()}
+
+def columns(features, names):
+    index = {name: i for i, name in enumerate(features['feature_names'])}
+    return features['X'][:, [index[name] for name in names]]
+
+# ---- stages ----------------------------------------------------------------
+# Each stage takes the config and its inputs' outputs and returns a dict of
+# outputs. The cache key is a hash of the stage's code, its config values and
+# the content digests of its inputs, so changing one stage reruns it, and the
+# stages after it only when its output actually changed.
+
+def data_stage(config):
+    from sklearn.model_selection import train_test_split
+
+    frame = load_data(config['data']) if config['data'] else generate_data(config['samples'], config['split_seed'])
+    train, test = train_test_split(np.arange(len(frame)), test_size=config['test_size'],
+                                   random_state=config['split_seed'])
+    return {'frame': frame, 'train': train, 'test': test}
+
+def features_stage(config, data):
+    frame, train = data['frame'], data['train']
+    state = FeatureState.fit(frame.iloc[train])  # training rows only
+    pipeline = FeaturePipeline(ALL_FEATURES, state=state)
+    return {
+        'X': pipeline.transform_frame(frame),
+        'y': frame[TARGET].to_numpy(dtype=np.float64),
+        'feature_names': list(pipeline.feature_names),
+        'feature_state': state.as_dict(),
+        'train': train,
+        'test': data['test'],
+    }
+
+def correlation_stage(config, features):
+    X = columns(features, ENHANCED_FEATURES)[features['train']]  # training rows only, unlike the notebook
+    result = prune_features(X, ENHANCED_FEATURES, config['correlation_threshold'], config['correlation_rule'])
+    return {'kept': result.kept, 'dropped': result.dropped}
+
+def selection_stage(config, features, correlation):
+    from sklearn.feature_selection import SelectKBest, f_regression
+
+    kept = correlation['kept']
+    selector = SelectKBest(f_regression, k=min(config['k_best'], len(kept)))
+    selector.fit(columns(features, kept)[features['train']], features['y'][features['train']])
+    return {'selected': [name for name, chosen in zip(kept, selector.get_support()) if chosen]}
+
+def fit_linear_stage(config, features, selection):
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+
+    train = features['train']
+    y = features['y'][train]
+    models = {}
+    for key, names in (('original', ORIGINAL_FEATURES), ('enhanced', selection['selected'])):
+        if key not in config['linear_models']:
+            continue
+        scaler = StandardScaler()
+        Z = scaler.fit_transform(columns(features, names)[train])
+        model = LinearRegression().fit(Z, y)
+        models[MODEL_NAMES[key]] = {'model': model, 'scaler': scaler, 'feature_names': list(names),
+                                    'interval': interval_statistics(Z, y - model.predict(Z))}
+    return {'models': models}
+
+def fit_forest_stage(config, features, correlation):
+    if not config['forest']:
+        return {'models': {}}
+    names = correlation['kept']
+    train = features['train']
+    result = search_random_forest(columns(features, names)[train], features['y'][train],
+                                  n_candidates=config['candidates'], n_folds=config['folds'],
+                                  time_budget=config['budget'], workers=config['workers'], seed=config['seed'])
+    return {'models': {MODEL_NAMES['forest']: {'model': result.model, 'scaler': None, 'feature_names': list(names),
+                                               'search': result.summary()}}}
+
+def evaluate_stage(config, features, fit_linear, fit_forest):
+    from sklearn.model_selection import cross_val_score
+
+    train, test, y = features['train'], features['test'], features['y']
+    results = {}
+    for name, entry in fitted_models(fit_linear, fit_forest).items():
+        X = columns(features, entry['feature_names'])
+        scaler = entry['scaler']
+        predict = entry['model'].predict
+        transform = scaler.transform if scaler is not None else (lambda values: values)
+        train_metrics = regression_metrics(y[train], predict(transform(X[train])))
+        test_metrics = regression_metrics(y[test], predict(transform(X[test])))
+        # A linear fit is unchanged by scaling, so the raw columns give the same CV scores
+        cv_scores = cross_val_score(entry['model'], X[train], y[train], cv=config['folds'], scoring='r2',
+                                    n_jobs=config['workers'])
+        results[name] = {
+            **{f'train_{metric}': value for metric, value in train_metrics.items()},
+            **{f'test_{metric}': value for metric, value in test_metrics.items()},
+            'cv_r2_scores': cv_scores.tolist(),
+        }
+    return {'results': results, 'best': max(results, key=lambda name: results[name]['test_r2'])}
+
+Stage = namedtuple('Stage', 'name run inputs params code')
+
+STAGES = [
+    Stage('data', data_stage, (), ('data_digest', 'samples', 'test_size', 'split_seed'),
+          (generate_data, load_data)),
+    Stage('features', features_stage, ('data',), (), ('feature_engineering.py',)),
+    Stage('correlation', correlation_stage, ('features',), ('correlation_threshold', 'correlation_rule'),
+          (columns, 'feature_pruning.py')),
+    Stage('selection', selection_stage, ('features', 'correlation'), ('k_best',), (columns,)),
+    Stage('fit_linear', fit_linear_stage, ('features', 'selection'), ('linear_models',),
+          (interval_statistics, columns)),
+    Stage('fit_forest', fit_forest_stage, ('features', 'correlation'),
+          ('forest', 'seed', 'budget', 'candidates', 'folds'), (columns, 'model_search.py')),
+    Stage('evaluate', evaluate_stage, ('features', 'fit_linear', 'fit_forest'), ('folds',),
+          (regression_metrics, quartile_categories, columns, fitted_models)),
+]
+
+# ---- cache -----------------------------------------------------------------
+
+def code_digest(code):
+    '''Hash of the source a stage runs: its own function plus listed helpers and modules'''
+    sha = hashlib.sha256()
+    for item in code:
+        if isinstance(item, str):
+            sha.update(file_digest(os.path.join(os.path.dirname(os.path.abspath(__file__)), item)).encode())
+        else:
+            sha.update(inspect.getsource(item).encode())
+    return sha.hexdigest()
+
+class StageCache:
+    """Stage outputs on disk, one joblib file per stage and key.
+
+    Next to each output sits a small JSON manifest with the output's
+    content digest, so later stages can compute their keys without
+    loading anything. Files are written atomically; a directory of None
+    keeps everything in memory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self._memory = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, stage, key, extension):
+        return os.path.join(self.directory, f'{stage}-{key[:16]}{extension}')
+
+    def manifest(self, stage, key):
+        if not self.directory:
+            return self._memory.get((stage, key), (None, None))[0]
+        try:
+            with open(self._path(stage, key, '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, stage, key):
+        if not self.directory:
+            return self._memory[stage, key][1]
+        import joblib
+
+        return joblib.load(self._path(stage, key, '.joblib'))
+
+    def save(self, stage, key, value, seconds):
+        if not self.directory:
+            digest = hashlib.sha256(key.encode()).hexdigest()
+            manifest = {'key': key, 'digest': digest, 'seconds': seconds}
+            self._memory[stage, key] = (manifest, value)
+            return manifest
+        import joblib
+
+        path = self._path(stage, key, '.joblib')
+        joblib.dump(value, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        manifest = {'key': key, 'digest': file_digest(path), 'seconds': seconds,
+                    'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        with open(self._path(stage, key, '.json.tmp'), 'w') as f:
+            json.dump(manifest, f)
+        os.replace(self._path(stage, key, '.json.tmp'), self._path(stage, key, '.json'))
+        return manifest
+
+def stage_key(stage, config, digests):
+    payload = {
+        'stage': stage.name,
+        'code': code_digest((stage.run,) + tuple(stage.code)),
+        'params': {name: config[name] for name in stage.params},
+        'inputs': {name: digests[name] for name in stage.inputs},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def run_stages(config, cache, force=(), log=print):
+    '''Run or reuse every stage in order; returns ({stage: output}, {stage: manifest})'''
+    digests, manifests, outputs = {}, {}, {}
+
+    def output(name):
+        if name not in outputs:
+            outputs[name] = cache.load(name, manifests[name]['key'])
+        return outputs[name]
+
+    for stage in STAGES:
+        key = stage_key(stage, config, digests)
+        manifest = None if stage.name in force else cache.manifest(stage.name, key)
+        if manifest is not None:
+            log(f"♻️  {stage.name:<12} cached ({manifest['digest'][:12]})")
+        else:
+            started = perf_counter()
+            outputs[stage.name] = stage.run(config, *(output(name) for name in stage.inputs))
+            seconds = perf_counter() - started
+            manifest = cache.save(stage.name, key, outputs[stage.name], seconds)
+            log(f"⚙️  {stage.name:<12} {seconds:7.1f}s ({manifest['digest'][:12]})")
+        manifests[stage.name] = manifest
+        digests[stage.name] = manifest['digest']
+
+    return {stage.name: output(stage.name) for stage in STAGES if stage.name != 'data'}, manifests
+
+# ---- export ----------------------------------------------------------------
+
+def build_package(features, models, evaluation, manifests):
+    '''Model package in the notebook's layout (Cell 11) plus feature state and interval statistics'''
+    results, best = evaluation['results'], evaluation['best']
+    entry = models[best]
+    metrics = results[best]
+    baseline = results.get(MODEL_NAMES['original'], metrics)
+    cv_means = {f"{key}_cv_mean": float(np.mean(results[name]['cv_r2_scores']))
+                for key, name in (('original_lr', MODEL_NAMES['original']), ('enhanced_lr', MODEL_NAMES['enhanced']),
+                                  ('random_forest', MODEL_NAMES['forest'])) if name in results}
+
+    package = {
+        'model': entry['model'],
+        'scaler': entry['scaler'],
+        'feature_names': entry['feature_names'],
+        'preprocessor': None,
+        'model_type': best,
+        'algorithm': best,
+        'performance_metrics': {f'{split}_{metric}': metrics[f'{split}_{name}']
+                                for split in ('train', 'test')
+                                for metric, name in (('r2_score', 'r2'), ('rmse', 'rmse'), ('mae', 'mae'),
+                                                     ('mape', 'mape'),
+                                                     ('classification_accuracy', 'classification_accuracy'))},
+        'comparison_results': {
+            'original_lr_test_r2': baseline['test_r2'],
+            'best_model_test_r2': metrics['test_r2'],
+            'improvement_r2': (metrics['test_r2'] - baseline['test_r2']) * 100,
+            'improvement_classification': (metrics['test_classification_accuracy']
+                                           - baseline['test_classification_accuracy']) * 100,
+        },
+        'training_info': {
+            'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'training_samples': int(len(features['train'])),
+            'feature_count': len(entry['feature_names']),
+            'cross_validation_scores': cv_means,
+            'pipeline': {name: manifest['digest'][:12] for name, manifest in manifests.items()},
+        },
+        'model_metadata': {
+            'algorithm': best,
+            'framework': 'scikit-learn',
+            'python_version': f'{sys.version_info.major}.{sys.version_info.minor}',
+            'target_variable': 'total_generation (kW)',
+            'problem_type': 'regression',
+            'feature_engineering': 'basic' if best == MODEL_NAMES['original'] else 'advanced',
+        },
+        'feature_state': features['feature_state'],
+        'version': manifests['fit_forest' if best == MODEL_NAMES['forest'] else 'fit_linear']['digest'][:12],
+    }
+    if 'interval' in entry:
+        package['prediction_interval'] = entry['interval']
+    if best == MODEL_NAMES['forest']:
+        importance = sorted(zip(entry['feature_names'], entry['model'].feature_importances_.tolist()),
+                            key=lambda item: -item[1])
+        package['rf_specific'] = {
+            'best_params': entry['search']['best_params'],
+            'feature_importance': [{'feature': name, 'importance': value} for name, value in importance],
+            'search': entry['search'],
+        }
+    return package
+
+def export_model(package, output_dir='.', portable=False, log=print):
+    '''Write the package (atomically, as a serving registry may be watching) and, if asked, its .pmf'''
+    import joblib
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, MODEL_FILENAME)
+    joblib.dump(package, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    log(f"💾 {package['model_type']} saved as {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+
+    portable_path = os.path.splitext(path)[0] + MODEL_EXTENSION
+    # A stale .pmf next to the pickle would shadow it in the registry
+    if portable or os.path.exists(portable_path):
+        try:
+            export_package(path, portable_path)
+            log(f"💾 Portable copy saved as {portable_path}")
+        except ValueError as e:
+            if os.path.exists(portable_path):
+                os.remove(portable_path)
+            log(f"⚠️  No portable copy ({e}); removed {portable_path} so it cannot shadow the new model")
+    return path
+
+# ---- plots -----------------------------------------------------------------
+
+def save_plots(features, models, evaluation, directory, log=print):
+    '''Confusion matrices (Cell 9) and a results dashboard (Cell 10) as PNG files'''
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        log("⚠️  matplotlib is not installed; skipping plots")
+        return []
+
+    os.makedirs(directory, exist_ok=True)
+    train, test, y = features['train'], features['test'], features['y']
+    predictions = {}
+    for name, entry in models.items():
+        X = columns(features, entry['feature_names'])
+        if entry['scaler'] is not None:
+            X = entry['scaler'].transform(X)
+        predictions[name] = (entry['model'].predict(X[train]), entry['model'].predict(X[test]))
+    names = list(predictions)
+    paths = []
+
+    fig, axes = plt.subplots(2, len(names), figsize=(6 * len(names), 12), squeeze=False)
+    fig.suptitle('Confusion Matrices - Training vs Testing Performance', fontsize=16, fontweight='bold')
+    for i, name in enumerate(names):
+        for row, (rows, predicted, split) in enumerate(((train, predictions[name][0], 'Training'),
+                                                         (test, predictions[name][1], 'Testing'))):
+            matrix = np.zeros((4, 4), dtype=int)
+            np.add.at(matrix, (quartile_categories(y[rows]), quartile_categories(predicted)), 1)
+            ax = axes[row, i]
+            ax.imshow(matrix, cmap='Blues')
+            for (r, c), count in np.ndenumerate(matrix):
+                ax.text(c, r, str(count), ha='center', va='center')
+            ax.set_xticks(range(4), CATEGORY_LABELS, rotation=30)
+            ax.set_yticks(range(4), CATEGORY_LABELS)
+            accuracy = evaluation['results'][name][('train' if row == 0 else 'test') + '_classification_accuracy']
+            ax.set_title(f"{name}\n{split} Accuracy: {accuracy:.3f}")
+            ax.set_xlabel('Predicted Category')
+            ax.set_ylabel('Actual Category')
+    fig.tight_layout()
+    paths.append(os.path.join(directory, 'confusion_matrices.png'))
+    fig.savefig(paths[-1], dpi=100)
+    plt.close(fig)
+
+    fig, axes = plt.subplots(2, len(names) + 1, figsize=(6 * (len(names) + 1), 10), squeeze=False)
+    for i, name in enumerate(names):
+        predicted = predictions[name][1]
+        axes[0, i].scatter(y[test], predicted, s=6, alpha=0.6)
+        axes[0, i].plot([y.min(), y.max()], [y.min(), y.max()], 'r--')
+        axes[0, i].set_title(f"{name}\nTest R² {evaluation['results'][name]['test_r2']:.4f}")
+        axes[0, i].set_xlabel('Actual (kW)')
+        axes[0, i].set_ylabel('Predicted (kW)')
+        axes[1, i].hist(y[test] - predicted, bins=40)
+        axes[1, i].set_title(f"Residuals, RMSE {evaluation['results'][name]['test_rmse']:.2f} kW")
+    axes[0, -1].boxplot([evaluation['results'][name]['cv_r2_scores'] for name in names])
+    axes[0, -1].set_xticks(range(1, len(names) + 1), [name.replace(' Linear Regression', ' LR') for name in names])
+    axes[0, -1].set_title('Cross-validation R²')
+    forest = models.get(MODEL_NAMES['forest'])
+    if forest is not None:
+        top = np.argsort(forest['model'].feature_importances_)[::-1][:15]
+        axes[1, -1].barh([forest['feature_names'][j] for j in top][::-1],
+                         forest['model'].feature_importances_[top][::-1])
+        axes[1, -1].set_title('Random Forest: top 15 features')
+    else:
+        axes[1, -1].axis('off')
+    fig.tight_layout()
+    paths.append(os.path.join(directory, 'dashboard.png'))
+    fig.savefig(paths[-1], dpi=100)
+    plt.close(fig)
+    return paths
+
+# ---- command line ----------------------------------------------------------
+
+def print_summary(evaluation, correlation, selection, file=sys.stdout):
+    print(f"🎯 {len(correlation['dropped'])} correlated features removed, {len(correlation['kept'])} kept, "
+          f"{len(selection['selected'])} selected for the enhanced linear model", file=file)
+    print(f"{'Model':<30} {'Test R²':>8} {'Test RMSE':>10} {'Test MAE':>9} {'Test Acc':>9} {'CV R²':>7}", file=file)
+    for name, metrics in sorted(evaluation['results'].items(), key=lambda item: -item[1]['test_r2']):
+        print(f"{name:<30} {metrics['test_r2']:8.4f} {metrics['test_rmse']:10.2f} {metrics['test_mae']:9.2f} "
+              f"{metrics['test_classification_accuracy'] * 100:8.1f}% {np.mean(metrics['cv_r2_scores']):7.4f}",
+              file=file)
+    print(f"🥇 Best model: {evaluation['best']}", file=file)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Train the power generation models without the notebook: "
+                    "data -> features -> correlation -> selection -> fit -> evaluate -> export")
+    parser.add_argument('--data', help="CSV or Parquet training data in the notebook's columns "
+                                       "(default: generate the notebook's synthetic dataset)")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help="Rows to generate without --data")
+    parser.add_argument('--test-size', type=float, default=DEFAULT_TEST_SIZE)
+    parser.add_argument('--split-seed', type=int, default=42, help="Seed of the train/test split and generator")
+    parser.add_argument('--correlation-threshold', type=float, default=DEFAULT_CORRELATION_THRESHOLD)
+    parser.add_argument('--correlation-rule', choices=PRUNING_RULES, default='greedy',
+                        help="greedy keeps the first of every correlated group; notebook drops every "
+                             "column correlated with an earlier one (see feature_pruning.py)")
+    parser.add_argument('--k-best', type=int, default=DEFAULT_K_BEST, help="Features kept by the F-test")
+    parser.add_argument('--models', default=','.join(MODEL_NAMES),
+                        help=f"Models to train, comma separated from {', '.join(MODEL_NAMES)}")
+    parser.add_argument('--budget', type=float, default=DEFAULT_TIME_BUDGET, help="Seconds for the forest search")
+    parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES)
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Seed of the forest search")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--output-dir', default='.', help="Where the model package is written")
+    parser.add_argument('--pmf', action='store_true', help="Also export a portable .pmf copy")
+    parser.add_argument('--plots', metavar='DIR', help="Save confusion matrix and dashboard PNGs here")
+    parser.add_argument('--cache-dir', default=os.environ.get('POWER_TRAIN_CACHE', DEFAULT_CACHE_DIR))
+    parser.add_argument('--no-cache', action='store_true', help="Keep stage outputs in memory only")
+    parser.add_argument('--force', action='append', default=[], choices=[stage.name for stage in STAGES],
+                        help="Rerun this stage even if cached (repeatable)")
+    parser.add_argument('--no-export', action='store_true', help="Stop after evaluation")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    models = [name.strip() for name in args.models.split(',') if name.strip()]
+    unknown = set(models) - set(MODEL_NAMES)
+    if unknown or not models:
+        print(f"❌ Unknown models: {', '.join(sorted(unknown)) or '(none given)'}", file=sys.stderr)
+        return 2
+    config = {
+        'data': args.data,
+        'data_digest': file_digest(args.data) if args.data else None,  # content, not path
+        'samples': None if args.data else args.samples,
+        'test_size': args.test_size,
+        'split_seed': args.split_seed,
+        'correlation_threshold': args.correlation_threshold,
+        'correlation_rule': args.correlation_rule,
+        'k_best': args.k_best,
+        'linear_models': sorted(set(models) - {'forest'}),
+        'forest': 'forest' in models,
+        'seed': args.seed,
+        'budget': args.budget,
+        'candidates': args.candidates,
+        'folds': args.folds,
+        'workers': args.workers or os.cpu_count() or 1,
+    }
+
+    started = perf_counter()
+    print(f"🚀 Training pipeline ({'cache ' + args.cache_dir if not args.no_cache else 'no cache'})")
+    outputs, manifests = run_stages(config, StageCache(None if args.no_cache else args.cache_dir), args.force)
+    print_summary(outputs['evaluate'], outputs['correlation'], outputs['selection'])
+    models = fitted_models(outputs['fit_linear'], outputs['fit_forest'])
+
+    if args.plots:
+        for path in save_plots(outputs['features'], models, outputs['evaluate'], args.plots):
+            print(f"📊 {path}")
+    if not args.no_export:
+        package = build_package(outputs['features'], models, outputs['evaluate'], manifests)
+        export_model(package, args.output_dir, args.pmf)
+    print(f"✅ Done in {perf_counter() - started:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+from enhanced_flask_app import app
+
+# WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app
+application = app